@@ -2,25 +2,38 @@ from __future__ import annotations
 """
 Grid actions.
 Should be used in replay and undo features.
+
+Applying an action records the inverse tokens returned by the LayerStore
+(see LayerStore.add_undoable), so undoing it puts back exactly the layers each
+square held before. An action that was never applied, such as one decoded from
+a journal without its tokens, falls back to erase.
 """
 
+import sys
+from array import array
 from dataclasses import dataclass, field
-from layer_util import Layer
+from brush import BRUSH_DIAMOND, stencil_cells
+from layer_util import Layer, get_layers
 from grid import Grid
+import snapshot
 
 @dataclass
 class PaintStep:
 
     affected_grid_square: tuple[int, int]
     affected_layer: Layer
+    inverse: int | None = field(default=None, compare=False, repr=False)
 
     def undo_apply(self, grid: Grid):
         sq = grid[self.affected_grid_square[0]][self.affected_grid_square[1]]
-        sq.erase(self.affected_layer)
+        if self.inverse is None:
+            sq.erase(self.affected_layer)
+        else:
+            sq.undo_add(self.inverse)
 
     def redo_apply(self, grid: Grid):
         sq = grid[self.affected_grid_square[0]][self.affected_grid_square[1]]
-        sq.add(self.affected_layer)
+        self.inverse = sq.add_undoable(self.affected_layer)
 
 
 @dataclass
@@ -28,20 +41,213 @@ class PaintAction:
 
     steps: list[PaintStep] = field(default_factory=list)
     is_special: bool = False
+    inverse: array | None = field(default=None, compare=False, repr=False)
 
     def undo_apply(self, grid: Grid):
         if self.is_special:
-            grid.special()
+            grid.undo_special(self.inverse)
             return
-        for step in self.steps:
+        for step in reversed(self.steps):
             step.undo_apply(grid)
 
     def redo_apply(self, grid: Grid):
         if self.is_special:
-            grid.special()
+            self.inverse = grid.special_undoable()
             return
         for step in self.steps:
             step.redo_apply(grid)
 
     def add_step(self, step: PaintStep):
         self.steps.append(step)
+
+    def save_inverse(self):
+        """Returns the inverse tokens of the action, for load_inverse to put back."""
+        return (self.inverse, [step.inverse for step in self.steps])
+
+    def load_inverse(self, saved) -> None:
+        """Puts back the inverse tokens returned by save_inverse."""
+        self.inverse, tokens = saved
+        for step, token in zip(self.steps, tokens):
+            step.inverse = token
+
+    def nbytes(self) -> int:
+        """Estimated memory held by the action, in bytes, counting its steps."""
+        size = sys.getsizeof(self) + sys.getsizeof(self.__dict__) + sys.getsizeof(self.steps)
+        if self.inverse is not None:
+            size += sys.getsizeof(self.inverse)
+        for step in self.steps:
+            size += sys.getsizeof(step) + sys.getsizeof(step.__dict__) + sys.getsizeof(step.affected_grid_square)
+        return size
+
+
+class BrushAction:
+    """
+    A single dab of the brush, stored as (layer index, centre, brush size, shape)
+    rather than one PaintStep per square. The squares under the brush are only
+    worked out when the action is applied, in the same order as on_paint visits
+    them, so undo_apply / redo_apply match the equivalent PaintAction.
+    inverse holds one token per square, in the same order.
+    """
+
+    __slots__ = ("layer_index", "px", "py", "size", "shape", "inverse")
+    is_special = False
+
+    def __init__(self, layer: Layer, px: int, py: int, size: int, shape: str = BRUSH_DIAMOND) -> None:
+        self.layer_index = layer.index
+        self.px = px
+        self.py = py
+        self.size = size
+        self.shape = shape
+        self.inverse = None
+
+    @property
+    def layer(self) -> Layer:
+        return get_layers()[self.layer_index]
+
+    def cells(self, grid: Grid) -> list[tuple[int, int]]:
+        """Returns the squares of grid under the brush."""
+        return stencil_cells(self.px, self.py, self.size, grid.x, grid.y, self.shape)
+
+    def undo_apply(self, grid: Grid):
+        cells = self.cells(grid)
+        if self.inverse is None or len(self.inverse) != len(cells):
+            layer = self.layer
+            for x, y in cells:
+                grid[x][y].erase(layer)
+            return
+        inverse = self.inverse
+        for i in range(len(cells) - 1, -1, -1):
+            x, y = cells[i]
+            grid[x][y].undo_add(inverse[i])
+
+    def redo_apply(self, grid: Grid):
+        layer = self.layer
+        self.inverse = array("b", [grid[x][y].add_undoable(layer) for x, y in self.cells(grid)])
+
+    def save_inverse(self):
+        """Returns the inverse tokens of the action, for load_inverse to put back."""
+        return self.inverse
+
+    def load_inverse(self, saved) -> None:
+        """Puts back the inverse tokens returned by save_inverse."""
+        self.inverse = saved
+
+    def nbytes(self) -> int:
+        """Estimated memory held by the action, in bytes."""
+        if self.inverse is None:
+            return sys.getsizeof(self)
+        return sys.getsizeof(self) + sys.getsizeof(self.inverse)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, BrushAction):
+            return NotImplemented
+        return (self.layer_index, self.px, self.py, self.size, self.shape) == (other.layer_index, other.px, other.py, other.size, other.shape)
+
+    def __repr__(self) -> str:
+        return f"BrushAction({self.layer.name}, {self.px}, {self.py}, size={self.size}, shape={self.shape!r})"
+
+
+class StrokeAction:
+    """
+    Everything painted between pressing and releasing the mouse, as one action.
+    Holds the layer index and every square touched, once each, in the order
+    they were first painted, packed as x, y pairs, with one inverse token per square.
+    """
+
+    __slots__ = ("layer_index", "cells", "inverse")
+    is_special = False
+
+    def __init__(self, layer: Layer, cells=()) -> None:
+        self.layer_index = layer.index
+        self.cells = array("I")
+        self.inverse = array("b")
+        for x, y in cells:
+            self.add_cell(x, y)
+
+    @property
+    def layer(self) -> Layer:
+        return get_layers()[self.layer_index]
+
+    def add_cell(self, x: int, y: int, inverse: int | None = None) -> None:
+        """
+        Adds a square to the stroke. The caller makes sure each square is only added once.
+        inverse is the token add_undoable returned when the square was painted, if it was.
+        """
+        self.cells.append(x)
+        self.cells.append(y)
+        if inverse is not None:
+            self.inverse.append(inverse)
+
+    def __len__(self) -> int:
+        return len(self.cells) // 2
+
+    def undo_apply(self, grid: Grid):
+        cells = self.cells
+        if len(self.inverse) != len(self):
+            layer = self.layer
+            for i in range(0, len(cells), 2):
+                grid[cells[i]][cells[i+1]].erase(layer)
+            return
+        inverse = self.inverse
+        for i in range(len(inverse) - 1, -1, -1):
+            grid[cells[2*i]][cells[2*i+1]].undo_add(inverse[i])
+
+    def redo_apply(self, grid: Grid):
+        layer = self.layer
+        cells = self.cells
+        self.inverse = array("b", [grid[cells[i]][cells[i+1]].add_undoable(layer) for i in range(0, len(cells), 2)])
+
+    def save_inverse(self):
+        """Returns the inverse tokens of the action, for load_inverse to put back."""
+        return self.inverse
+
+    def load_inverse(self, saved) -> None:
+        """Puts back the inverse tokens returned by save_inverse."""
+        self.inverse = saved
+
+    def nbytes(self) -> int:
+        """Estimated memory held by the action, in bytes."""
+        return sys.getsizeof(self) + sys.getsizeof(self.cells) + sys.getsizeof(self.inverse)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, StrokeAction):
+            return NotImplemented
+        return (self.layer_index, self.cells) == (other.layer_index, other.cells)
+
+    def __repr__(self) -> str:
+        return f"StrokeAction({self.layer.name}, {len(self)} squares)"
+
+
+class JumpAction:
+    """
+    A jump of the grid between two states, such as UndoTracker.goto, which may
+    restore a keyframe rather than apply actions. Holds both states as
+    snapshot.dumps, so the replay shows the jump as it happened.
+    """
+
+    __slots__ = ("before", "after")
+    is_special = False
+
+    def __init__(self, before: bytes, after: bytes) -> None:
+        self.before = before
+        self.after = after
+
+    def undo_apply(self, grid: Grid):
+        snapshot.restore(grid, self.before)
+
+    def redo_apply(self, grid: Grid):
+        snapshot.restore(grid, self.after)
+
+    def save_inverse(self):
+        """A jump needs no inverse tokens."""
+        return None
+
+    def load_inverse(self, saved) -> None:
+        pass
+
+    def nbytes(self) -> int:
+        """Estimated memory held by the action, in bytes."""
+        return sys.getsizeof(self) + sys.getsizeof(self.before) + sys.getsizeof(self.after)
+
+    def __repr__(self) -> str:
+        return f"JumpAction({len(self.before)} -> {len(self.after)} bytes)"
@@ -0,0 +1,475 @@
+"""
+NumPy-backed grid.
+
+Stores the layer state of every grid square in NumPy arrays instead of one
+LayerStore object per square, so that a whole frame can be composited in a
+single batched pass.
+"""
+
+from __future__ import annotations
+from array import array
+import numpy as np
+from data_structures.referential_array import ArrayR
+from grid import Grid
+from layer_store import AdditiveLayerStore
+from layer_util import Layer, get_layers
+
+
+def registered_layers() -> list[Layer]:
+    """
+    Returns all registered layers, in index order.
+
+    Complexity:
+    - O(n) where n is the capacity of the layer registry.
+    """
+    found = []
+    for layer in get_layers():
+        if layer is None:
+            break
+        found.append(layer)
+    return found
+
+
+class ArrayGrid(Grid):
+    """
+    Grid whose layer state is kept in NumPy arrays.
+
+    - SET: one layer index per square (-1 for nothing) and one special flag per square.
+    - ADD: an ordered (x, y, depth) array of layer indices and a layer count per square.
+    - SEQUENCE: a bitmask of applied layer indices per square.
+
+    Squares can still be reached with grid[x][y], which returns a light proxy
+    supporting the usual LayerStore methods, so actions, undo and replay work unchanged.
+    """
+
+    EMPTY = -1
+    INITIAL_DEPTH = 4
+
+    def __init__(self, draw_style: str, x: int, y: int) -> None:
+        """
+        Initialise the grid object.
+
+        Args:
+        - draw_style = One of DRAW_STYLE_OPTIONS
+        - x, y = The dimensions of the grid
+
+        Raises:
+        - ValueError if the draw style is not one of DRAW_STYLE_OPTIONS
+
+        Complexity:
+        - O(x*y) to allocate the state arrays.
+        """
+        if draw_style not in self.DRAW_STYLE_OPTIONS:
+            raise ValueError(f"Unknown draw style {draw_style}")
+        # Grid.__init__ would create a LayerStore per square, so its attributes are set here.
+        self.draw_style = draw_style
+        self.x = x
+        self.y = y
+        self.sparse = False
+        self.xs, self.ys = np.indices((x, y))
+        self.dirty = set()
+        self.animated = set() #Unused, take_dirty finds the animated squares from the arrays
+        if draw_style == self.DRAW_STYLE_SET:
+            self.set_layer = np.full((x, y), self.EMPTY, dtype=np.int16)
+            self.set_flag = np.zeros((x, y), dtype=bool)
+        elif draw_style == self.DRAW_STYLE_ADD:
+            self.add_layers = np.full((x, y, self.INITIAL_DEPTH), self.EMPTY, dtype=np.int16)
+            self.add_count = np.zeros((x, y), dtype=np.int16)
+        else:
+            self.seq_mask = np.zeros((x, y), dtype=np.uint32)
+        self.grid = ArrayR(x)
+        for i in range(x):
+            self.grid[i] = _ArrayColumn(self, i)
+
+    # Per square operations, used by the _ArrayCell proxies.
+
+    def add_at(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        Add a layer to the square at (x, y), following the semantics of the
+        LayerStore matching the draw style.
+
+        Raises:
+        - Exception if an additive square already holds MAX_CAPACITY layers
+
+        Returns:
+        - True if the square was actually changed
+
+        Complexity:
+        - O(1) amortised, O(x*y*depth) when the additive depth has to grow.
+        """
+        if self.draw_style == self.DRAW_STYLE_SET:
+            was_empty = self.set_layer[x, y] == self.EMPTY
+            self.set_layer[x, y] = layer.index
+            self.dirty.add((x, y))
+            return bool(was_empty)
+        if self.draw_style == self.DRAW_STYLE_ADD:
+            count = int(self.add_count[x, y])
+            if count >= AdditiveLayerStore.MAX_CAPACITY:
+                raise Exception("Queue is full")
+            if count == self.add_layers.shape[2]:
+                self._grow_depth()
+            self.add_layers[x, y, count] = layer.index
+            self.add_count[x, y] = count + 1
+            self.dirty.add((x, y))
+            return True
+        bit = np.uint32(1 << layer.index)
+        if self.seq_mask[x, y] & bit:
+            return False
+        self.seq_mask[x, y] |= bit
+        self.dirty.add((x, y))
+        return True
+
+    def erase_at(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        Complete the erase action on the square at (x, y).
+
+        Returns:
+        - True if the square was actually changed
+
+        Complexity:
+        - O(1) for SET and SEQUENCE, O(depth) for ADD as the layers shift left.
+        """
+        if self.draw_style == self.DRAW_STYLE_SET:
+            if self.set_layer[x, y] == self.EMPTY:
+                return False
+            self.set_layer[x, y] = self.EMPTY
+            self.dirty.add((x, y))
+            return True
+        if self.draw_style == self.DRAW_STYLE_ADD:
+            count = int(self.add_count[x, y])
+            if count == 0:
+                return False
+            self.add_layers[x, y, :count-1] = self.add_layers[x, y, 1:count]
+            self.add_layers[x, y, count-1] = self.EMPTY
+            self.add_count[x, y] = count - 1
+            self.dirty.add((x, y))
+            return True
+        bit = np.uint32(1 << layer.index)
+        if not self.seq_mask[x, y] & bit:
+            return False
+        self.seq_mask[x, y] &= ~bit
+        self.dirty.add((x, y))
+        return True
+
+    def special_at(self, x: int, y: int) -> None:
+        """
+        Activate the special effect on the square at (x, y).
+
+        Complexity:
+        - O(depth) for ADD, O(L log L) for SEQUENCE where L is the number of layers.
+        """
+        if self.draw_style == self.DRAW_STYLE_SET:
+            self.set_flag[x, y] = not self.set_flag[x, y]
+        elif self.draw_style == self.DRAW_STYLE_ADD:
+            count = int(self.add_count[x, y])
+            self.add_layers[x, y, :count] = self.add_layers[x, y, :count][::-1]
+        else:
+            self.seq_mask[x, y] = self._median_removed(int(self.seq_mask[x, y]))
+        self.dirty.add((x, y))
+
+    def add_undoable_at(self, x: int, y: int, layer: Layer) -> int:
+        """
+        Adds a layer to the square at (x, y), as add_at does, and returns the
+        inverse token of LayerStore.add_undoable for the matching draw style.
+
+        Complexity:
+        - O(add_at)
+        """
+        if self.draw_style == self.DRAW_STYLE_SET:
+            token = int(self.set_layer[x, y])
+            self.add_at(x, y, layer)
+            return token
+        if self.draw_style == self.DRAW_STYLE_ADD:
+            self.add_at(x, y, layer)
+            return 0
+        return layer.index if self.add_at(x, y, layer) else -1
+
+    def undo_add_at(self, x: int, y: int, token: int) -> None:
+        """
+        Undoes an add_undoable_at on the square at (x, y), given its token.
+
+        Complexity:
+        - O(1)
+        """
+        if self.draw_style == self.DRAW_STYLE_SET:
+            self.set_layer[x, y] = token
+        elif self.draw_style == self.DRAW_STYLE_ADD:
+            count = int(self.add_count[x, y]) - 1
+            if count < 0: #Nothing to remove, as with an empty LayerStore
+                return
+            self.add_layers[x, y, count] = self.EMPTY
+            self.add_count[x, y] = count
+        elif token >= 0:
+            self.seq_mask[x, y] &= ~np.uint32(1 << token)
+        self.dirty.add((x, y))
+
+    def special_undoable_at(self, x: int, y: int) -> int:
+        """
+        Activates the special effect on the square at (x, y), as special_at does, and
+        returns the inverse token of LayerStore.special_undoable for the matching draw style.
+
+        Complexity:
+        - O(special_at)
+        """
+        if self.draw_style != self.DRAW_STYLE_SEQUENCE:
+            self.special_at(x, y)
+            return 0
+        old = int(self.seq_mask[x, y])
+        self.special_at(x, y)
+        return (old ^ int(self.seq_mask[x, y])).bit_length() - 1
+
+    def undo_special_at(self, x: int, y: int, token: int) -> None:
+        """
+        Undoes a special_undoable_at on the square at (x, y), given its token.
+
+        Complexity:
+        - O(special_at) for SET and ADD, O(1) for SEQUENCE.
+        """
+        if self.draw_style != self.DRAW_STYLE_SEQUENCE:
+            self.special_at(x, y)
+        elif token >= 0:
+            self.seq_mask[x, y] |= np.uint32(1 << token)
+            self.dirty.add((x, y))
+
+    def snapshot_at(self, x: int, y: int):
+        """
+        Returns the layers of the square at (x, y) in the format of LayerStore.snapshot
+        for the matching draw style, so that snapshot.dumps works on an ArrayGrid.
+
+        Complexity:
+        - O(1), O(depth) for ADD.
+        """
+        if self.draw_style == self.DRAW_STYLE_SET:
+            return (int(self.set_layer[x, y]), bool(self.set_flag[x, y]))
+        if self.draw_style == self.DRAW_STYLE_ADD:
+            return tuple(self.add_layers[x, y, :int(self.add_count[x, y])].tolist())
+        return int(self.seq_mask[x, y])
+
+    def restore_at(self, x: int, y: int, state) -> None:
+        """
+        Replaces the layers of the square at (x, y) with a state returned by snapshot_at.
+
+        Complexity:
+        - O(1), O(depth) for ADD, plus O(x*y*depth) when the additive depth has to grow.
+        """
+        if self.draw_style == self.DRAW_STYLE_SET:
+            self.set_layer[x, y], self.set_flag[x, y] = state
+        elif self.draw_style == self.DRAW_STYLE_ADD:
+            while len(state) > self.add_layers.shape[2]:
+                self._grow_depth()
+            self.add_layers[x, y, :] = self.EMPTY
+            self.add_layers[x, y, :len(state)] = state
+            self.add_count[x, y] = len(state)
+        else:
+            self.seq_mask[x, y] = state
+        self.dirty.add((x, y))
+
+    def color_at(self, cx: int, cy: int, start, timestamp: float, x: int, y: int) -> tuple[int, int, int]:
+        """
+        Returns the colour of the square at (cx, cy), one layer at a time.
+        x and y are passed on to the layers, as in LayerStore.get_color.
+
+        Complexity:
+        - O(k * apply) where k is the number of layers on the square.
+        """
+        layers = get_layers()
+        if self.draw_style == self.DRAW_STYLE_SET:
+            index = int(self.set_layer[cx, cy])
+            if index != self.EMPTY:
+                start = layers[index].apply(start, timestamp, x, y)
+            if self.set_flag[cx, cy]:
+                start = (255-start[0], 255-start[1], 255-start[2])
+            return start
+        if self.draw_style == self.DRAW_STYLE_ADD:
+            for d in range(int(self.add_count[cx, cy])):
+                start = layers[int(self.add_layers[cx, cy, d])].apply(start, timestamp, x, y)
+            return start
+        mask = int(self.seq_mask[cx, cy])
+        for layer in registered_layers():
+            if mask >> layer.index & 1:
+                start = layer.apply(start, timestamp, x, y)
+        return start
+
+    # Whole grid operations.
+
+    def special(self) -> None:
+        """
+        Activate the special effect on all grid squares at once.
+
+        Complexity:
+        - SET: O(x*y). ADD: O(x*y*depth).
+        - SEQUENCE: O(x*y + u * L log L) where u is the number of distinct layer combinations.
+        """
+        if self.draw_style == self.DRAW_STYLE_SET:
+            np.logical_not(self.set_flag, out=self.set_flag)
+        elif self.draw_style == self.DRAW_STYLE_ADD:
+            depth = np.arange(self.add_layers.shape[2])
+            count = self.add_count[..., None]
+            source = np.where(depth < count, count - 1 - depth, depth)
+            self.add_layers = np.take_along_axis(self.add_layers, source, axis=2)
+        else:
+            masks, inverse = np.unique(self.seq_mask, return_inverse=True)
+            removed = np.array([self._median_removed(int(m)) for m in masks], dtype=np.uint32)
+            self.seq_mask = removed[inverse].reshape(self.x, self.y)
+        self.dirty.update(zip(self.xs.ravel().tolist(), self.ys.ravel().tolist()))
+
+    def special_undoable(self) -> array | None:
+        """
+        Activate the special effect on all grid squares at once, and returns the
+        record Grid.undo_special needs (see Grid.special_undoable).
+
+        Complexity:
+        - O(special), plus O(r) to build the record of the r squares that lost a layer.
+        """
+        if self.draw_style != self.DRAW_STYLE_SEQUENCE:
+            self.special()
+            return None
+        old = self.seq_mask
+        self.special()
+        removed = old ^ self.seq_mask
+        xs, ys = np.nonzero(removed)
+        index = np.log2(removed[xs, ys]).astype(np.int64)
+        record = array("i")
+        record.frombytes(np.stack((xs, ys, index), axis=1).astype(np.int32).tobytes())
+        return record
+
+    def take_dirty(self) -> set[tuple[int, int]]:
+        """
+        Returns the squares whose colour has to be recomputed this frame
+        (see Grid.take_dirty), and starts tracking changes for the next one.
+
+        Complexity:
+        - O(x*y) vectorised to find the squares with time dependent layers, plus O(d + a).
+        """
+        animated = np.argwhere(self.time_dependent_mask())
+        squares = self.dirty
+        squares.update(map(tuple, animated.tolist()))
+        self.dirty = set()
+        return squares
+
+    def time_dependent_mask(self) -> np.ndarray:
+        """Returns an (x, y) boolean array marking squares holding a time dependent layer."""
+        animated = [layer.index for layer in registered_layers() if layer.time_dependent]
+        if self.draw_style == self.DRAW_STYLE_SET:
+            return np.isin(self.set_layer, animated)
+        if self.draw_style == self.DRAW_STYLE_ADD:
+            return np.isin(self.add_layers, animated).any(axis=2)
+        bits = sum(1 << index for index in animated)
+        return self.seq_mask & np.uint32(bits) != 0
+
+    def render(self, start, timestamp: float) -> np.ndarray:
+        """
+        Composites the whole grid in one batched pass.
+
+        Args:
+        - start = The starting (background) colour
+        - timestamp = Used by some layers for dynamic effects
+
+        Returns:
+        - An (x, y, 3) uint8 array holding the colour of every square
+
+        Complexity:
+        - SET and SEQUENCE: O(L) batched layer applications (see Layer.apply_array).
+        - ADD: O(depth * L) batched layer applications, where depth is the largest layer count.
+        """
+        out = np.empty((self.x, self.y, 3), dtype=np.int64)
+        out[:] = tuple(start)
+        layers = registered_layers()
+        if self.draw_style == self.DRAW_STYLE_SET:
+            for layer in layers:
+                self._apply_masked(out, layer, self.set_layer == layer.index, timestamp)
+            out[self.set_flag] = 255 - out[self.set_flag]
+        elif self.draw_style == self.DRAW_STYLE_ADD:
+            for d in range(int(self.add_count.max(initial=0))):
+                column = self.add_layers[:, :, d]
+                active = self.add_count > d
+                for index in np.unique(column[active]).tolist():
+                    self._apply_masked(out, layers[index], active & (column == index), timestamp)
+        else:
+            for layer in layers:
+                self._apply_masked(out, layer, (self.seq_mask >> layer.index) & 1 == 1, timestamp)
+        return out.astype(np.uint8)
+
+    def _apply_masked(self, out: np.ndarray, layer: Layer, mask: np.ndarray, timestamp: float) -> None:
+        """Applies a layer to the squares selected by a boolean mask, in place."""
+        if not mask.any():
+            return
+        out[mask] = layer.apply_array(out[mask], timestamp, self.xs[mask], self.ys[mask])
+
+    def _grow_depth(self) -> None:
+        """Doubles the number of additive layer slots per square."""
+        depth = min(2 * self.add_layers.shape[2], AdditiveLayerStore.MAX_CAPACITY)
+        grown = np.full((self.x, self.y, depth), self.EMPTY, dtype=np.int16)
+        grown[:, :, :self.add_layers.shape[2]] = self.add_layers
+        self.add_layers = grown
+
+    @staticmethod
+    def _median_removed(mask: int) -> int:
+        """
+        Returns the sequence bitmask with the median `name` layer removed,
+        picking the lexicographically smaller one when there are two medians.
+        """
+        applied = sorted(
+            (layer for layer in registered_layers() if mask >> layer.index & 1),
+            key=lambda layer: layer.name,
+        )
+        n = len(applied)
+        if n == 0:
+            return mask
+        median = applied[(n//2)-1] if n % 2 == 0 else applied[n//2]
+        return mask & ~(1 << median.index)
+
+
+class _ArrayColumn:
+    """A column of an ArrayGrid, so that grid[x][y] keeps working."""
+
+    def __init__(self, grid: ArrayGrid, x: int) -> None:
+        self.grid = grid
+        self.x = x
+
+    def __len__(self) -> int:
+        return self.grid.y
+
+    def __getitem__(self, y: int) -> _ArrayCell:
+        if not 0 <= y < self.grid.y:
+            raise IndexError(y)
+        return _ArrayCell(self.grid, self.x, y)
+
+
+class _ArrayCell:
+    """A single square of an ArrayGrid, offering the LayerStore interface."""
+
+    def __init__(self, grid: ArrayGrid, x: int, y: int) -> None:
+        self.grid = grid
+        self.x = x
+        self.y = y
+
+    def add(self, layer: Layer) -> bool:
+        return self.grid.add_at(self.x, self.y, layer)
+
+    def erase(self, layer: Layer) -> bool:
+        return self.grid.erase_at(self.x, self.y, layer)
+
+    def special(self) -> None:
+        self.grid.special_at(self.x, self.y)
+
+    def add_undoable(self, layer: Layer) -> int:
+        return self.grid.add_undoable_at(self.x, self.y, layer)
+
+    def undo_add(self, token: int) -> None:
+        self.grid.undo_add_at(self.x, self.y, token)
+
+    def special_undoable(self) -> int:
+        return self.grid.special_undoable_at(self.x, self.y)
+
+    def undo_special(self, token: int) -> None:
+        self.grid.undo_special_at(self.x, self.y, token)
+
+    def snapshot(self):
+        return self.grid.snapshot_at(self.x, self.y)
+
+    def restore(self, state) -> None:
+        self.grid.restore_at(self.x, self.y, state)
+
+    def get_color(self, start, timestamp: float, x: int, y: int) -> tuple[int, int, int]:
+        return self.grid.color_at(self.x, self.y, start, timestamp, x, y)
@@ -0,0 +1,61 @@
+"""
+Benchmark for the memory of the paint history.
+
+Builds the undo and replay history of 10,000 dabs at the largest brush size,
+as the previous on_paint did (one PaintStep per square, in two PaintActions
+sharing the list) and with one BrushAction per dab, and reports the memory
+each takes.
+
+Usage: python -m benchmarks.bench_action_memory
+"""
+
+import tracemalloc
+from action import BrushAction, PaintAction, PaintStep
+from brush import stencil_cells
+from grid import Grid
+from layers import red
+
+DABS = 10000
+SIZE = Grid.MAX_BRUSH
+GRID = 64
+
+
+def step_history() -> list:
+    history = []
+    for i in range(DABS):
+        px, py = i % GRID, (i // GRID) % GRID
+        steps = [PaintStep((x, y), red) for x, y in stencil_cells(px, py, SIZE, GRID, GRID)]
+        history.append(PaintAction(steps, False))
+        history.append(PaintAction(steps, False))
+    return history
+
+
+def brush_history() -> list:
+    history = []
+    for i in range(DABS):
+        action = BrushAction(red, i % GRID, (i // GRID) % GRID, SIZE)
+        history.append(action)
+        history.append(action)
+    return history
+
+
+def measure(build) -> int:
+    """Returns the bytes still allocated by the history build returns."""
+    tracemalloc.start()
+    history = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del history
+    return size
+
+
+def main() -> None:
+    steps = measure(step_history)
+    brush = measure(brush_history)
+    print(f"{DABS} dabs of size {SIZE}")
+    print(f"PaintStep history:   {steps/1e6:8.2f} MB")
+    print(f"BrushAction history: {brush/1e6:8.2f} MB ({steps/brush:.0f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Import time benchmark.
+
+Imports each module in a fresh interpreter and reports how long the import
+took, and whether it pulled in the windowing stack. The engine modules must
+stay under STARTUP_BUDGET seconds, which this benchmark enforces by exiting
+with status 1 when one of them is over it, and must never import arcade or
+pyglet, which is also checked by tests/test_misc/test_engine.py.
+
+Usage: python -m benchmarks.bench_import
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENGINE_MODULES = ("grid", "layer_store", "layers", "action", "snapshot", "undo", "replay", "journal", "engine")
+GUI_MODULES = ("main",)
+STARTUP_BUDGET = 0.25
+GUI_PACKAGES = ("arcade", "pyglet")
+
+SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+gui = any(name.split(".")[0] in {gui!r} for name in sys.modules)
+print(elapsed, int(gui))
+"""
+
+
+def import_time(module: str, repeat: int = 3) -> tuple[float, bool]:
+    """
+    Returns the fastest of repeat imports of module, each in a fresh
+    interpreter, in seconds, and whether it imported arcade or pyglet.
+    """
+    best, gui = None, False
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", SCRIPT.format(module=module, gui=GUI_PACKAGES)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        elapsed, imported_gui = result.stdout.split()
+        best = float(elapsed) if best is None else min(best, float(elapsed))
+        gui = gui or imported_gui == "1"
+    return best, gui
+
+
+def main() -> int:
+    """Prints the import times, and returns 1 if an engine module is over budget or imports the GUI."""
+    over = []
+    print(f"{'module':>12} {'import (ms)':>12} {'arcade':>7}")
+    for module in ENGINE_MODULES + GUI_MODULES:
+        try:
+            elapsed, gui = import_time(module)
+        except subprocess.CalledProcessError as e:
+            print(f"{module:>12} {'failed':>12}   ({e.stderr.strip().splitlines()[-1]})")
+            if module in ENGINE_MODULES:
+                over.append(module)
+            continue
+        print(f"{module:>12} {elapsed*1000:>12.1f} {'yes' if gui else 'no':>7}")
+        if module in ENGINE_MODULES and (elapsed > STARTUP_BUDGET or gui):
+            over.append(module)
+    print(f"Engine budget: {STARTUP_BUDGET*1000:.0f} ms")
+    if over:
+        print(f"Over budget: {', '.join(over)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
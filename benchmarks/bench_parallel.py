@@ -0,0 +1,57 @@
+"""
+Benchmark for parallel_render.composite_parallel.
+
+Composites one frame of a grid covered in sparkle and rainbow layers, in
+this process and then on process pools of growing size, and checks every
+result matches the single process one.
+
+Usage: python -m benchmarks.bench_parallel [size]
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from grid import Grid
+from layers import invert, rainbow, sparkle
+from parallel_render import composite_parallel, composite_serial
+
+SIZE = 256
+TIMESTAMP = 12.5
+
+
+def painted_grid(size: int) -> Grid:
+    grid = Grid(Grid.DRAW_STYLE_SEQUENCE, size, size)
+    for x in range(size):
+        for y in range(size):
+            grid[x][y].add(rainbow)
+            grid[x][y].add(sparkle)
+            if (x + y) % 2:
+                grid[x][y].add(invert)
+    return grid
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else SIZE
+    grid = painted_grid(size)
+    start = time.perf_counter()
+    expected = composite_serial(grid, (255, 255, 255), TIMESTAMP)
+    serial = time.perf_counter() - start
+    print(f"{size}x{size} grid, {os.cpu_count()} cores")
+    print(f"{'processes':>9} {'frame (ms)':>11} {'speedup':>8}")
+    print(f"{'serial':>9} {serial*1000:>11.1f} {1:>7.1f}x")
+    workers = 1
+    while workers <= os.cpu_count():
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Warm the pool up, so process start up is not measured.
+            composite_parallel(grid, (255, 255, 255), TIMESTAMP, pool)
+            start = time.perf_counter()
+            colors = composite_parallel(grid, (255, 255, 255), TIMESTAMP, pool)
+            elapsed = time.perf_counter() - start
+        assert colors == expected
+        print(f"{workers:>9} {elapsed*1000:>11.1f} {serial/elapsed:>7.1f}x")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
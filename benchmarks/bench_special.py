@@ -0,0 +1,58 @@
+"""
+Benchmark for Grid.special on additive grids.
+
+Compares the in-place reversal used by AdditiveLayerStore.special with the
+previous approach, which copied every square's layers through a new
+ArrayStack and CircularQueue of len * 1000 slots.
+
+Usage: python -m benchmarks.bench_special
+"""
+
+import time
+from data_structures.queue_adt import CircularQueue
+from data_structures.stack_adt import ArrayStack
+from grid import Grid
+from layers import invert, lighten, rainbow
+
+SIZES = (8, 16, 32)
+LAYERS = 100
+
+
+def copying_special(store) -> None:
+    """The previous AdditiveLayerStore.special, kept here as a baseline."""
+    new_stack = ArrayStack(len(store.AppliedLayer) * 1000)
+    new_queue = CircularQueue(len(store.AppliedLayer) * 1000)
+    for _ in range(store.size):
+        new_stack.push(store.AppliedLayer.serve())
+    for _ in range(store.size):
+        new_queue.append(new_stack.pop())
+    store.AppliedLayer = new_queue
+
+
+def full_grid(size: int) -> Grid:
+    grid = Grid(Grid.DRAW_STYLE_ADD, size, size)
+    layers = (lighten, invert, rainbow)
+    for x in range(size):
+        for y in range(size):
+            for i in range(LAYERS):
+                grid[x][y].add(layers[i % 3])
+    return grid
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    print(f"{'grid':>8} {'in place (ms)':>14} {'copying (ms)':>14} {'speedup':>8}")
+    for size in SIZES:
+        grid = full_grid(size)
+        in_place = timed(grid.special)
+        copying = timed(lambda: [copying_special(grid[x][y]) for x in range(size) for y in range(size)])
+        print(f"{f'{size}x{size}':>8} {in_place*1000:>14.1f} {copying*1000:>14.1f} {copying/in_place:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
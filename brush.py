@@ -0,0 +1,127 @@
+"""
+Brush stencils and stroke rasterization.
+
+A stencil is the list of (dx, dy) offsets that a brush of a given shape and
+size covers around its centre. Stencils only depend on the shape and size,
+so they are built once and cached, and a paint only has to visit the
+squares under the brush rather than the whole grid.
+
+A mouse drag is turned into grid squares with traverse_cells, which walks
+the squares a segment crosses (a DDA walk in grid space), and swept_cells,
+which gives the union of the brush stencils along such a path.
+"""
+
+import math
+
+BRUSH_DIAMOND = "DIAMOND"
+BRUSH_SHAPES = (
+    BRUSH_DIAMOND,
+)
+
+_STENCILS: dict[tuple[str, int], tuple[tuple[int, int], ...]] = {}
+
+
+def get_stencil(size: int, shape: str = BRUSH_DIAMOND) -> tuple[tuple[int, int], ...]:
+    """
+    Returns the offsets covered by a brush, sorted by dx and then dy.
+
+    Args:
+    - size = The brush size
+    - shape = One of BRUSH_SHAPES. DIAMOND covers every offset within
+      Manhattan distance `size` of the centre.
+
+    Raises:
+    - ValueError if the shape is not one of BRUSH_SHAPES
+
+    Returns:
+    - A tuple of (dx, dy) offsets
+
+    Complexity:
+    - O(1) once the stencil is cached, O(size^2) the first time it is built.
+    """
+    key = (shape, size)
+    stencil = _STENCILS.get(key)
+    if stencil is None:
+        if shape != BRUSH_DIAMOND:
+            raise ValueError(f"Unknown brush shape {shape}")
+        stencil = tuple(
+            (dx, dy)
+            for dx in range(-size, size+1)
+            for dy in range(-size, size+1)
+            if abs(dx) + abs(dy) <= size
+        )
+        _STENCILS[key] = stencil
+    return stencil
+
+
+def stencil_cells(px: int, py: int, size: int, width: int, height: int, shape: str = BRUSH_DIAMOND) -> list[tuple[int, int]]:
+    """
+    Returns the grid squares covered by a brush centred on (px, py),
+    clipped to the grid [0, width) x [0, height).
+
+    Complexity:
+    - O(size^2), the area of the brush, regardless of the grid size.
+    """
+    cells = []
+    for dx, dy in get_stencil(size, shape):
+        x = px + dx
+        y = py + dy
+        if 0 <= x < width and 0 <= y < height:
+            cells.append((x, y))
+    return cells
+
+
+def traverse_cells(x0: float, y0: float, x1: float, y1: float, cell_width: float = 1, cell_height: float = 1):
+    """
+    Yields every grid square crossed by the segment from (x0, y0) to (x1, y1),
+    exactly once, in order from the start square to the end square. Consecutive
+    squares share an edge.
+
+    Args:
+    - x0, y0, x1, y1 = The ends of the segment, in pixels
+    - cell_width, cell_height = The size of a grid square, in pixels
+
+    Complexity:
+    - O(n), where n is the number of squares crossed, whatever the length of the segment in pixels.
+    """
+    gx0, gy0 = x0 / cell_width, y0 / cell_height
+    gx1, gy1 = x1 / cell_width, y1 / cell_height
+    cx, cy = math.floor(gx0), math.floor(gy0)
+    ex, ey = math.floor(gx1), math.floor(gy1)
+    dx, dy = gx1 - gx0, gy1 - gy0
+    step_x = 1 if dx > 0 else -1
+    step_y = 1 if dy > 0 else -1
+    # How far along the segment (0 to 1) one square is, and where the next square boundary is.
+    delta_x = abs(1 / dx) if dx else math.inf
+    delta_y = abs(1 / dy) if dy else math.inf
+    next_x = ((cx + 1 - gx0) if dx > 0 else (gx0 - cx)) * delta_x if dx else math.inf
+    next_y = ((cy + 1 - gy0) if dy > 0 else (gy0 - cy)) * delta_y if dy else math.inf
+    yield cx, cy
+    for _ in range(abs(ex - cx) + abs(ey - cy)):
+        if (next_x < next_y and cx != ex) or cy == ey:
+            cx += step_x
+            next_x += delta_x
+        else:
+            cy += step_y
+            next_y += delta_y
+        yield cx, cy
+
+
+def swept_cells(path, size: int, width: int, height: int, shape: str = BRUSH_DIAMOND) -> list[tuple[int, int]]:
+    """
+    Returns the union of the squares covered by a brush centred on each square of path,
+    clipped to the grid [0, width) x [0, height), each once, in the order they are first covered.
+
+    Complexity:
+    - O(p * size^2) for a path of p squares.
+    """
+    stencil = get_stencil(size, shape)
+    seen = set()
+    cells = []
+    for px, py in path:
+        for dx, dy in stencil:
+            cell = (px + dx, py + dy)
+            if cell not in seen and 0 <= cell[0] < width and 0 <= cell[1] < height:
+                seen.add(cell)
+                cells.append(cell)
+    return cells
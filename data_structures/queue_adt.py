@@ -89,10 +89,49 @@ class CircularQueue(Queue[T]):
         self.front = (self.front+1) % len(self.array)
         return item
 
+    def pop_rear(self) -> T:
+        """ Deletes and returns the element at the queue's rear, the last one appended.
+        :pre: queue is not empty
+        :raises Exception: if the queue is empty
+        :complexity: O(1)
+        """
+        if self.is_empty():
+            raise Exception("Queue is empty")
+
+        self.length -= 1
+        self.rear = (self.rear - 1) % len(self.array)
+        return self.array[self.rear]
+
     def is_full(self) -> bool:
         """ True if the queue is full and no element can be appended. """
         return len(self) == len(self.array)
 
+    def __getitem__(self, index: int) -> T:
+        """ Returns the element at position index, counting from the front,
+            without changing the queue.
+        :complexity: O(1)
+        :raises IndexError: if index is not in [0, len(self))
+        """
+        if not 0 <= index < len(self):
+            raise IndexError("Queue index out of range")
+        return self.array[(self.front + index) % len(self.array)]
+
+    def reverse(self) -> None:
+        """ Reverses the order of the elements in place, so the rear becomes the front.
+        :complexity: O(n) where n is len(self), with no extra memory
+        """
+        for index in range(len(self) // 2):
+            a = (self.front + index) % len(self.array)
+            b = (self.front + len(self) - 1 - index) % len(self.array)
+            self.array[a], self.array[b] = self.array[b], self.array[a]
+
+    def __iter__(self):
+        """ Iterates over the elements from front to rear, without changing the queue.
+        :complexity: O(1) per element
+        """
+        for index in range(len(self)):
+            yield self.array[(self.front + index) % len(self.array)]
+
     def clear(self) -> None:
         """ Clears all elements from the queue. """
         Queue.__init__(self)
@@ -184,6 +223,43 @@ class TestQueue(unittest.TestCase):
             self.assertEqual(len(queue), 0)
             self.assertTrue(queue.is_empty())
 
+    def test_getitem_and_iter(self):
+        queue = CircularQueue(4)
+        for i in range(4):
+            queue.append(i)
+        queue.serve()
+        queue.serve()
+        queue.append(4)
+        # Wraps around the end of the array.
+        self.assertEqual([queue[i] for i in range(len(queue))], [2, 3, 4])
+        self.assertEqual(list(queue), [2, 3, 4])
+        self.assertEqual((queue.front, queue.rear, len(queue)), (2, 1, 3))
+        with self.assertRaises(IndexError):
+            queue[3]
+
+    def test_reverse(self):
+        queue = CircularQueue(5)
+        for i in range(5):
+            queue.append(i)
+        queue.serve()
+        queue.append(5)
+        queue.reverse()
+        self.assertEqual(list(queue), [5, 4, 3, 2, 1])
+        self.assertEqual(queue.serve(), 5)
+        self.assertEqual(len(queue), 4)
+
+    def test_pop_rear(self):
+        queue = CircularQueue(3)
+        for i in range(3):
+            queue.append(i)
+        queue.serve()
+        queue.append(3)
+        # The rear has wrapped around to the start of the array.
+        self.assertEqual(queue.pop_rear(), 3)
+        self.assertEqual(list(queue), [1, 2])
+        queue.append(4)
+        self.assertEqual(list(queue), [1, 2, 4])
+
 if __name__ == '__main__':
     testtorun = TestQueue()
     suite = unittest.TestLoader().loadTestsFromModule(testtorun)
@@ -1,14 +1,15 @@
 """ Stack ADT and an array implementation.
 
 Defines a generic abstract stack with the usual methods, and implements
-a stack using arrays. Also defines UnitTests for the class.
+a stack using arrays and a bounded one that drops its oldest elements.
+Also defines UnitTests for the class.
 """
 __author__ = "Maria Garcia de la Banda for the base"+"XXXXX student for"
 __docformat__ = 'reStructuredText'
 
 import unittest
 from abc import ABC, abstractmethod
-from typing import TypeVar, Generic
+from typing import TypeVar, Generic, Optional
 from data_structures.referential_array import ArrayR, T
 
 class Stack(ABC, Generic[T]):
@@ -99,6 +100,89 @@ class ArrayStack(Stack[T]):
             raise Exception("Stack is empty")
         return self.array[self.length-1]
 
+class RingStack(Stack[T]):
+    """ Stack with a fixed capacity that never refuses a push: when full, the
+    element at the bottom (the oldest one) is dropped to make room.
+
+    Attributes:
+         length (int): number of elements in the stack (inherited)
+         bottom (int): index of the element at the bottom of the stack
+         array (ArrayR[T]): array storing the elements, used circularly
+
+    ArrayR cannot create empty arrays. So MIN_CAPACITY used to avoid this.
+    """
+    MIN_CAPACITY = 1
+
+    def __init__(self, max_capacity: int) -> None:
+        Stack.__init__(self)
+        self.bottom = 0
+        self.array = ArrayR(max(self.MIN_CAPACITY, max_capacity))
+
+    def is_full(self) -> bool:
+        """ True if the stack is full, so the next push drops the bottom element. """
+        return len(self) == len(self.array)
+
+    def push(self, item: T) -> Optional[T]:
+        """ Pushes an element to the top of the stack.
+        :returns: the bottom element dropped to make room, or None
+        :complexity: O(1)
+        """
+        dropped = self.drop_bottom() if self.is_full() else None
+        self.array[(self.bottom + self.length) % len(self.array)] = item
+        self.length += 1
+        return dropped
+
+    def pop(self) -> T:
+        """ Pops the element at the top of the stack.
+        :pre: stack is not empty
+        :raises Exception: if the stack is empty
+        """
+        if self.is_empty():
+            raise Exception("Stack is empty")
+        self.length -= 1
+        index = (self.bottom + self.length) % len(self.array)
+        item = self.array[index]
+        self.array[index] = None
+        return item
+
+    def peek(self) -> T:
+        """ Returns the element at the top, without popping it from stack.
+        :pre: stack is not empty
+        :raises Exception: if the stack is empty
+        """
+        if self.is_empty():
+            raise Exception("Stack is empty")
+        return self.array[(self.bottom + self.length - 1) % len(self.array)]
+
+    def drop_bottom(self) -> T:
+        """ Removes and returns the element at the bottom of the stack.
+        :pre: stack is not empty
+        :raises Exception: if the stack is empty
+        :complexity: O(1)
+        """
+        if self.is_empty():
+            raise Exception("Stack is empty")
+        item = self.array[self.bottom]
+        self.array[self.bottom] = None
+        self.bottom = (self.bottom + 1) % len(self.array)
+        self.length -= 1
+        return item
+
+    def __getitem__(self, index: int) -> T:
+        """ Returns the element at position index, counting from the bottom.
+        :complexity: O(1)
+        :raises IndexError: if index is not in [0, len(self))
+        """
+        if not 0 <= index < len(self):
+            raise IndexError("Stack index out of range")
+        return self.array[(self.bottom + index) % len(self.array)]
+
+    def clear(self) -> None:
+        """ Clears all elements from the stack. """
+        Stack.__init__(self)
+        self.bottom = 0
+        self.array = ArrayR(len(self.array))
+
 class TestStack(unittest.TestCase):
     """ Tests for the above class."""
     EMPTY = 0
@@ -0,0 +1,457 @@
+"""
+The painting engine, without any user interface.
+
+Everything needed to paint, undo, redo and replay a grid lives in modules
+that never import arcade or pyglet: grid, layer_store, layers, action, undo
+and replay. This module gathers them, and holds the painting logic the
+window runs in response to input (PaintEngine), so that it can also be
+driven headlessly (PaintSession). The window in main.py only adds
+drawing and input on top.
+"""
+
+from __future__ import annotations
+from action import BrushAction, JumpAction, PaintAction, StrokeAction
+from brush import stencil_cells, swept_cells
+from grid import Grid
+from layer_util import Layer
+from replay import ReplayTracker
+from undo import UndoTracker
+import snapshot
+
+
+class PaintEngine:
+    """
+    Painting logic of the window. Expects self.grid to hold the grid being painted.
+    """
+
+    def on_init(self):
+        """Initialisation that occurs after the system initialisation."""
+        self.UndoTracker = UndoTracker()
+        self.ReplayTracker = ReplayTracker()
+        self.journal = None # Set to a journal.Journal to autosave every action
+        self.stroking = False # Whether paints are currently grouped into a stroke
+        self.stroke = None # The StrokeAction being painted
+        self.stroke_cells = set() # The squares already painted by that stroke
+        self.scrub_from = None # snapshot.dumps of the grid before the history scrub in progress, if any
+
+        
+
+    def on_reset(self):
+        """
+        Called when a window reset is requested, once the window has a new grid.
+        The undo and replay histories were of the previous grid, so they start over.
+        """
+        self.UndoTracker = UndoTracker()
+        self.ReplayTracker = ReplayTracker()
+        self.stroking = False
+        self.stroke = None
+        self.stroke_cells = set()
+        self.scrub_from = None
+
+    def begin_stroke(self) -> None:
+        """
+        Called when the mouse is pressed on the grid. Every paint until end_stroke
+        is grouped into a single StrokeAction, painting each square at most once.
+
+        Complexity:
+        - O(end_stroke), to close a stroke left open.
+        """
+        self.end_stroke() #O(end_stroke)
+        self.stroking = True #Assignment is constant --> O(1)
+
+    def end_stroke(self) -> None:
+        """
+        Called when the mouse is released. Adds the stroke painted since
+        begin_stroke, if any, to the undo and replay history as one action.
+        Any history scrub in progress ends first (see end_scrub).
+
+        Complexity:
+        - best case = worst case = O(add_action), plus O(end_scrub) after a scrub
+        """
+        self.end_scrub() #O(1) unless a scrub is in progress
+        stroke = self.stroke #Assignment is constant --> O(1)
+        self.stroking = False #Assignment is constant --> O(1)
+        self.stroke = None #Assignment is constant --> O(1)
+        self.stroke_cells = set() #Assignment is constant --> O(1)
+        if stroke is not None and len(stroke) > 0: #Checking is constant --> O(1)
+            self.UndoTracker.add_action(stroke, self.grid) #Runtime of --> O(add_action)
+            self.ReplayTracker.add_action(stroke) #Runtime of --> O(add_action)
+            if self.journal is not None: #Checking is constant --> O(1)
+                self.journal.record(stroke, self.grid) #O(c) for the c squares of the stroke
+
+    def on_paint(self, layer: Layer, px: int, py:int):
+        """
+        Called when a grid square is clicked on, which should trigger painting in the vicinity.
+        Vicinity squares outside of the range [0, GRID_SIZE_X) or [0, GRID_SIZE_Y) can be safely ignored.
+
+        layer: The layer being applied.
+        px: x position of the brush.
+        py: y position of the brush.
+        
+        Args:
+        - layer = Layer being pained
+        - px = x position of the brush.
+        - py = y position of the brush.
+
+        Raises:
+        - Does not raise any errors
+
+        Returns:
+        - Does not return anything
+
+        Complexity:
+        - The squares under the brush come from a cached stencil (see brush.get_stencil),
+          so only the b squares covered by the brush are visited rather than the whole grid.
+          Therefore, best case = worst case = O(b * add) + O(add_action), where b is
+          O(DEFAULT_BRUSH_SIZE^2).
+        - The history only keeps one compact BrushAction per paint, shared by the
+          undo and replay trackers, instead of b PaintSteps.
+        - During a stroke (see begin_stroke), squares the stroke already painted are skipped,
+          and nothing is added to the history until the stroke ends.
+        
+        """
+        if self.stroking: #Checking is constant --> O(1)
+            self.paint_stroke_cells(layer, stencil_cells(px, py, self.grid.DEFAULT_BRUSH_SIZE, self.grid.x, self.grid.y)) #O(b * add)
+            return
+        if self.scrub_from is not None: #Checking is constant --> O(1)
+            self.end_scrub() #O(end_scrub)
+        action = BrushAction(layer, px, py, self.grid.DEFAULT_BRUSH_SIZE) #Constant --> O(1)
+        action.redo_apply(self.grid) #Will run add for b squares --> O(b * add)
+        self.UndoTracker.add_action(action, self.grid) #Runtime of --> O(add_action)   
+        self.ReplayTracker.add_action(action) #Runtime of --> O(add_action)          
+        if self.journal is not None: #Checking is constant --> O(1)
+            self.journal.record(action, self.grid) #O(1)
+        
+    def on_sweep(self, layer: Layer, path) -> None:
+        """
+        Paints the brush along a path of grid squares in one pass: every square
+        covered by the brush centred on any square of the path is painted once.
+        Outside a stroke, the whole sweep is added to the history as one StrokeAction.
+
+        Args:
+        - layer = The layer being applied
+        - path = The brush centres, such as the squares from brush.traverse_cells
+
+        Complexity:
+        - O(swept_cells) + O(c * add) for the c squares covered.
+        """
+        cells = swept_cells(path, self.grid.DEFAULT_BRUSH_SIZE, self.grid.x, self.grid.y) #O(swept_cells)
+        if self.stroking: #Checking is constant --> O(1)
+            self.paint_stroke_cells(layer, cells) #O(c * add)
+            return
+        if self.scrub_from is not None: #Checking is constant --> O(1)
+            self.end_scrub() #O(end_scrub)
+        action = StrokeAction(layer, cells) #O(c)
+        action.redo_apply(self.grid) #O(c * add)
+        self.UndoTracker.add_action(action, self.grid) #Runtime of --> O(add_action)
+        self.ReplayTracker.add_action(action) #Runtime of --> O(add_action)
+        if self.journal is not None: #Checking is constant --> O(1)
+            self.journal.record(action, self.grid) #O(c)
+
+    def paint_stroke_cells(self, layer: Layer, cells) -> None:
+        """
+        Paints the squares the open stroke has not painted yet, and adds them to it.
+        A different layer from the one of the stroke starts a new stroke.
+
+        Complexity:
+        - O(c * add) for c squares
+        """
+        if self.stroke is not None and self.stroke.layer_index != layer.index: #A new layer starts a new stroke
+            self.begin_stroke() #O(end_stroke)
+        if self.stroke is None: #Checking is constant --> O(1)
+            self.stroke = StrokeAction(layer) #Constant --> O(1)
+        for cell in cells: #Will run for c times
+            if cell not in self.stroke_cells: #Set lookup is constant --> O(1)
+                self.stroke_cells.add(cell) #Constant --> O(1)
+                self.stroke.add_cell(cell[0], cell[1], self.grid[cell[0]][cell[1]].add_undoable(layer)) #O(add)
+
+    def on_undo(self):
+        """
+        Called when an undo is requested.
+
+        Args:
+        - self
+
+        Raises:
+        - Does not raise any errors
+
+        Returns:
+        - Does not return anything
+        
+        Complexity:
+        - Best case = worst case = O(undo)
+
+        """
+        self.end_stroke() #O(end_stroke)
+        action = self.UndoTracker.undo(self.grid) # Run time will be --> O(undo)
+        if action is not None and self.journal is not None: #Checking is constant --> O(1)
+            self.journal.record(action, self.grid, is_undo=True) #O(record)
+
+    def on_redo(self):
+        """
+        Called when a redo is requested.
+        
+
+        Args:
+        - self
+
+        Raises:
+        - Does not raise any errors
+
+        Returns:
+        - Does not return anything
+        
+        Complexity:
+        - Best case = worst case = O(redo)
+        """
+        self.end_stroke() #O(end_stroke)
+        action = self.UndoTracker.redo(self.grid)
+        if action is not None and self.journal is not None: #Checking is constant --> O(1)
+            self.journal.record(action, self.grid) #O(record)
+
+    def on_goto(self, index: int) -> None:
+        """
+        Called when the history is scrubbed to a position, such as from a slider:
+        the grid shows the state after the first index actions of the undo history.
+
+        A scrub is one jump for the replay and the journal, however many positions it
+        goes through: the grid before it is kept by the first call, and the jump is
+        only recorded by end_scrub, which any other action calls first.
+
+        Args:
+        - index = The position, in [0, len(self.UndoTracker)]
+
+        Raises:
+        - IndexError if index is out of range
+
+        Complexity:
+        - O(goto), plus O(snapshot.dumps) for the first call of a scrub.
+        """
+        self.begin_scrub() #O(snapshot.dumps) the first time, O(1) after
+        self.UndoTracker.goto(index, self.grid) #O(goto)
+
+    def on_goto_node(self, node: int) -> None:
+        """
+        Called when another branch of the history is picked: the grid shows the
+        state after the action of node (see UndoTracker.children). Like on_goto,
+        it is part of a scrub, recorded once by end_scrub.
+
+        Raises:
+        - IndexError if node is not in the history
+
+        Complexity:
+        - O(goto_node), plus O(snapshot.dumps) for the first call of a scrub.
+        """
+        self.begin_scrub() #O(snapshot.dumps) the first time, O(1) after
+        self.UndoTracker.goto_node(node, self.grid) #O(goto_node)
+
+    def begin_scrub(self) -> None:
+        """
+        Starts a scrub of the history, unless one is in progress: closes any open
+        stroke and keeps the grid as it is, for the jump end_scrub records.
+
+        Complexity:
+        - O(end_stroke) + O(snapshot.dumps) to start a scrub, O(1) during one.
+        """
+        if self.scrub_from is not None: #Checking is constant --> O(1)
+            return
+        self.end_stroke() #O(end_stroke)
+        self.scrub_from = snapshot.dumps(self.grid) #O(snapshot.dumps)
+
+    def end_scrub(self) -> None:
+        """
+        Ends the scrub of the history in progress, if any, such as when the slider is
+        released: the replay gets one jump from the grid before the scrub to the grid
+        now, which it cannot tell from actions, and the journal a checkpoint, since goto
+        may restore a keyframe rather than undo action by action.
+
+        Complexity:
+        - O(1) without a scrub, O(snapshot.dumps) + O(checkpoint) to end one.
+        """
+        if self.scrub_from is None: #Checking is constant --> O(1)
+            return
+        before, self.scrub_from = self.scrub_from, None #Constant --> O(1)
+        self.ReplayTracker.add_action(JumpAction(before, snapshot.dumps(self.grid))) #O(snapshot.dumps)
+        if self.journal is not None: #Checking is constant --> O(1)
+            self.journal.checkpoint(self.grid) #O(checkpoint)
+
+    def on_special(self):
+        """
+        Called when the special action is requested.
+        
+        Args:
+        - self
+
+        Raises:
+        - Does not raise any errors
+
+        Returns:
+        - Does not raise anything
+
+        Complexity:
+        - As for self.grid.special, in the grid class there are two for loops implemented, 
+          each for loop will run x times and y times no matter circumstance, therefore, 
+          best case = worst case. As the two for loops will be run x times and y times, 
+          the time complexity can be written as O(x) * O(y), re-writing both x and y as "n", we
+          get O(n) * O(n) --> O(k*n^2 ) where k is a constant due to the recursive calling of special each time. Therefore,
+          the overall complexity is represented by O(k*n^2) + O(add_action) --> O(k*n^2 + add_action)
+        - The one PaintAction is shared by the undo and replay trackers and the journal, and keeps
+          the record of special_undoable, so undoing it is exact.
+        """
+        self.end_stroke() #O(end_stroke)
+        action = PaintAction([],True) #Constant --> O(1)
+        action.redo_apply(self.grid) # grid special is --> O(k*n^2) where k is some integer
+        self.UndoTracker.add_action(action, self.grid) #run time of --> O(add_action)
+        self.ReplayTracker.add_action(action) #run time of --> O(add_action)
+        if self.journal is not None: #Checking is constant --> O(1)
+            self.journal.record(action, self.grid) #O(1)
+
+    def on_replay_start(self):
+        """
+        Called when the replay starting is requested. The replay starts over on
+        self.grid, which is brought back to the start of the replay.
+
+        Args:
+        - self
+
+        Raises:
+        - Does not raise any errors
+
+        Returns:
+        - Does not return anything
+        
+        Complexity:
+        - Best case = worst case = O(start_replay)
+        """
+        self.end_stroke() #O(end_stroke)
+        self.ReplayTracker.start_replay(self.grid) #Run time of --> O(start_replay)
+
+    def on_replay_stop(self) -> None:
+        """
+        Called when the replay is finished or left: the grid goes back to the state
+        the replay started from, which the undo history matches.
+
+        Complexity:
+        - Best case = worst case = O(stop_replay)
+        """
+        self.ReplayTracker.stop_replay(self.grid) #Run time of --> O(stop_replay)
+
+    def on_replay_next_step(self) -> bool:
+        """
+        Called when the next step of the replay is requested.
+        Returns whether the replay is finished.
+
+        Args:
+        - self
+
+        Raises:
+        - Does not raise any errors
+
+        Returns:
+        - Returns a boolean depending on result of play_next_action
+        
+        Complexity:
+        - Best case = worst case = O(play_next_action).
+          O(play_next_action) can be written as:
+          As all operations are constant except of those that are of redo_apply and undo_apply,
+          it is safe to assume that best case = worst case. If redo apply is called, then the 
+          run time complexity is equal to O(k) + O(redo_apply) where k is an integer which represents
+          the constant operations. If Undo apply is called, then the 
+          run time complexity is equal to O(k) + O(undo_apply) where k is an integer which represents
+          the constant operations.
+        """
+        return self.ReplayTracker.play_next_action(self.grid) #Run time of --> O(play_next_action)
+
+    def on_replay_advance(self, delta_time: float) -> bool:
+        """
+        Called every frame while replaying. Moves the replay on by delta_time
+        seconds at its speed (see ReplayTracker.advance).
+        Returns whether the replay is finished.
+
+        Complexity:
+        - Best case = worst case = O(advance)
+        """
+        return self.ReplayTracker.advance(delta_time, self.grid) #Run time of --> O(advance)
+
+    def on_replay_seek(self, t: float) -> None:
+        """
+        Called when the replay is moved to time t, in seconds from its start.
+
+        Complexity:
+        - Best case = worst case = O(seek)
+        """
+        self.ReplayTracker.seek(t, self.grid) #Run time of --> O(seek)
+
+    def on_replay_speed(self, speed: float) -> None:
+        """
+        Called when the replay speed is changed. A negative speed plays backwards.
+
+        Complexity:
+        - Best case = worst case = O(1)
+        """
+        self.ReplayTracker.set_speed(speed) #Constant --> O(1)
+
+    def on_increase_brush_size(self):
+        """
+        Called when an increase to the brush size is requested.
+
+        Args:
+        - self
+
+        Raises:
+        - Does not raise any errors
+
+        Returns:
+        - Does not return anything
+
+        Complexity:
+        - best case = worst case = O(increase_brush_size).
+          O(increase_brush_size) can be written as:
+          As we do not always know the default brush size, there are best and worst cases. Best case
+          is if the default brush size is already equal to the brush size in which the while loop will 
+          not need to increment "n" times, rather it will always stop at one size, therefore, Best Case = O(1).
+          The worst case is if it needs to increment, in which it will increment "n" times so that the default 
+          brush size is equal to the Maximum brush size, therefore, worst case = O(n)
+        """
+        self.grid.increase_brush_size() #O(increase_brush_size)
+
+    def on_decrease_brush_size(self):
+        """
+        Called when a decrease to the brush size is requested.
+
+        Args:
+        - self
+
+        Raises:
+        - Does not raise any errors
+
+        Returns:
+        - Does not return anything
+
+        Complexity:
+        - best case = worst case = O(increase_brush_size)
+          O(increase_brush_size) can be written as:
+          As we do not always know the default brush size, there are best and worst cases. Best case
+          is if the default brush size is already equal to the brush size in which the while loop will 
+          not need to decrement "n" times, rather it will always stop at one size, therefore, Best Case = O(1).
+          The worst case is if it needs to decrement, in which it will increment "n" times so that the default 
+          brush size is equal to the Minimum brush size, therefore, worst case = O(n)
+
+        """
+        self.grid.decrease_brush_size() #O(increase_brush_size)
+
+
+
+class PaintSession(PaintEngine):
+    """
+    A grid with its undo and replay trackers, driven without a window.
+
+    Usage:  session = PaintSession(Grid(Grid.DRAW_STYLE_SET, 32, 32))
+            session.on_paint(red, 4, 4)
+            session.on_undo()
+    """
+
+    def __init__(self, grid: Grid) -> None:
+        self.grid = grid
+        self.on_init()
+        self.on_reset()
@@ -0,0 +1,100 @@
+"""
+Batched grid rendering.
+
+The grid squares are uploaded to the GPU once as instanced quads, and each
+frame only the colour buffer is rewritten, so the whole grid is drawn with
+a single draw call instead of one rectangle call per square.
+"""
+
+from __future__ import annotations
+from array import array
+from arcade.gl import BufferDescription
+
+VERTEX_SHADER = """
+#version 330
+
+uniform Projection {
+    uniform mat4 matrix;
+} proj;
+
+uniform vec2 cell_size;
+
+in vec2 in_vert;
+in vec2 in_offset;
+in vec3 in_color;
+out vec3 v_color;
+
+void main() {
+    gl_Position = proj.matrix * vec4((in_offset + in_vert) * cell_size, 0.0, 1.0);
+    v_color = in_color;
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 330
+
+in vec3 v_color;
+out vec4 out_color;
+
+void main() {
+    out_color = vec4(v_color, 1.0);
+}
+"""
+
+class GridRenderer:
+    """
+    Draws a size_x by size_y grid of squares in one instanced draw call.
+
+    Colours are written as a flat buffer of size_x * size_y * 3 bytes,
+    ordered by x and then y, so the colour of square (x, y) starts at
+    byte (x * size_y + y) * 3. This is the same layout as a C-ordered
+    (size_x, size_y, 3) uint8 array.
+    """
+
+    def __init__(self, ctx, size_x: int, size_y: int, square_width: float, square_height: float) -> None:
+        """
+        Builds the square geometry once.
+
+        Args:
+        - ctx = The arcade (or headless) OpenGL context
+        - size_x, size_y = The dimensions of the grid
+        - square_width, square_height = The size of one square, in pixels
+
+        Complexity:
+        - O(size_x * size_y) to upload the square offsets.
+        """
+        self.ctx = ctx
+        self.size_x = size_x
+        self.size_y = size_y
+        self.program = ctx.program(vertex_shader=VERTEX_SHADER, fragment_shader=FRAGMENT_SHADER)
+        self.program["cell_size"] = (square_width, square_height)
+        quad = ctx.buffer(data=array("f", [0, 0, 1, 0, 1, 1, 0, 0, 1, 1, 0, 1]))
+        offsets = ctx.buffer(data=array("f", [
+            v
+            for x in range(size_x)
+            for y in range(size_y)
+            for v in (x, y)
+        ]))
+        self.colors = ctx.buffer(reserve=size_x * size_y * 3, usage="stream")
+        self.geometry = ctx.geometry([
+            BufferDescription(quad, "2f", ["in_vert"]),
+            BufferDescription(offsets, "2f", ["in_offset"], instanced=True),
+            BufferDescription(self.colors, "3f1", ["in_color"], normalized=["in_color"], instanced=True),
+        ])
+
+    def write(self, colors) -> None:
+        """
+        Replaces the colours of every square.
+
+        Args:
+        - colors = size_x * size_y * 3 bytes, in the layout described above.
+          Anything supporting the buffer protocol works (bytes, bytearray, uint8 arrays).
+
+        Complexity:
+        - O(size_x * size_y) bytes copied to the GPU.
+        """
+        self.colors.write(colors)
+
+    def draw(self) -> None:
+        """Draws every square with a single draw call."""
+        self.geometry.render(self.program, mode=self.ctx.TRIANGLES, instances=self.size_x * self.size_y)
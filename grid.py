@@ -1,4 +1,5 @@
 from __future__ import annotations
+from array import array
 from data_structures import referential_array
 from layer_store import SetLayerStore
 from layer_store import *
@@ -17,7 +18,7 @@ class Grid():
     MAX_BRUSH = 5
     MIN_BRUSH = 0
 
-    def __init__(self, draw_style:str, x:int, y:int) -> None:
+    def __init__(self, draw_style:str, x:int, y:int, sparse:bool=False) -> None:
         """
         Initialise the grid object.
         - draw_style:
@@ -25,6 +26,10 @@ class Grid():
             Should be one of DRAW_STYLE_OPTIONS
             This draw style determines the LayerStore used on each grid square.
         - x, y: The dimensions of the grid.
+        - sparse:
+            If True, a LayerStore is only created the first time a square is painted,
+            and squares never painted show the background. grid[x][y] keeps working,
+            so startup time and memory scale with the painted area rather than x*y.
 
         Should also intialise the brush size to the DEFAULT provided as a class variable.
         """
@@ -32,6 +37,7 @@ class Grid():
         self.draw_style = draw_style
         self.x = x
         self.y = y
+        self.sparse = sparse
         """
             Purpose:
             Makes the grid for further functionality
@@ -55,22 +61,54 @@ class Grid():
              is some constant representing the assignment and checking below the for loops, therefore, replacing dimension with "n",
              the big O run time would be: O(k*n^2)
             """
+        self.dirty = set() #Squares changed since the last frame --> O(1)
+        self.animated = set() #Squares holding a time dependent layer --> O(1)
+        if sparse: #Checking is constant --> O(1)
+            self.cells = {} #Only painted squares have a LayerStore --> O(1)
+            self.blank_inverted = False #Whether special has inverted the unpainted squares of a SET grid --> O(1)
+            self.grid = _SparseRows(self) #Assignment is constant --> O(1)
+            return
         self.grid = referential_array.ArrayR(x)
         for i in range(x):
             self.grid[i] = referential_array.ArrayR(y) #Assignment is constant --> O(1)
         for i in range(x):   #Loop runs for x times 
             for j in range(y): #Loop runs for y times
-                if self.draw_style == self.DRAW_STYLE_SET: #Checking is constant --> O(1)
-                    self.grid[i][j]=SetLayerStore() # Assignment is constant --> O(1)
-                elif self.draw_style == self.DRAW_STYLE_ADD: #Checking is constant --> O(1)
-                    self.grid[i][j] = AdditiveLayerStore() #Assignment is constant --> O(1)
-                elif self.draw_style == self.DRAW_STYLE_SEQUENCE: #Checking is constant --> O(1)
-                   self.grid[i][j] = SequenceLayerStore() #Assingment is constant --> O(1)
-                else:
-                    raise "Implement draw style"  # Time complexity not available      
-            
-        
-  
+                self.grid[i][j] = self.new_store() #Constant --> O(1)
+                self.grid[i][j].watch(self, i, j) #Constant --> O(1)
+
+    def new_store(self) -> LayerStore:
+        """
+        Returns an empty LayerStore matching the draw style.
+
+        Raises:
+        - ValueError if the draw style is not one of DRAW_STYLE_OPTIONS
+
+        Complexity:
+        - best case = worst case = O(1)
+        """
+        if self.draw_style == self.DRAW_STYLE_SET: #Checking is constant --> O(1)
+            return SetLayerStore() # Assignment is constant --> O(1)
+        elif self.draw_style == self.DRAW_STYLE_ADD: #Checking is constant --> O(1)
+            return AdditiveLayerStore() #Assignment is constant --> O(1)
+        elif self.draw_style == self.DRAW_STYLE_SEQUENCE: #Checking is constant --> O(1)
+            return SequenceLayerStore() #Assingment is constant --> O(1)
+        raise ValueError("Implement draw style")
+
+    def materialize(self, x: int, y: int) -> LayerStore:
+        """
+        Returns the LayerStore of square (x, y) of a sparse grid, creating it if needed.
+
+        Complexity:
+        - best case = worst case = O(1)
+        """
+        store = self.cells.get((x, y)) #Dictionary lookup is constant --> O(1)
+        if store is None:
+            store = self.new_store() #Constant --> O(1)
+            if self.blank_inverted: #The new square has to match the unpainted ones
+                store.special() #Constant for an empty SetLayerStore --> O(1)
+            store.watch(self, x, y) #Constant --> O(1)
+            self.cells[(x, y)] = store #Constant --> O(1)
+        return store
 
     def increase_brush_size(self) -> int:
         """
@@ -151,11 +189,75 @@ class Grid():
           circumstance, therefore, best case = worst case. As the two for loops will be run x times and 
           y times, the time complexity can be written as O(x) * O(y), re-writing both x and y as "n", we
           get O(n) * O(n) --> O(k*n^2 ) where k is a constant due to the recursive calling of special each time
+        - For a sparse grid, only the p painted squares are visited, therefore O(k*p), except for SET
+          grids where every square changes colour and is marked dirty, therefore O(k*p + x*y).
         """
+        if self.sparse: #Checking is constant --> O(1)
+            for store in list(self.cells.values()): # Will run for p times
+                store.special() #O(1) as recursive function calling is constant
+            if self.draw_style == self.DRAW_STYLE_SET: #Unpainted squares are inverted too
+                self.blank_inverted = not self.blank_inverted
+                for i in range(self.x):
+                    for j in range(self.y):
+                        self.dirty.add((i, j))
+            return
         for i in range(0,self.x): # Will run from 0 to x times
             for j in range(0,self.y): #Will run from 0 to y times
                 self.grid[i][j].special() #O(1) as recursive function calling is constant
 
+    def special_undoable(self) -> array | None:
+        """
+        Activate the special affect on all grid squares, as special does, and
+        returns the record undo_special needs to undo it exactly.
+
+        Returns:
+        - None for SET and ADD grids, as running special again undoes it.
+        - For SEQUENCE grids, an array of (x, y, index) triples, one for each square
+          that lost a layer, where index is the index of the layer it lost.
+
+        Complexity:
+        - O(special) for SET and ADD. O(s * special) for SEQUENCE, where s is the
+          number of squares visited by stores().
+        """
+        if self.draw_style != self.DRAW_STYLE_SEQUENCE: #Checking is constant --> O(1)
+            self.special() #O(special)
+            return None
+        record = array("i") #Constant --> O(1)
+        for x, y, store in self.stores(): #Will run for s times
+            index = store.special_undoable() #O(special) of a single square
+            if index >= 0: #Integer comparison is always constant --> O(1)
+                record.extend((x, y, index)) #Amortised constant --> O(1)
+        return record
+
+    def undo_special(self, record: array | None) -> None:
+        """
+        Undoes a special_undoable, given the record it returned.
+
+        Complexity:
+        - O(special) for SET and ADD. O(r * add) for SEQUENCE, where r is the number of squares in the record.
+        """
+        if record is None: #Checking is constant --> O(1)
+            self.special() #O(special)
+            return
+        for i in range(0, len(record), 3): #Will run for r times
+            self[record[i]][record[i+1]].undo_special(record[i+2]) #O(add)
+
+    def stores(self):
+        """
+        Yields (x, y, store) for every square holding a LayerStore. For a sparse
+        grid, only the painted squares are visited.
+
+        Complexity:
+        - O(x*y), or O(p) for a sparse grid with p painted squares.
+        """
+        if self.sparse: #Checking is constant --> O(1)
+            for (x, y), store in list(self.cells.items()): # Will run for p times
+                yield x, y, store
+            return
+        for i in range(self.x): # Will run for x times
+            for j in range(self.y): # Will run for y times
+                yield i, j, self.grid[i][j]
+
     
     def __getitem__(self,x):
         """
@@ -174,4 +276,147 @@ class Grid():
         Complexity:
         - Return statements are always O(1),therefore complexity is O(1)
         """
-        return self.grid[x] #Return statements are alwyays constant --> O(1)
\ No newline at end of file
+        return self.grid[x] #Return statements are alwyays constant --> O(1)
+
+    def square_changed(self, x: int, y: int) -> None:
+        """
+        Called by the LayerStore at (x, y) whenever its layers change.
+
+        Complexity:
+        - Adding to a set is O(1)
+        """
+        self.dirty.add((x, y))
+
+    def take_dirty(self) -> set[tuple[int, int]]:
+        """
+        Returns the squares whose colour has to be recomputed this frame, and
+        starts tracking changes for the next one.
+
+        Args:
+        - self
+
+        Raises:
+        - Does not raise any errors
+
+        Returns:
+        - The squares that changed since the last call, together with every square
+          holding a time dependent layer (such as rainbow), whose colour changes each frame.
+
+        Complexity:
+        - O(d + a), where d is the number of changed squares and a the number of animated squares.
+          An idle canvas with no time dependent layers costs O(1).
+        """
+        for x, y in self.dirty: #Will run for d times
+            if self.grid[x][y].is_time_dependent(): #Depends on the LayerStore
+                self.animated.add((x, y))
+            else:
+                self.animated.discard((x, y))
+        squares = self.dirty | self.animated if self.animated else self.dirty #O(d + a)
+        self.dirty = set() #Constant --> O(1)
+        return squares
+
+    def compose(self, colors: bytearray, start, timestamp: float) -> bool:
+        """
+        Brings a flat colour buffer up to date with the grid.
+
+        Args:
+        - colors = x * y * 3 bytes, where the colour of square (i, j) starts at byte (i * y + j) * 3
+          (the layout of GridRenderer). It keeps the colours written by the previous call.
+        - start = The background colour
+        - timestamp = The current time
+
+        Returns:
+        - True if any colour in the buffer was written
+
+        Complexity:
+        - O(take_dirty) + O(d * get_color), where d is the number of squares returned by take_dirty
+        """
+        squares = self.take_dirty() #O(take_dirty)
+        for x, y in squares: #Will run for d times
+            i = (x * self.y + y) * 3
+            colors[i:i+3] = self.grid[x][y].get_color(start, timestamp, x, y)
+        return bool(squares)
+
+
+class _SparseRows:
+    """Stands in for the ArrayR of columns of a sparse Grid."""
+
+    def __init__(self, grid: Grid) -> None:
+        self.grid = grid
+
+    def __len__(self) -> int:
+        return self.grid.x
+
+    def __getitem__(self, x: int) -> _SparseColumn:
+        if not 0 <= x < self.grid.x:
+            raise IndexError(x)
+        return _SparseColumn(self.grid, x)
+
+
+class _SparseColumn:
+    """A column of a sparse Grid. Indexing it returns the square's LayerStore, or a _BlankSquare."""
+
+    def __init__(self, grid: Grid, x: int) -> None:
+        self.grid = grid
+        self.x = x
+
+    def __len__(self) -> int:
+        return self.grid.y
+
+    def __getitem__(self, y: int):
+        if not 0 <= y < self.grid.y:
+            raise IndexError(y)
+        store = self.grid.cells.get((self.x, y))
+        if store is None:
+            return _BlankSquare(self.grid, self.x, y)
+        return store
+
+
+class _BlankSquare:
+    """
+    A square of a sparse Grid that was never painted.
+    Offers the LayerStore interface, and creates the real store on the first change.
+    """
+
+    def __init__(self, grid: Grid, x: int, y: int) -> None:
+        self.grid = grid
+        self.x = x
+        self.y = y
+
+    def add(self, layer: Layer) -> bool:
+        return self.grid.materialize(self.x, self.y).add(layer)
+
+    def add_undoable(self, layer: Layer) -> int:
+        return self.grid.materialize(self.x, self.y).add_undoable(layer)
+
+    def undo_add(self, token: int) -> None:
+        self.grid.materialize(self.x, self.y).undo_add(token)
+
+    def erase(self, layer: Layer) -> bool:
+        return False
+
+    def special(self) -> None:
+        self.grid.materialize(self.x, self.y).special()
+
+    def special_undoable(self) -> int:
+        return self.grid.materialize(self.x, self.y).special_undoable()
+
+    def undo_special(self, token: int) -> None:
+        self.grid.materialize(self.x, self.y).undo_special(token)
+
+    def get_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
+        if self.grid.blank_inverted:
+            return (255-start[0], 255-start[1], 255-start[2])
+        return start
+
+    def is_time_dependent(self) -> bool:
+        return False
+
+    def snapshot(self):
+        store = self.grid.new_store()
+        if self.grid.blank_inverted:
+            store.special()
+        return store.snapshot()
+
+    def restore(self, state) -> None:
+        self.grid.materialize(self.x, self.y).restore(state)
@@ -0,0 +1,112 @@
+"""
+Queued mouse motion.
+
+Pointer devices can report motion far more often than the screen refreshes,
+and painting every sample as it arrives stalls the frame. The window instead
+queues the samples and drains them once per update, within a time budget.
+A sample is merged into the one queued before it when both, and the sample
+before those, are in the same grid square: the path then runs from that
+square to itself, so moving its end within the square cannot change the squares
+it crosses. Nothing is ever dropped: whatever is left when the budget runs out
+is painted on the next frame.
+"""
+
+from __future__ import annotations
+import time
+from collections import deque
+
+DEFAULT_BUDGET = 0.004
+
+
+class MotionQueue:
+    """
+    Mouse positions waiting to be painted, oldest first.
+
+    Usage:  queue = MotionQueue(square_width, square_height)
+            queue.push(x, y)            # on every mouse motion event
+            queue.drain(try_draw)       # once per frame
+    """
+
+    def __init__(self, cell_width: float = 1, cell_height: float = 1, budget: float = DEFAULT_BUDGET,
+                 clock=time.perf_counter) -> None:
+        """
+        Args:
+        - cell_width, cell_height = The size of a grid square, in pixels
+        - budget = How long drain may spend painting per frame, in seconds
+        - clock = Returns the current time in seconds, for drain to keep to the budget
+        """
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.budget = budget
+        self.clock = clock
+        self.samples = deque()
+        self.last_cell = None #The square of the last position queued
+        self.prev_cell = None #The square of the position queued before it, None at the start of a drag
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def push(self, x: float, y: float) -> None:
+        """
+        Queues a mouse position. If the last queued position, and the one before it,
+        are in the same grid square as this one, the last one is replaced instead, so
+        the stroke still ends at the latest position and crosses the same squares.
+
+        Complexity:
+        - O(1)
+        """
+        cell = (int(x // self.cell_width), int(y // self.cell_height))
+        if self.samples and cell == self.last_cell == self.prev_cell:
+            self.samples[-1] = (x, y)
+        else:
+            self.samples.append((x, y))
+            self.prev_cell, self.last_cell = self.last_cell, cell
+
+    def drain(self, handler, budget: float | None = None) -> int:
+        """
+        Calls handler(x, y) for the queued positions, oldest first, until the
+        queue is empty or the budget is spent. At least one position is handled
+        per call, so the queue always makes progress.
+
+        Args:
+        - handler = Called with each position, such as MyWindow.try_draw
+        - budget = Overrides self.budget for this call. None drains the whole queue
+          when self.budget is None too.
+
+        Returns:
+        - The number of positions handled
+
+        Complexity:
+        - O(n * handler) for the n positions handled.
+        """
+        budget = self.budget if budget is None else budget
+        deadline = None if budget is None else self.clock() + budget
+        handled = 0
+        while self.samples:
+            x, y = self.samples.popleft()
+            handler(x, y)
+            handled += 1
+            if deadline is not None and self.clock() >= deadline:
+                break
+        return handled
+
+    def flush(self, handler) -> int:
+        """
+        Handles every queued position now, whatever the budget, as needed before the
+        stroke ends or an undo runs.
+
+        Complexity:
+        - O(n * handler) for the n queued positions.
+        """
+        handled = 0
+        while self.samples:
+            x, y = self.samples.popleft()
+            handler(x, y)
+            handled += 1
+        return handled
+
+    def clear(self) -> None:
+        """Forgets every queued position, and where they were, such as when a drag ends."""
+        self.samples.clear()
+        self.last_cell = None
+        self.prev_cell = None
@@ -0,0 +1,295 @@
+"""
+Append-only action journal.
+
+Every action applied to the grid is appended to a journal on disk, through
+a buffered file, so a crash loses at most the records still in the buffer.
+Every checkpoint_every records the whole grid is written as a snapshot
+(see snapshot.py) and a new journal segment is started, so recovering only
+loads the last snapshot and replays the records after it.
+
+Files in the journal directory, where n is the number of records before them:
+
+    checkpoint-<n>.pntg   the grid after n records
+    journal-<n>.log       records n, n+1, ...
+
+A record is its payload length u32 and CRC32 u32, followed by the payload:
+undo flag u8, kind u8, step count u32, then (little endian)
+- for a PaintAction (kind 0) or a special (kind 1): per step x u32, y u32 and the layer index u8,
+- for a BrushAction (kind 2): the layer index u8, centre x i32, y i32, brush size u8 and shape u8,
+- for a StrokeAction (kind 3): the layer index u8, then per square x u32, y u32.
+An undo record is followed by the inverse tokens of the action (see action.py),
+so recovery undoes it exactly: one i8 per step or square for kinds 0, 2 and 3,
+and for a special the triple count u32, then per triple x i32, y i32, layer index i32
+(nothing for SET and ADD grids). A record with no tokens is undone with erase.
+Recovery stops at the first record that is
+incomplete or fails its CRC, as left behind by a crash in the middle of a write.
+"""
+
+from __future__ import annotations
+import os
+import re
+import struct
+import sys
+import zlib
+from array import array
+from action import BrushAction, PaintAction, PaintStep, StrokeAction
+from brush import BRUSH_SHAPES
+from grid import Grid
+from layer_util import get_layers
+import snapshot
+
+RECORD = struct.Struct("<II")
+ACTION = struct.Struct("<BBI")
+STEP = struct.Struct("<IIB")
+BRUSH = struct.Struct("<BiiBB")
+KIND_PAINT, KIND_SPECIAL, KIND_BRUSH, KIND_STROKE = 0, 1, 2, 3
+LAYER = struct.Struct("<B")
+COUNT = struct.Struct("<I")
+CHECKPOINT = re.compile(r"checkpoint-(\d+)\.pntg$")
+SEGMENT = re.compile(r"journal-(\d+)\.log$")
+
+
+def encode(action: PaintAction | BrushAction | StrokeAction, is_undo: bool = False) -> bytes:
+    """
+    Returns the journal record of an action.
+    An undo record carries the inverse tokens of the action, if it has them.
+
+    Complexity:
+    - O(s) for an action of s steps or squares, O(1) for a BrushAction (O(b) to undo one of b squares)
+    """
+    if isinstance(action, StrokeAction):
+        cells = array("I", action.cells)
+        if sys.byteorder == "big":
+            cells.byteswap()
+        payload = ACTION.pack(is_undo, KIND_STROKE, len(action)) + LAYER.pack(action.layer_index) + cells.tobytes()
+        if is_undo and len(action.inverse) == len(action):
+            payload += action.inverse.tobytes()
+        return RECORD.pack(len(payload), zlib.crc32(payload)) + payload
+    if isinstance(action, BrushAction):
+        payload = ACTION.pack(is_undo, KIND_BRUSH, 0) + BRUSH.pack(
+            action.layer_index, action.px, action.py, action.size, BRUSH_SHAPES.index(action.shape),
+        )
+        if is_undo and action.inverse is not None:
+            payload += action.inverse.tobytes()
+        return RECORD.pack(len(payload), zlib.crc32(payload)) + payload
+    payload = bytearray(ACTION.pack(is_undo, KIND_SPECIAL if action.is_special else KIND_PAINT, len(action.steps)))
+    for step in action.steps:
+        x, y = step.affected_grid_square
+        payload += STEP.pack(x, y, step.affected_layer.index)
+    if is_undo and action.is_special and action.inverse is not None:
+        triples = array("i", action.inverse)
+        if sys.byteorder == "big":
+            triples.byteswap()
+        payload += COUNT.pack(len(triples) // 3) + triples.tobytes()
+    elif is_undo and action.steps and all(step.inverse is not None for step in action.steps):
+        payload += array("b", [step.inverse for step in action.steps]).tobytes()
+    return RECORD.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def decode(payload) -> tuple[PaintAction | BrushAction | StrokeAction, bool]:
+    """
+    Returns the action and undo flag of a record payload, with the inverse
+    tokens of an undo record that has them.
+
+    Complexity:
+    - O(s) for an action of s steps
+    """
+    is_undo, kind, count = ACTION.unpack_from(payload)
+    layers = get_layers()
+    if kind == KIND_BRUSH:
+        index, px, py, size, shape = BRUSH.unpack_from(payload, ACTION.size)
+        brush = BrushAction(layers[index], px, py, size, BRUSH_SHAPES[shape])
+        start = ACTION.size + BRUSH.size
+        if len(payload) > start:
+            brush.inverse = array("b", bytes(payload[start:]))
+        return brush, bool(is_undo)
+    if kind == KIND_STROKE:
+        stroke = StrokeAction(layers[LAYER.unpack_from(payload, ACTION.size)[0]])
+        start = ACTION.size + LAYER.size
+        stroke.cells.frombytes(bytes(payload[start:start + count * 8]))
+        if sys.byteorder == "big":
+            stroke.cells.byteswap()
+        stroke.inverse.frombytes(bytes(payload[start + count * 8:start + count * 9]))
+        return stroke, bool(is_undo)
+    steps = []
+    for i in range(count):
+        x, y, index = STEP.unpack_from(payload, ACTION.size + i * STEP.size)
+        steps.append(PaintStep((x, y), layers[index]))
+    action = PaintAction(steps, kind == KIND_SPECIAL)
+    start = ACTION.size + count * STEP.size
+    if len(payload) > start:
+        if action.is_special:
+            triples = COUNT.unpack_from(payload, start)[0]
+            action.inverse = array("i")
+            action.inverse.frombytes(bytes(payload[start + COUNT.size:start + COUNT.size + triples * 12]))
+            if sys.byteorder == "big":
+                action.inverse.byteswap()
+        else:
+            for step, token in zip(steps, array("b", bytes(payload[start:start + count]))):
+                step.inverse = token
+    return action, bool(is_undo)
+
+
+def read_records(path: str):
+    """
+    Yields (action, is_undo) for every complete record of a journal segment,
+    stopping at the first incomplete or corrupted one.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    pos = 0
+    while pos + RECORD.size <= len(data):
+        length, crc = RECORD.unpack_from(data, pos)
+        payload = data[pos + RECORD.size:pos + RECORD.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        yield decode(payload)
+        pos += RECORD.size + length
+
+
+class Journal:
+    """
+    Crash-safe autosave of a grid.
+
+    Usage:  journal = Journal(directory)
+            grid = journal.recover(Grid.DRAW_STYLE_SET, 32, 32)
+            ...
+            action.redo_apply(grid)
+            journal.record(action, grid)
+    """
+
+    DEFAULT_CHECKPOINT_EVERY = 1000
+    DEFAULT_BUFFER_SIZE = 1 << 16
+
+    def __init__(self, directory: str, checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE) -> None:
+        """
+        Args:
+        - directory = Where the journal lives. Created if needed.
+        - checkpoint_every = How many records are written between two snapshots of the grid.
+          Recovery replays at most that many records.
+        - buffer_size = The size of the write buffer, in bytes. Records are written to
+          disk in batches of about that size, or when flush() is called.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.checkpoint_every = checkpoint_every
+        self.buffer_size = buffer_size
+        self.count = None
+        self.last_checkpoint = None
+        self.file = None
+
+    def recover(self, draw_style: str, x: int, y: int) -> Grid:
+        """
+        Rebuilds the grid from the last checkpoint and the records after it, then
+        starts a new journal segment for the records to come. A directory with no
+        journal gives a new empty grid.
+
+        Args:
+        - draw_style, x, y = The grid the journal is of, created when there is no checkpoint yet
+
+        Raises:
+        - ValueError if the last checkpoint is of a grid of another draw style or size
+
+        Complexity:
+        - O(load) + O(r * redo_apply) for the r <= checkpoint_every records after the last checkpoint.
+        """
+        checkpoints = self._files(CHECKPOINT)
+        if checkpoints:
+            self.count, name = checkpoints[-1]
+            grid = snapshot.load(os.path.join(self.directory, name))
+            if (grid.draw_style, grid.x, grid.y) != (draw_style, x, y):
+                grid.close()
+                raise ValueError(f"{self.directory} holds a {grid.draw_style} {grid.x}x{grid.y} grid, not {draw_style} {x}x{y}")
+        else:
+            self.count = 0
+            grid = Grid(draw_style, x, y)
+        for start, name in self._files(SEGMENT):
+            if start > self.count:
+                break  # Records are missing in between, the rest cannot be replayed.
+            for i, (action, is_undo) in enumerate(read_records(os.path.join(self.directory, name))):
+                if start + i < self.count:
+                    continue
+                if is_undo:
+                    action.undo_apply(grid)
+                else:
+                    action.redo_apply(grid)
+                self.count += 1
+        self.last_checkpoint = checkpoints[-1][0] if checkpoints else 0
+        self._open_segment()
+        return grid
+
+    def record(self, action: PaintAction, grid: Grid, is_undo: bool = False) -> None:
+        """
+        Appends an action that was just applied to grid (undone if is_undo).
+        Writes a checkpoint of grid every checkpoint_every records.
+
+        Raises:
+        - ValueError if recover was not called first
+
+        Complexity:
+        - O(s) for an action of s steps, plus O(checkpoint) every checkpoint_every records.
+        """
+        if self.file is None:
+            raise ValueError("Call recover before recording actions")
+        self.file.write(encode(action, is_undo))
+        self.count += 1
+        if self.count - self.last_checkpoint >= self.checkpoint_every:
+            self.checkpoint(grid)
+
+    def checkpoint(self, grid: Grid) -> None:
+        """
+        Writes grid as the new checkpoint, starts a new segment and removes the
+        files that are no longer needed for recovery.
+
+        The snapshot is written to a temporary file and renamed, so a crash
+        leaves either the previous or the new checkpoint in place.
+
+        Complexity:
+        - O(snapshot.save)
+        """
+        self.flush()
+        name = os.path.join(self.directory, f"checkpoint-{self.count:012d}.pntg")
+        snapshot.save(grid, name + ".tmp")
+        with open(name + ".tmp", "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(name + ".tmp", name)
+        self.last_checkpoint = self.count
+        self.file.close()
+        self._open_segment()
+        if isinstance(grid, snapshot.SnapshotGrid): # A recovered grid still maps the checkpoint removed below
+            grid.close()
+        for start, old in self._files(CHECKPOINT):
+            if start < self.count:
+                os.remove(os.path.join(self.directory, old))
+        for start, old in self._files(SEGMENT):
+            if start < self.count:
+                os.remove(os.path.join(self.directory, old))
+
+    def flush(self, sync: bool = False) -> None:
+        """Writes the buffered records to the file, and to the disk itself if sync."""
+        if self.file is not None:
+            self.file.flush()
+            if sync:
+                os.fsync(self.file.fileno())
+
+    def close(self) -> None:
+        """Writes the buffered records to disk and closes the journal."""
+        if self.file is not None:
+            self.flush(sync=True)
+            self.file.close()
+            self.file = None
+
+    def _open_segment(self) -> None:
+        path = os.path.join(self.directory, f"journal-{self.count:012d}.log")
+        # A segment is only ever reopened when it holds no complete record, so start it afresh.
+        self.file = open(path, "wb", buffering=self.buffer_size)
+
+    def _files(self, pattern) -> list[tuple[int, str]]:
+        """Returns (n, name) for the files of the directory matching pattern, by n."""
+        found = []
+        for name in os.listdir(self.directory):
+            match = pattern.match(name)
+            if match:
+                found.append((int(match.group(1)), name))
+        return sorted(found)
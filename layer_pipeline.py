@@ -0,0 +1,124 @@
+"""
+Layer stack compilation.
+
+Turns the ordered layers of a square into the shortest pipeline giving the
+same colours:
+- every layer before the last one that ignores its input colour (black, red, ...) is dropped,
+- adjacent pairs of invert cancel out,
+- runs of lighten / darken are folded into a single clamp.
+
+Pipelines are cached by the layer functions of the stack, so every square
+holding the same stack shares one pipeline, while two layers that only share
+an index (such as a layer made outside the registry) never do.
+"""
+
+from __future__ import annotations
+from layer_util import Layer
+from layers import darken, invert, lighten
+
+INF = float("inf")
+
+
+class Clamp:
+    """
+    Adds offset to every channel, then clamps it to [low, high].
+
+    Any run of lighten and darken layers is a Clamp, and so is their composition.
+    """
+
+    time_dependent = False
+    color_dependent = True
+
+    def __init__(self, offset: int, low: float, high: float) -> None:
+        self.offset = offset
+        self.low = low
+        self.high = high
+
+    def then(self, other: Clamp) -> Clamp:
+        """
+        Returns the Clamp applying self and then other.
+
+        Complexity:
+        - O(1)
+        """
+        return Clamp(
+            self.offset + other.offset,
+            max(self.low + other.offset, other.low),
+            min(max(self.high + other.offset, other.low), other.high),
+        )
+
+    def apply(self, color, timestamp, x, y) -> tuple[int, int, int]:
+        return tuple(
+            min(max(c + self.offset, self.low), self.high)
+            for c in color
+        )
+
+
+_CLAMPS = {
+    lighten.apply: Clamp(40, -INF, 255),
+    darken.apply: Clamp(-40, 0, INF),
+}
+
+
+class Pipeline:
+    """The compiled steps of a layer stack, applied in order."""
+
+    def __init__(self, steps: tuple) -> None:
+        self.steps = steps
+        self.time_dependent = any(step.time_dependent for step in steps)
+
+    def apply(self, color, timestamp, x, y):
+        """
+        Returns the colour of the stack applied to color.
+
+        Complexity:
+        - O(s * apply), where s is the number of compiled steps.
+        """
+        for step in self.steps:
+            color = step.apply(color, timestamp, x, y)
+        return color
+
+
+MAX_PIPELINES = 4096
+_PIPELINES: dict[tuple, Pipeline] = {}
+
+
+def compile_stack(layers) -> Pipeline:
+    """
+    Returns the pipeline for a stack of layers, applied first to last.
+
+    Args:
+    - layers = The layers of the stack, in the order they are applied
+
+    Returns:
+    - A Pipeline giving the same colours as applying every layer in turn
+
+    Complexity:
+    - O(k) to build the signature of a stack of k layers, then O(1) if the
+      pipeline is cached, and O(k) to compile it otherwise.
+    """
+    layers = list(layers)
+    signature = tuple(layer.apply for layer in layers)
+    pipeline = _PIPELINES.get(signature)
+    if pipeline is not None:
+        return pipeline
+    steps = []
+    for layer in layers:
+        if not layer.color_dependent:
+            # Nothing applied before this layer can show through it.
+            steps = [layer]
+        elif layer.apply is invert.apply and steps and isinstance(steps[-1], Layer) and steps[-1].apply is invert.apply:
+            steps.pop()
+        elif layer.apply in _CLAMPS:
+            clamp = _CLAMPS[layer.apply]
+            if steps and isinstance(steps[-1], Clamp):
+                steps[-1] = steps[-1].then(clamp)
+            else:
+                steps.append(clamp)
+        else:
+            steps.append(layer)
+    pipeline = Pipeline(tuple(steps))
+    if len(_PIPELINES) >= MAX_PIPELINES:
+        _PIPELINES.clear()
+    _PIPELINES[signature] = pipeline
+    return pipeline
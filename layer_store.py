@@ -1,5 +1,6 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from functools import wraps
 from layer_util import Layer
 from data_structures.stack_adt import ArrayStack
 from layers import invert
@@ -11,10 +12,72 @@ from data_structures.array_sorted_list import ArraySortedList
 from data_structures.sorted_list_adt import ListItem
 from layers import *
 from layer_util import get_layers
+from layer_pipeline import Pipeline, compile_stack
+
+def cache_color(get_color):
+    """
+    Decorator for LayerStore.get_color implementations.
+
+    Keeps the last composited colour of the store, and hands it back on the
+    next call with the same start colour and position, as long as none of
+    the stored layers depend on the timestamp. Static squares are then only
+    composited once, until their layers change (see LayerStore.changed).
+    """
+    @wraps(get_color)
+    def cached_get_color(self, start, timestamp, x, y):
+        key = (tuple(start), x, y)
+        if self.cache is not None and self.cache[0] == key:
+            return self.cache[1]
+        color = get_color(self, start, timestamp, x, y)
+        if not self.is_time_dependent():
+            self.cache = (key, color)
+        return color
+    return cached_get_color
 
 class LayerStore(ABC):
 
     def __init__(self) -> None:
+        self.listener = None
+        self.position = None
+        self.cache = None
+        self.pipeline = None
+
+    def watch(self, listener, x: int, y: int) -> None:
+        """
+        Report every change of this store to listener.square_changed(x, y).
+        Used by the grid to keep track of which squares need recompositing.
+        """
+        self.listener = listener
+        self.position = (x, y)
+
+    def changed(self) -> None:
+        """
+        Called whenever the layers in this store change.
+        """
+        self.cache = None
+        self.pipeline = None
+        if self.listener is not None:
+            self.listener.square_changed(self.position[0], self.position[1])
+
+    @abstractmethod
+    def is_time_dependent(self) -> bool:
+        """
+        Returns true if the colour of this square can change with the timestamp alone.
+        """
+        pass
+
+    @abstractmethod
+    def snapshot(self):
+        """
+        Returns the layers of this store as a small, picklable value made of layer indices.
+        """
+        pass
+
+    @abstractmethod
+    def restore(self, state) -> None:
+        """
+        Replaces the layers of this store with a value returned by snapshot().
+        """
         pass
 
     @abstractmethod
@@ -49,6 +112,37 @@ class LayerStore(ABC):
         """
         pass
 
+    @abstractmethod
+    def add_undoable(self, layer: Layer) -> int:
+        """
+        Add a layer to the store, as add does.
+        Returns a small int (the inverse token) that undo_add needs to restore
+        exactly the layers the store held before.
+        """
+        pass
+
+    @abstractmethod
+    def undo_add(self, token: int) -> None:
+        """
+        Undo the last add_undoable, given the token it returned.
+        """
+        pass
+
+    @abstractmethod
+    def special_undoable(self) -> int:
+        """
+        Special mode, as special does.
+        Returns the inverse token undo_special needs.
+        """
+        pass
+
+    @abstractmethod
+    def undo_special(self, token: int) -> None:
+        """
+        Undo the last special_undoable, given the token it returned.
+        """
+        pass
+
 class SetLayerStore(LayerStore):
     """
     Set layer store. A single layer can be stored at a time (or nothing at all)
@@ -61,6 +155,7 @@ class SetLayerStore(LayerStore):
     
     
     def __init__(self) -> None:
+        LayerStore.__init__(self) #Constant --> O(1)
         self.LayerApplied = ArrayStack(self.MAX_CAPACITY) #Assignment is constant --> O(1)
         self.flag = False #Assignment is constant --> O(1)
         
@@ -92,6 +187,7 @@ class SetLayerStore(LayerStore):
           k is a constant due to the other constant implementations
         """
         
+        self.changed() #Notifying is constant --> O(1)
         if len(self.LayerApplied) < self.MAX_CAPACITY: #Checking is constant --> O(1)
             self.LayerApplied.push(layer) #Pushing is always constant --> O(1) 
             return True #Return Statement always constant --> O(1)
@@ -102,6 +198,7 @@ class SetLayerStore(LayerStore):
              
 
     
+    @cache_color
     def get_color(self,start: tuple ,timestamp: float, x: int, y: int) -> tuple[int, int, int]:
         """
         Returns the colour this square should show, given the current layers.
@@ -179,6 +276,7 @@ class SetLayerStore(LayerStore):
             return False #Returning is always constant --> O(1)
         else:
             self.LayerApplied.pop() #Popping is always constant --> O(1)
+            self.changed() #Notifying is constant --> O(1)
             return True #Returning is always constant --> O(1)
 
       
@@ -200,6 +298,88 @@ class SetLayerStore(LayerStore):
         - Comparison is always constant, therefore best case = worst case = O(1)
         """
         self.flag = not self.flag #Comparison is always constant --> O(1)
+        self.changed() #Notifying is constant --> O(1)
+
+    def add_undoable(self, layer: Layer) -> int:
+        """
+        Sets the single layer, as add does.
+        Returns the index of the layer it replaced, or -1 if there was none.
+
+        Complexity:
+        - best case = worst case = O(1)
+        """
+        token = -1 if self.LayerApplied.is_empty() else self.LayerApplied.peek().index #Constant --> O(1)
+        self.add(layer) #O(1) for a single layer
+        return token
+
+    def undo_add(self, token: int) -> None:
+        """
+        Puts back the layer add_undoable replaced, or nothing if token is -1.
+        Popping the added layer reveals the replaced one, unless add had to clear a full stack,
+        in which case the token pushes it back. Like erase, does nothing to an empty store.
+
+        Complexity:
+        - best case = worst case = O(1)
+        """
+        if self.LayerApplied.is_empty(): #Integer comparison is always constant --> O(1)
+            return
+        self.LayerApplied.pop() #Popping is always constant --> O(1)
+        if token >= 0 and self.LayerApplied.is_empty(): #Integer comparison is always constant --> O(1)
+            self.LayerApplied.push(get_layers()[token]) #Pushing is always constant --> O(1)
+        self.changed() #Notifying is constant --> O(1)
+
+    def special_undoable(self) -> int:
+        """
+        Inverts the colour output, as special does. Inverting again undoes it, so the token is always 0.
+
+        Complexity:
+        - best case = worst case = O(1)
+        """
+        self.special() #Constant --> O(1)
+        return 0
+
+    def undo_special(self, token: int) -> None:
+        """
+        Inverts the colour output back.
+
+        Complexity:
+        - best case = worst case = O(1)
+        """
+        self.special() #Constant --> O(1)
+
+    def is_time_dependent(self) -> bool:
+        """
+        Returns true if the colour of this square can change with the timestamp alone.
+
+        Complexity:
+        - best case = worst case = O(1)
+        """
+        return not self.LayerApplied.is_empty() and self.LayerApplied.peek().time_dependent
+
+    def snapshot(self) -> tuple[int, bool]:
+        """
+        Returns (index of the layer, or -1 if there is none, special flag).
+
+        Complexity:
+        - best case = worst case = O(1)
+        """
+        if self.LayerApplied.is_empty(): #Integer comparison is always constant --> O(1)
+            return (-1, self.flag)
+        return (self.LayerApplied.peek().index, self.flag)
+
+    def restore(self, state: tuple[int, bool]) -> None:
+        """
+        Replaces the layer and special flag with a value returned by snapshot().
+
+        Complexity:
+        - best case = worst case = O(1)
+        """
+        index, flag = state
+        self.LayerApplied.clear() #Constant --> O(1)
+        if index >= 0: #Integer comparison is always constant --> O(1)
+            self.LayerApplied.push(get_layers()[index]) #Pushing is always constant --> O(1)
+        self.flag = flag #Assignment is constant --> O(1)
+        self.changed() #Notifying is constant --> O(1)
         
             
         
@@ -215,6 +395,7 @@ class AdditiveLayerStore(LayerStore):
     MAX_CAPACITY = 100 #Constant --> O(1)
 
     def __init__(self) -> None:
+        LayerStore.__init__(self) #Constant --> O(1)
         self.AppliedLayer = CircularQueue(self.MAX_CAPACITY) #Constant --> O(1)
         self.size = 0 #Constant --> O(1)
         
@@ -245,10 +426,12 @@ class AdditiveLayerStore(LayerStore):
         if not self.AppliedLayer.is_full(): #Checking if it is full, integer comparison is always constant --> O(1)
             self.AppliedLayer.append(layer) #Appending for circular queues is always constant --> O(1)
             self.size += 1 #increments the known size by 1, only done once, therefore being constant --> O(1)
+            self.changed() #Notifying is constant --> O(1)
             return True #Returning statements is always constant --> O(1)
         else: # Integer comparison is always constant 
             raise "Queue is full"  #No time complexity for raising   
     
+    @cache_color
     def get_color(self, start: tuple, timestamp: float, x: int , y: int) -> tuple[int, int, int]:
         """
         Returns the colour this square should show, given the current layers.
@@ -270,21 +453,14 @@ class AdditiveLayerStore(LayerStore):
         Complexity:
         - For the entire function, the best case is if the queue is empty as it will simply return the 
           starting color tuple, all being constant time, therefore, the best case = O(1). The worst case is 
-          if the queue is not empty, it will run for a total of size times to get the color and apply to the 
-          LayerStore. Therefore, the worst case = O(self.size) + O(apply) + O(1) = O(self.size + apply + k) where k 
-          is a constant representing the constant operations. As the input size increases to infinty, the constant will
-          not play a major role in the time complexity affection. Therefore, worst case = O(self.size + apply)
+          if the queue is not empty, in which the compiled pipeline of the layers is applied. Layers hidden
+          behind a later black / red / green / blue, pairs of invert and runs of lighten / darken do not cost
+          anything, therefore, worst case = O(get_pipeline) + O(s * apply) where s is the number of compiled steps.
         """
         
         if self.AppliedLayer.is_empty(): #Integer comparison is always constant --> O(1)
             return start #Returning is always constant --> O(1)
-           
-        for i in range(self.size): # Will run for self. size times
-            if not self.AppliedLayer.is_empty(): #Integer comparison is always constant --> O(1)
-                LayerEffect = self.AppliedLayer.serve() # Serving circular queue is always constant --> O(1) 
-                start = LayerEffect.apply(start,timestamp,x,y) #Applying has the run time of --> O(apply)
-                self.AppliedLayer.append(LayerEffect) #Appending in a circular queue is constant --> O(1)
-        return start #Returning is always constant --> O(1)
+        return self.get_pipeline().apply(start,timestamp,x,y) #O(get_pipeline) + O(s * apply)
         
 
     
@@ -311,6 +487,7 @@ class AdditiveLayerStore(LayerStore):
         if not self.AppliedLayer.is_empty(): #Integer comparison is always constant --> O(1)
             self.AppliedLayer.serve() #Serving in a circular queue is always constant --> O(1)
             self.size -= 1 # size will only increase once, therefore is constant --> O(1)
+            self.changed() #Notifying is constant --> O(1)
             return True #Returning is always constant --> O(1)
         else: #Integer comparison is always constant --> O(1)
             return False #Returning is always cosntant --> O(1)
@@ -326,33 +503,105 @@ class AdditiveLayerStore(LayerStore):
         - self
 
         Raises:
-        - If queue is empty, raise error: Queue is empty
+        - Does not raise any errors
 
         Returns:
         - Does not return anything
 
         Complexity:
-        - If the original queue is empty, then the time complexity cannot be analysed as raising does not have a complexity.
-        - If the Queue is not empty, then the best case is equal to the worst case which will be O(self.size + k) + O(self.size + k),
-          therefore, best = worst = O(self.size + k) + O(self.size + k). 
+        - If the queue is empty, nothing happens, therefore best case = O(1).
+        - Otherwise the layers are swapped in place, from both ends towards the middle, without
+          allocating anything, therefore worst case = O(self.size).
         """
-        NewStack = ArrayStack(len(self.AppliedLayer) * 1000) #Constant --> O(1)
-        NewQueue = CircularQueue(len(self.AppliedLayer) * 1000) #Constant --> O(1)
+        if not self.AppliedLayer.is_empty(): #Integer comparison is always constant --> O(1)
+            self.AppliedLayer.reverse() #Reversing in place --> O(self.size)
+            self.changed() #Notifying is constant --> O(1)
 
-        if self.AppliedLayer.is_empty(): #Assingment comparison is always constant --> O(1)
-            raise "Queue is empty" #No complexity analysis of raisng 
+    def add_undoable(self, layer: Layer) -> int:
+        """
+        Adds the layer last, as add does. Undoing it only needs to remove the last layer, so the token is always 0.
 
-        
-        if not self.AppliedLayer.is_empty(): #Integer comparison is always constant --> O(1)
-            for _ in range(self.size): #Will run for self.size times
-                ServedValue = self.AppliedLayer.serve() #Serving for a circular queue is always constant --> O(1)
-                NewStack.push(ServedValue) #Pushing in a stack is always constant --> O(1)
+        Complexity:
+        - best case = worst case = O(1)
+        """
+        self.add(layer) #Constant --> O(1)
+        return 0
+
+    def undo_add(self, token: int) -> None:
+        """
+        Removes the layer added last, which add_undoable added. Like erase, does nothing to an empty store.
+
+        Complexity:
+        - best case = worst case = O(1)
+        """
+        if self.AppliedLayer.is_empty(): #Integer comparison is always constant --> O(1)
+            return
+        self.AppliedLayer.pop_rear() #Constant --> O(1)
+        self.size -= 1 #Constant --> O(1)
+        self.changed() #Notifying is constant --> O(1)
+
+    def special_undoable(self) -> int:
+        """
+        Reverses the order of the layers, as special does. Reversing again undoes it, so the token is always 0.
+
+        Complexity:
+        - best case = worst case = O(special)
+        """
+        self.special() #O(self.size)
+        return 0
+
+    def undo_special(self, token: int) -> None:
+        """
+        Reverses the order of the layers back.
+
+        Complexity:
+        - best case = worst case = O(self.size)
+        """
+        self.special() #O(self.size)
+
+    def is_time_dependent(self) -> bool:
+        """
+        Returns true if the colour of this square can change with the timestamp alone.
+
+        Complexity:
+        - best case = worst case = O(get_pipeline)
+        """
+        return self.get_pipeline().time_dependent
+
+    def get_pipeline(self) -> Pipeline:
+        """
+        Returns the compiled pipeline of the current layers (see layer_pipeline.compile_stack).
+
+        Complexity:
+        - O(1) if the layers have not changed since the last call, otherwise O(self.size) to compile.
+          The layers are read in place, front to rear, so reading never changes the queue.
+        """
+        if self.pipeline is None: #Comparison is always constant --> O(1)
+            self.pipeline = compile_stack(self.AppliedLayer) #O(self.size)
+        return self.pipeline
+
+    def snapshot(self) -> tuple[int, ...]:
+        """
+        Returns the indices of the layers, in the order they are applied.
+
+        Complexity:
+        - best case = worst case = O(self.size)
+        """
+        return tuple(layer.index for layer in self.AppliedLayer)
 
+    def restore(self, state: tuple[int, ...]) -> None:
+        """
+        Replaces the layers with a value returned by snapshot().
 
-            for _ in range(self.size): #will run for self.size times
-                item  = NewStack.pop() #Popping is always constant --> O(1)
-                NewQueue.append(item) #Appending is always constant --> O(1)
-            self.AppliedLayer = NewQueue #Assignment is alway constant --> O(1)  
+        Complexity:
+        - best case = worst case = O(len(state))
+        """
+        layers = get_layers() #Constant --> O(1)
+        self.AppliedLayer.clear() #Constant --> O(1)
+        for index in state: #Will run for len(state) times
+            self.AppliedLayer.append(layers[index]) #Appending for circular queues is always constant --> O(1)
+        self.size = len(state) #Constant --> O(1)
+        self.changed() #Notifying is constant --> O(1)
                  
 
 class SequenceLayerStore(LayerStore):
@@ -365,6 +614,7 @@ class SequenceLayerStore(LayerStore):
         In the event of two layers being the median names, pick the lexicographically smaller one.
     """
     def __init__(self) -> None:
+        LayerStore.__init__(self) #Constant --> O(1)
         self.MAX_CAPACITY = 20 #Assignment is constant --> O(1)
         self.AddSorted = ArraySortedList(self.MAX_CAPACITY) #Assignment is constant --> O(1)
         self.all_layers = get_layers() #Assignment is constant --> O(1)
@@ -388,22 +638,29 @@ class SequenceLayerStore(LayerStore):
         - If the current layer is in the Sorted List, it will return False
 
         Complexity:
-        - As every operation in the function is constant, the best case is equal to the 
-          worst case, therefore best = worst = O(1)
+        - The layer is looked up with a binary search on the index, and inserted in place,
+          therefore best = worst = O(log n) + O(n) for the shift, where n = len(self.AddSorted) <= MAX_CAPACITY
         """
-        current_layer = ListItem(layer,layer.index)  #Setting list item is constant --> O(1)
+        if self.position_of(layer.index) >= 0: #Binary search --> O(log n)
+            return False  #Returning is always constant --> O(1)
+        self.AddSorted.add(ListItem(layer,layer.index)) # Sorted list add --> O(log n) + O(n)
+        self.changed() #Notifying is constant --> O(1)
+        return True # Returning is always constant --> O(1)
 
-        if current_layer not in self.AddSorted: #Integer comparison is always constant --> O(1)
-            self.AddSorted.add(current_layer) # Sorted list add is always constant --> O(1)
-            return True # Returning is always constant --> O(1)
-        else: #Integer comparison is always constant --> O(1)
-            return False  #Returning is always constant --> O(1)      
+    def position_of(self, index: int) -> int:
+        """
+        Returns the position in self.AddSorted of the layer of the given index, or -1 if it is not applied.
 
-        
-        
-        
+        Complexity:
+        - Binary search on the keys, best case = worst case = O(log n) where n = len(self.AddSorted)
+        """
+        position = self.AddSorted._index_to_add(ListItem(None, index)) #Binary search --> O(log n)
+        if position < len(self.AddSorted) and self.AddSorted[position].key == index: #Integer comparison is always constant --> O(1)
+            return position #Returning is always constant --> O(1)
+        return -1 #Returning is always constant --> O(1)
 
   
+    @cache_color
     def get_color(self, start: tuple, timestamp: float, x: int, y: int) -> tuple[int, int, int]:
         """
         Returns the colour this square should show, given the current layers.
@@ -422,16 +679,13 @@ class SequenceLayerStore(LayerStore):
         - Returns the effected color tuple
 
         Complexity:
-        - As the function is entirely dependent on looping through the layers, the best case will
-          always be equal to the worst case. The loop will always run for len(self.AddSorted) times with 
-          apply running each time. Therefore, the best = worst = O(self.AddSorted + apply + k), where k is 
-          an integer representing the constant operations. 
+        - As the function applies the compiled pipeline of the layers, the best case will
+          always be equal to the worst case. Therefore, the best = worst = O(get_pipeline) + O(s * apply),
+          where s is the number of compiled steps, at most len(self.AddSorted).
         """
         returning_val = start #Assignment is always constant --> O(1)
         if not self.AddSorted.is_empty(): #Integer comparison is always constant --> O(1)
-            for i in range(len(self.AddSorted)): #Runs for len(self.Addsorted) times --> O(len(self.AddSorted))
-                current_layer = self.AddSorted[i] # Assigment is always constant --> O(1)
-                returning_val = current_layer.value.apply(returning_val,timestamp,x,y) #Apply has it run time of --> O(apply)
+            returning_val = self.get_pipeline().apply(returning_val,timestamp,x,y) #O(get_pipeline) + O(s * apply)
         return returning_val #Returning is always constant --> O(1)        
 
     
@@ -452,21 +706,17 @@ class SequenceLayerStore(LayerStore):
         - If it is not empty, then it will return True
 
         Complexity:
-        - The for loop will always run for len(self.AddSorted) times. the best case is 
-          if the index looking to be deleted is in the last position, in which it will only take one step.
-          Therefore, the best case  = O(k) + O(k) + O(len(self.AddSorted)) = O(len(self.AddSorted) + k), where k is
-          an integer representing the other constant operations. The worst case is if the index looking to be deleted
-          is at the front in which it will need to traverse through the whole sorted list. Therefore, 
-          the worst case = O(k) + O(len(self)) + O(len(self.AddSorted)) = O(k + len(self) + len(self.AddSorted))
+        - The layer is found with a binary search rather than a scan. The best case is
+          if it is in the last position, in which deleting it takes one step, therefore,
+          best case = O(log n). The worst case is if it is at the front, in which every later
+          layer shifts left, therefore worst case = O(log n) + O(n), where n = len(self.AddSorted)
          """
-        if self.AddSorted.is_empty(): #Integer comparison is always constant --> O(1)
-            return False #Return statements is always constant --> O(1)
-        for i in range(len(self.AddSorted)): #Will run for len(self.AddSorted) times
-            if (layer.index) == self.AddSorted[i].key: #Integer comparison is always constant --> O(1)
-                self.AddSorted.delete_at_index(i) #If index is in last position then O(1), if index is at the front then O(len(self))
-                return True #Return statements are always constant --> O(1)
-            
-        return False    #Return statements are always constant --> O(1)
+        position = self.position_of(layer.index) #Binary search --> O(log n)
+        if position < 0: #Integer comparison is always constant --> O(1)
+            return False    #Return statements are always constant --> O(1)
+        self.AddSorted.delete_at_index(position) #If index is in last position then O(1), if index is at the front then O(n)
+        self.changed() #Notifying is constant --> O(1)
+        return True #Return statements are always constant --> O(1)
 
     
     def special(self):
@@ -480,7 +730,7 @@ class SequenceLayerStore(LayerStore):
         - Does not raise any errors
 
         Returns:
-        - Does not return any statements 
+        - The index of the removed layer, or -1 if no layer was applied
 
         Complexity:
         - The loop will always run for len(self.AddSorted) times. Best case is if the item which is being
@@ -507,11 +757,100 @@ class SequenceLayerStore(LayerStore):
                
 
         #Print the median of a list of names
+        removed = -1 #Assignment is always constant --> O(1)
         if len(self.AddSorted)!=0: #Comparison is always constant --> O(1)
             if len(self.AddSorted) % 2 == 0: #Comparison is always constant --> O(1)
-                self.AddSorted.delete_at_index(tmp_sorted_list[(n//2)-1].value) #If index is in last position then O(1), if index is at the front then O(len(self))
+                removed = self.AddSorted.delete_at_index(tmp_sorted_list[(n//2)-1].value).key #If index is in last position then O(1), if index is at the front then O(len(self))
             else: #Comparison is always constant --> O(1)
-                self.AddSorted.delete_at_index(tmp_sorted_list[n//2].value) #If index is in last position then O(1), if index is at the front then O(len(self))
+                removed = self.AddSorted.delete_at_index(tmp_sorted_list[n//2].value).key #If index is in last position then O(1), if index is at the front then O(len(self))
+            self.changed() #Notifying is constant --> O(1)
+        return removed #Returning is always constant --> O(1)
+
+    def add_undoable(self, layer: Layer) -> int:
+        """
+        Ensures the layer is applied, as add does.
+        Returns the layer's index if it was newly applied, or -1 if it already was and nothing changed.
+
+        Complexity:
+        - best case = worst case = O(add)
+        """
+        return layer.index if self.add(layer) else -1 #O(add)
+
+    def undo_add(self, token: int) -> None:
+        """
+        Removes the layer add_undoable applied, or nothing if token is -1.
+
+        Complexity:
+        - best case = worst case = O(erase), with a binary search for the layer
+        """
+        if token >= 0: #Integer comparison is always constant --> O(1)
+            self.erase(self.all_layers[token]) #O(log n) + O(n)
+
+    def special_undoable(self) -> int:
+        """
+        Removes the median layer, as special does.
+        Returns the index of the removed layer, or -1 if no layer was applied.
+
+        Complexity:
+        - best case = worst case = O(special)
+        """
+        return self.special() #O(special)
+
+    def undo_special(self, token: int) -> None:
+        """
+        Applies the layer special_undoable removed again, or nothing if token is -1.
+
+        Complexity:
+        - best case = worst case = O(add)
+        """
+        if token >= 0: #Integer comparison is always constant --> O(1)
+            self.add(self.all_layers[token]) #O(log n) + O(n)
+
+    def is_time_dependent(self) -> bool:
+        """
+        Returns true if the colour of this square can change with the timestamp alone.
+
+        Complexity:
+        - best case = worst case = O(get_pipeline)
+        """
+        return self.get_pipeline().time_dependent
+
+    def get_pipeline(self) -> Pipeline:
+        """
+        Returns the compiled pipeline of the current layers (see layer_pipeline.compile_stack).
+
+        Complexity:
+        - O(1) if the layers have not changed since the last call, otherwise O(len(self.AddSorted)) to compile.
+        """
+        if self.pipeline is None: #Comparison is always constant --> O(1)
+            self.pipeline = compile_stack(self.AddSorted[i].value for i in range(len(self.AddSorted))) #O(len(self.AddSorted))
+        return self.pipeline
+
+    def snapshot(self) -> int:
+        """
+        Returns a bitmask with bit i set when the layer of index i is applied.
+
+        Complexity:
+        - best case = worst case = O(len(self.AddSorted))
+        """
+        mask = 0 #Assignment is constant --> O(1)
+        for i in range(len(self.AddSorted)): #Will run for len(self.AddSorted) times
+            mask |= 1 << self.AddSorted[i].key #Constant --> O(1)
+        return mask
+
+    def restore(self, state: int) -> None:
+        """
+        Replaces the applied layers with a bitmask returned by snapshot().
+
+        Complexity:
+        - best case = worst case = O(MAX_CAPACITY), as the layers are added in index order,
+          each at the end of the sorted list.
+        """
+        self.AddSorted.clear() #Constant --> O(1)
+        for index in range(self.MAX_CAPACITY): #Will run for MAX_CAPACITY times
+            if state >> index & 1: #Constant --> O(1)
+                self.AddSorted.add(ListItem(self.all_layers[index], index)) #Adding at the end is constant --> O(1)
+        self.changed() #Notifying is constant --> O(1)
 
 
 
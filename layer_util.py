@@ -18,12 +18,33 @@ class Layer:
     apply: function
     name: str = field(init=False)
     bg: tuple[int, int, int] | None = None
+    kernel: function | None = None
+    time_dependent: bool = True
+    position_dependent: bool = True
+    color_dependent: bool = True
 
     def __post_init__(self):
         if hasattr(self.apply, "__bg__"):
             self.bg = self.apply.__bg__
         self.name = self.apply.__name__
 
+    def apply_array(self, colors, timestamp, xs, ys):
+        """
+        Apply this layer to a whole batch of squares at once.
+
+        colors is an (n, 3) integer array, xs and ys are (n,) integer arrays.
+        Uses the layer's array kernel if it has one, otherwise falls back to
+        calling apply on every square.
+        """
+        if self.kernel is not None:
+            return self.kernel(colors, timestamp, xs, ys)
+        import numpy as np
+        out = [
+            self.apply(tuple(color), timestamp, x, y)
+            for color, x, y in zip(colors.tolist(), xs.tolist(), ys.tolist())
+        ]
+        return np.array(out, dtype=np.int64).reshape(-1, 3)
+
 class background(object):
     """Simple decorator to add a __bg__ property to a layer
 
@@ -43,18 +64,39 @@ class background(object):
         func.__bg__ = self.val
         return layer
 
-def register(func):
+def register(func=None, *, kernel=None, time_dependent=True, position_dependent=True, color_dependent=True):
     """
     Layer register function.
 
     Usage:  @register
             def my_special_layer(...):
 
+    A batched version of the layer can be given as well. It receives
+    an (n, 3) array of colours, the timestamp and (n,) arrays of x and y
+    positions, and must return the same colours as the layer would.
+
+    Usage:  @register(kernel=my_special_kernel)
+            def my_special_layer(...):
+
+    Layers are assumed to use the timestamp, the (x, y) position and the
+    incoming colour. Layers that ignore some of them should say so with
+    time_dependent=False, position_dependent=False or color_dependent=False,
+    which lets squares holding them be cached or skip recompositing.
+    A layer with color_dependent=False always hides the layers applied before it.
+
     In order to actually confirm this registration,
     you'll need to import the file containing the layer definition
     """
+    if func is None:
+        return lambda func: register(
+            func, kernel=kernel, time_dependent=time_dependent,
+            position_dependent=position_dependent, color_dependent=color_dependent,
+        )
     global cur_layer_index
-    LAYERS[cur_layer_index] = Layer(cur_layer_index, func)
+    LAYERS[cur_layer_index] = Layer(
+        cur_layer_index, func, kernel=kernel, time_dependent=time_dependent,
+        position_dependent=position_dependent, color_dependent=color_dependent,
+    )
     cur_layer_index += 1
     return LAYERS[cur_layer_index-1]
 
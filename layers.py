@@ -1,11 +1,31 @@
 """
 All layers are defined here.
+
+Each layer also has an array kernel, which does the same work as the layer
+for a whole batch of squares at once (see `register`).
 """
 
 import colorsys
 from layer_util import background, register
 
-@register
+def _rainbow_kernel(colors, timestamp, xs, ys):
+    import numpy as np
+    h = (timestamp/20 + xs/20 + ys/20) % 1
+    l, s = 0.6, 0.6
+    m2 = l+s-(l*s)
+    m1 = 2.0*l - m2
+    def v(hue):
+        # Same steps as colorsys._v, so the results match to the bit.
+        hue = hue % 1.0
+        return np.where(
+            hue < colorsys.ONE_SIXTH, m1 + (m2-m1)*hue*6.0, np.where(
+            hue < 0.5, m2, np.where(
+            hue < colorsys.TWO_THIRD, m1 + (m2-m1)*(colorsys.TWO_THIRD-hue)*6.0, m1
+        )))
+    rgb = np.stack((v(h+colorsys.ONE_THIRD), v(h), v(h-colorsys.ONE_THIRD)), axis=-1)
+    return (255*rgb).astype(np.int64)
+
+@register(kernel=_rainbow_kernel, color_dependent=False)
 @background(200, 0, 120)
 def rainbow(color, timestamp, x, y):
     return tuple(
@@ -13,12 +33,18 @@ def rainbow(color, timestamp, x, y):
         for x in colorsys.hls_to_rgb((timestamp/20 + x/20 + y/20)%1, 0.6, 0.6)
     )
 
-@register
+def _black_kernel(colors, timestamp, xs, ys):
+    return colors * 0
+
+@register(kernel=_black_kernel, time_dependent=False, position_dependent=False, color_dependent=False)
 @background(170, 170, 170)
 def black(color, timestamp, x, y):
     return (0, 0, 0)
 
-@register
+def _lighten_kernel(colors, timestamp, xs, ys):
+    return (colors + 40).clip(None, 255)
+
+@register(kernel=_lighten_kernel, time_dependent=False, position_dependent=False)
 @background(240, 240, 240)
 def lighten(color, timestamp, x, y):
     return tuple(
@@ -26,7 +52,10 @@ def lighten(color, timestamp, x, y):
         for x in color
     )
 
-@register
+def _invert_kernel(colors, timestamp, xs, ys):
+    return 255 - colors
+
+@register(kernel=_invert_kernel, time_dependent=False, position_dependent=False)
 @background(0, 255, 255)
 def invert(color, timestamp, x, y):
     return tuple(
@@ -34,22 +63,51 @@ def invert(color, timestamp, x, y):
         for c in color
     )
 
-@register
+def _red_kernel(colors, timestamp, xs, ys):
+    out = colors * 0
+    out[:, 0] = 255
+    return out
+
+@register(kernel=_red_kernel, time_dependent=False, position_dependent=False, color_dependent=False)
 @background(255, 0, 0)
 def red(color, timestamp, x, y):
     return (255, 0, 0)
 
-@register
+def _green_kernel(colors, timestamp, xs, ys):
+    out = colors * 0
+    out[:, 1] = 255
+    return out
+
+@register(kernel=_green_kernel, time_dependent=False, position_dependent=False, color_dependent=False)
 @background(0, 255, 0)
 def green(color, timestamp, x, y):
     return (0, 255, 0)
 
-@register
+def _blue_kernel(colors, timestamp, xs, ys):
+    out = colors * 0
+    out[:, 2] = 255
+    return out
+
+@register(kernel=_blue_kernel, time_dependent=False, position_dependent=False, color_dependent=False)
 @background(0, 0, 255)
 def blue(color, timestamp, x, y):
     return (0, 0, 255)
 
-@register
+def _sparkle_kernel(colors, timestamp, xs, ys):
+    import numpy as np
+    ts = ((timestamp + xs/3 + ys/5) * 3).astype(np.int64)
+    rounds = 10 + (ts * 31 % 17)
+    other = xs.astype(np.int64)
+    for i in range(int(rounds.max(initial=0))):
+        other = np.where(i < rounds, (1103515245 * other + 12345) % (1 << 31), other)
+    other = other + ys
+    for i in range(int(rounds.max(initial=0))):
+        other = np.where(i < rounds, (1103515245 * other + 12345) % (1 << 31), other)
+    other = (other & ((1 << 31)-1)) >> 16
+    bright = (other/(1 << 15) < 0.1)[:, None]
+    return np.where(bright, _lighten_kernel(colors, timestamp, xs, ys), _darken_kernel(colors, timestamp, xs, ys))
+
+@register(kernel=_sparkle_kernel)
 @background(100, 170, 255)
 def sparkle(color, timestamp, x, y):
     ts = int((timestamp + x/3 + y/5) * 3)
@@ -65,7 +123,10 @@ def sparkle(color, timestamp, x, y):
         return lighten.apply(color, timestamp, x, y)
     return darken.apply(color, timestamp, x, y)
 
-@register
+def _darken_kernel(colors, timestamp, xs, ys):
+    return (colors - 40).clip(0, None)
+
+@register(kernel=_darken_kernel, time_dependent=False, position_dependent=False)
 @background(30, 30, 30)
 def darken(color, timestamp, x, y):
     return tuple(
@@ -1,17 +1,23 @@
+import os
 import arcade
 import arcade.key as keys
-import math
 from grid import Grid
-from layer_util import get_layers, Layer
+from layer_util import get_layers
 from layers import lighten
-from layer_store import SetLayerStore
-from action import PaintStep,PaintAction
-from undo import UndoTracker
-from replay import *
+from brush import traverse_cells
+from engine import PaintEngine
+from input_queue import MotionQueue
+from gl_renderer import GridRenderer
+from journal import Journal
 
 
-class MyWindow(arcade.Window):
-    """ Painter Window """
+class MyWindow(PaintEngine, arcade.Window):
+    """
+    Painter Window
+
+    Drawing and input handling. The painting logic (on_paint, on_undo, ...)
+    comes from engine.PaintEngine, which does not depend on arcade.
+    """
 
     SCREEN_WIDTH = 800
     SCREEN_HEIGHT = 700
@@ -19,7 +25,20 @@ class MyWindow(arcade.Window):
     BUTTONS_HEIGHT = 100
     SCREEN_TITLE = "Paint"
 
+    # Seconds between two replayed actions, at normal speed.
     REPLAY_TIMER_DELTA = 0.05
+    # While replaying: Up / Down double / halve the speed, Space plays backwards or forwards,
+    # Left / Right jump this many seconds of replay back / forward.
+    REPLAY_SEEK = 2.0
+    REPLAY_MAX_SPEED = 256
+    # Paint a drag as one sweep of the brush along the squares crossed, rather than a paint per square.
+    SWEPT_BRUSH = True
+    # Seconds per frame spent painting queued mouse motion; the rest waits for the next frame.
+    MOTION_BUDGET = 0.004
+    # Directory to autosave the drawing to (see journal.Journal), with one journal per draw style and
+    # grid size, so the drawing is recovered when the window is opened again, even after a crash.
+    # None turns it off.
+    JOURNAL_DIR = None
 
     GRID_SIZE_X = 32
     GRID_SIZE_Y = 32
@@ -40,12 +59,19 @@ class MyWindow(arcade.Window):
         self.z_timer = 0
         self.y_timer = 0
         self.enable_ui = True
-        self.replay_timer = 0
         self.on_init()
 
     def reset(self) -> None:
         """Reset the screen."""
-        self.grid = Grid(self.draw_style, self.GRID_SIZE_X, self.GRID_SIZE_Y)
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        if self.JOURNAL_DIR is None:
+            self.grid = Grid(self.draw_style, self.GRID_SIZE_X, self.GRID_SIZE_Y)
+        else:
+            name = f"{self.draw_style}-{self.GRID_SIZE_X}x{self.GRID_SIZE_Y}"
+            self.journal = Journal(os.path.join(self.JOURNAL_DIR, name))
+            self.grid = self.journal.recover(self.draw_style, self.GRID_SIZE_X, self.GRID_SIZE_Y)
         self.timestamp = 0
 
         self.selected_layer_index = -1
@@ -59,6 +85,15 @@ class MyWindow(arcade.Window):
         self.GRID_SQ_WIDTH = self.DRAW_PANEL / self.GRID_SIZE_X
         self.GRID_SQ_HEIGHT = self.SCREEN_HEIGHT / self.GRID_SIZE_Y
         self.LAYER_BUTTON_SIZE = self.SIDEBAR_WIDTH / 2
+        # Mouse motion while dragging, painted in on_update.
+        self.motion_queue = MotionQueue(self.GRID_SQ_WIDTH, self.GRID_SQ_HEIGHT, self.MOTION_BUDGET)
+        # Grid squares, drawn in one batch.
+        self.grid_renderer = GridRenderer(self.ctx, self.GRID_SIZE_X, self.GRID_SIZE_Y, self.GRID_SQ_WIDTH, self.GRID_SQ_HEIGHT)
+        self.reset_grid_colors()
+        if self.journal is not None: # The recovered drawing is drawn in full once
+            for x in range(self.GRID_SIZE_X):
+                for y in range(self.GRID_SIZE_Y):
+                    self.grid.square_changed(x, y)
         # Action button sprites
         self.action_buttons = arcade.SpriteList()
         self.draw_mode_button = arcade.Sprite(
@@ -101,6 +136,11 @@ class MyWindow(arcade.Window):
 
         self.on_reset()
 
+    def reset_grid_colors(self) -> None:
+        """Fill the grid colours with the background, matching a freshly created grid."""
+        self.grid_colors = bytearray(self.BG) * (self.GRID_SIZE_X * self.GRID_SIZE_Y)
+        self.grid_renderer.write(self.grid_colors)
+
     def setup(self) -> None:
         """Set up the game and initialize the variables."""
         self.reset()
@@ -125,16 +165,10 @@ class MyWindow(arcade.Window):
             arcade.draw_text(str(i), xstart, (ystart+yend)/2, (0, 0, 0), 18, width=xend-xstart, align="center", bold=True, anchor_y="center")
         # UI - Draw Modes / Action buttons
         self.action_buttons.draw()
-        # Grid
-        for x in range(self.GRID_SIZE_X):
-            for y in range(self.GRID_SIZE_Y):
-                arcade.draw_lrtb_rectangle_filled(
-                    self.GRID_SQ_WIDTH * x,
-                    self.GRID_SQ_WIDTH * (x+1),
-                    self.GRID_SQ_HEIGHT * (y+1),
-                    self.GRID_SQ_HEIGHT * y,
-                    self.grid[x][y].get_color(self.BG[:], self.timestamp, x, y),
-                )
+        # Grid - only changed or animated squares (or tiles) are recomputed, then all are drawn in a single draw call.
+        if self.grid.compose(self.grid_colors, self.BG[:], self.timestamp):
+            self.grid_renderer.write(self.grid_colors)
+        self.grid_renderer.draw()
 
     def on_mouse_press(self, x: int, y: int, button: int, modifiers: int) -> None:
         """Called when the mouse buttons are pressed."""
@@ -184,13 +218,17 @@ class MyWindow(arcade.Window):
                 self.on_special()
         else:
             self.dragging = True
+            self.begin_stroke()
             self.try_draw(x, y)
 
     def on_mouse_release(self, x: int, y: int, button: int, modifiers: int):
         """Called when the mouse buttons are released."""
+        self.flush_motion()
+        self.motion_queue.clear()
         self.dragging = False
         self.prev_drawn = None
         self.prev_pos = None
+        self.end_stroke()
 
     def on_mouse_motion(self, x, y, dx, dy) -> None:
         """Called when the mouse moves."""
@@ -200,18 +238,25 @@ class MyWindow(arcade.Window):
             return
         if x > self.DRAW_PANEL:
             return
-        self.try_draw(x, y)
+        self.motion_queue.push(x, y)
+
+    def flush_motion(self) -> None:
+        """Paint all queued mouse motion now, before anything that has to come after it."""
+        self.motion_queue.flush(self.try_draw)
 
     def on_key_press(self, symbol: int, modifiers: int) -> None:
         """Called when a keyboard key is pressed."""
         if not self.enable_ui:
+            self.replay_key(symbol)
             return
         self.z_pressed = keys.Z == symbol and (modifiers & keys.MOD_CTRL)
         self.y_pressed = keys.Y == symbol and (modifiers & keys.MOD_CTRL)
         if self.z_pressed:
+            self.flush_motion()
             self.on_undo()
             self.z_timer = 0.5
         if self.y_pressed:
+            self.flush_motion()
             self.on_redo()
             self.y_timer = 0.5
 
@@ -226,57 +271,78 @@ class MyWindow(arcade.Window):
             return
         layer = get_layers()[self.selected_layer_index]
         if self.prev_pos is not None:
-            # Try draw in increments of 0.5 to avoid skipping squares.
-            mhat_dist = abs(x - self.prev_pos[0]) + abs(y - self.prev_pos[1])
-            increment = 0.5
-            points_to_draw = []
-            for d in range(1, math.ceil(mhat_dist/increment)+1):
-                distance = min(d * increment / mhat_dist, 1)
-                nx = distance * (x - self.prev_pos[0]) + self.prev_pos[0]
-                ny = distance * (y - self.prev_pos[1]) + self.prev_pos[1]
-                nx_pos = int(nx // self.GRID_SQ_WIDTH)
-                ny_pos = int(ny // self.GRID_SQ_HEIGHT)
-                points_to_draw.append((nx_pos, ny_pos))
+            # Every square crossed since the last position, once each.
+            points_to_draw = traverse_cells(
+                self.prev_pos[0], self.prev_pos[1], x, y, self.GRID_SQ_WIDTH, self.GRID_SQ_HEIGHT,
+            )
         else:
-            x_pos = int(x // self.GRID_SQ_WIDTH)
-            y_pos = int(y // self.GRID_SQ_HEIGHT)
             points_to_draw = [
-                (x_pos, y_pos)
+                (int(x // self.GRID_SQ_WIDTH), int(y // self.GRID_SQ_HEIGHT))
             ]
+        path = []
         for px, py in points_to_draw:
             if self.prev_drawn is None or (px, py) != self.prev_drawn:
                 if 0 <= px < self.GRID_SIZE_X and 0 <= py < self.GRID_SIZE_Y:
-                    self.on_paint(layer, px, py)
+                    path.append((px, py))
                     self.prev_drawn = (px, py)
+        if self.SWEPT_BRUSH and len(path) > 1:
+            self.on_sweep(layer, path)
+        else:
+            for px, py in path:
+                self.on_paint(layer, px, py)
         self.prev_pos = (x, y)
 
     def start_replay(self) -> None:
-        """Begin the replay mode."""
+        """Begin the replay mode, from the start of the replay, at normal speed."""
+        self.flush_motion()
         self.enable_ui = False
-        self.grid = Grid(self.draw_style, self.GRID_SIZE_X, self.GRID_SIZE_Y)
-        self.replay_timer = self.REPLAY_TIMER_DELTA
+        self.ReplayTracker.step = self.REPLAY_TIMER_DELTA
+        self.on_replay_speed(1)
         self.on_replay_start()
 
+    def replay_key(self, symbol: int) -> None:
+        """Changes the speed of the replay, or moves it, while replaying."""
+        speed = self.ReplayTracker.speed
+        if symbol == keys.UP and abs(speed) < self.REPLAY_MAX_SPEED:
+            self.on_replay_speed(speed * 2)
+        elif symbol == keys.DOWN and abs(speed) > 1 / self.REPLAY_MAX_SPEED:
+            self.on_replay_speed(speed / 2)
+        elif symbol == keys.SPACE:
+            self.on_replay_speed(-speed)
+        elif symbol == keys.LEFT:
+            self.on_replay_seek(self.ReplayTracker.time - self.REPLAY_SEEK)
+        elif symbol == keys.RIGHT:
+            self.on_replay_seek(self.ReplayTracker.time + self.REPLAY_SEEK)
+
     def on_update(self, delta_time) -> None:
         """Movement and game logic."""
         self.timestamp += delta_time
+        self.motion_queue.drain(self.try_draw)
         if self.z_pressed:
             self.z_timer -= delta_time
             if self.z_timer <= 0:
+                self.flush_motion()
                 self.on_undo()
                 self.z_timer += 0.05
         if self.y_pressed:
             self.y_timer -= delta_time
             if self.y_timer <= 0:
+                self.flush_motion()
                 self.on_redo()
                 self.y_timer += 0.05
         if not self.enable_ui:
-            self.replay_timer -= delta_time
-            if self.replay_timer <= 0:
-                self.replay_timer += self.REPLAY_TIMER_DELTA
-                finished = self.on_replay_next_step()
-                if finished:
-                    self.enable_ui = True
+            finished = self.on_replay_advance(delta_time)
+            if finished:
+                self.on_replay_stop()
+                self.enable_ui = True
+
+    def on_close(self) -> None:
+        """Writes what is left of the journal, if any, to disk before the window closes."""
+        self.end_stroke()
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        super().on_close()
 
     def change_draw_mode(self) -> None:
         """Changes the draw mode of the application, and resets the window."""
@@ -288,214 +354,6 @@ class MyWindow(arcade.Window):
             self.draw_style = Grid.DRAW_STYLE_SET
         self.reset()
 
-    # STUDENT PART
-
-    def on_init(self):
-        """Initialisation that occurs after the system initialisation."""
-        self.UndoTracker = UndoTracker()
-        self.ReplayTracker = ReplayTracker()
-
-        
-
-    def on_reset(self):
-        """Called when a window reset is requested."""
-        pass
-
-    def on_paint(self, layer: Layer, px: int, py:int):
-        """
-        Called when a grid square is clicked on, which should trigger painting in the vicinity.
-        Vicinity squares outside of the range [0, GRID_SIZE_X) or [0, GRID_SIZE_Y) can be safely ignored.
-
-        layer: The layer being applied.
-        px: x position of the brush.
-        py: y position of the brush.
-        
-        Args:
-        - layer = Layer being pained
-        - px = x position of the brush.
-        - py = y position of the brush.
-
-        Raises:
-        - Does not raise any errors
-
-        Returns:
-        - Does not return anything
-
-        Complexity:
-        - As both the loops will run for n-1 times, the best case will be equal to the worst case.
-          As both loops will run for (n-1) times, the overall time complexity can be displayed by,
-          O(self.grid.x) * O(self.grid.y) + O(add_action) + O(k) where k is a constant representing the constant operations. 
-          If we allow "n" to self.grid.x and self.grid.y,being represented by n = self.grid.x = self.grid.y, 
-          the runtime can be displayed by O(n) * O(n) + O(add_action) + O(k).Simplified further, this can be represented as, 
-          O(n^2) + O(add_action) + O(k) --> O(n^2 + add_action + k)
-        
-        """
-        PaintList = [] #Assignment is always constant --> O(1)
-        for i in range(self.grid.x): #Will run for self.grid.x times
-            for j in range(self.grid.y): #Will run for self.grid.y times
-                manhattan_distance = abs(px-i) + abs(py-j) #Will run for i,j times
-                if manhattan_distance <= self.grid.DEFAULT_BRUSH_SIZE: #Assignment is always constant --> O(1)
-                    self.grid[i][j].add(layer) #Time complexity of O(self.grid.add) and will run for i,j times
-                    PaintList.append(PaintStep((i,j),layer)) #Appending is always constant --> O(1)
-        self.UndoTracker.add_action(PaintAction(PaintList,False)) #Runtime of --> O(add_action)   
-        self.ReplayTracker.add_action(PaintAction(PaintList,False)) #Runtime of --> O(add_action)          
-        
-    def on_undo(self):
-        """
-        Called when an undo is requested.
-
-        Args:
-        - self
-
-        Raises:
-        - Does not raise any errors
-
-        Returns:
-        - Does not return anything
-        
-        Complexity:
-        - Best case = worst case = O(undo)
-
-        """
-        self.UndoTracker.undo(self.grid) # Run time will be --> O(undo)
-
-    def on_redo(self):
-        """
-        Called when a redo is requested.
-        
-
-        Args:
-        - self
-
-        Raises:
-        - Does not raise any errors
-
-        Returns:
-        - Does not return anything
-        
-        Complexity:
-        - Best case = worst case = O(redo)
-        """
-        self.UndoTracker.redo(self.grid)
-
-    def on_special(self):
-        """
-        Called when the special action is requested.
-        
-        Args:
-        - self
-
-        Raises:
-        - Does not raise any errors
-
-        Returns:
-        - Does not raise anything
-
-        Complexity:
-        - As for self.grid.special, in the grid class there are two for loops implemented, 
-          each for loop will run x times and y times no matter circumstance, therefore, 
-          best case = worst case. As the two for loops will be run x times and y times, 
-          the time complexity can be written as O(x) * O(y), re-writing both x and y as "n", we
-          get O(n) * O(n) --> O(k*n^2 ) where k is a constant due to the recursive calling of special each time. Therefore,
-          the overall complexity is represented by O(k*n^2) + O(add_action) --> O(k*n^2 + add_action)
-        """
-        self.grid.special() # grid special is --> O(k*n^2) where k is some integer
-        self.UndoTracker.add_action(PaintAction([],True)) #run time of --> O(add_action)
-        self.ReplayTracker.add_action(PaintAction([],True)) #run time of --> O(add_action)
-
-    def on_replay_start(self):
-        """
-        Called when the replay starting is requested.
-
-        Args:
-        - self
-
-        Raises:
-        - Does not raise any errors
-
-        Returns:
-        - Does not return anything
-        
-        Complexity:
-        - Best case = worst case = O(start_replay)
-        """
-        self.ReplayTracker.start_replay() #Run time of --> O(start_replay)
-
-    def on_replay_next_step(self) -> bool:
-        """
-        Called when the next step of the replay is requested.
-        Returns whether the replay is finished.
-
-        Args:
-        - self
-
-        Raises:
-        - Does not raise any errors
-
-        Returns:
-        - Returns a boolean depending on result of play_next_action
-        
-        Complexity:
-        - Best case = worst case = O(play_next_action).
-          O(play_next_action) can be written as:
-          As all operations are constant except of those that are of redo_apply and undo_apply,
-          it is safe to assume that best case = worst case. If redo apply is called, then the 
-          run time complexity is equal to O(k) + O(redo_apply) where k is an integer which represents
-          the constant operations. If Undo apply is called, then the 
-          run time complexity is equal to O(k) + O(undo_apply) where k is an integer which represents
-          the constant operations.
-        """
-        self.ReplayTracker.play_next_action(self.grid) #Run time of --> O(play_next_action)
-
-    def on_increase_brush_size(self):
-        """
-        Called when an increase to the brush size is requested.
-
-        Args:
-        - self
-
-        Raises:
-        - Does not raise any errors
-
-        Returns:
-        - Does not return anything
-
-        Complexity:
-        - best case = worst case = O(increase_brush_size).
-          O(increase_brush_size) can be written as:
-          As we do not always know the default brush size, there are best and worst cases. Best case
-          is if the default brush size is already equal to the brush size in which the while loop will 
-          not need to increment "n" times, rather it will always stop at one size, therefore, Best Case = O(1).
-          The worst case is if it needs to increment, in which it will increment "n" times so that the default 
-          brush size is equal to the Maximum brush size, therefore, worst case = O(n)
-        """
-        self.grid.increase_brush_size() #O(increase_brush_size)
-
-    def on_decrease_brush_size(self):
-        """
-        Called when a decrease to the brush size is requested.
-
-        Args:
-        - self
-
-        Raises:
-        - Does not raise any errors
-
-        Returns:
-        - Does not return anything
-
-        Complexity:
-        - best case = worst case = O(increase_brush_size)
-          O(increase_brush_size) can be written as:
-          As we do not always know the default brush size, there are best and worst cases. Best case
-          is if the default brush size is already equal to the brush size in which the while loop will 
-          not need to decrement "n" times, rather it will always stop at one size, therefore, Best Case = O(1).
-          The worst case is if it needs to decrement, in which it will increment "n" times so that the default 
-          brush size is equal to the Minimum brush size, therefore, worst case = O(n)
-
-        """
-        self.grid.decrease_brush_size() #O(increase_brush_size)
-
 def main():
     """ Main function """
     window = MyWindow()
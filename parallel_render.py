@@ -0,0 +1,107 @@
+"""
+Multi-process compositing.
+
+The layers are pure Python and CPU bound, so a frame is split into
+rectangular regions which are composited on a process pool. Each worker
+gets a compact snapshot of its region (the draw style and one
+LayerStore.snapshot() value per square), rebuilds the stores, and sends
+back the RGB bytes of the region. The result is identical to compositing
+every square in the calling process.
+"""
+
+from __future__ import annotations
+from concurrent.futures import Executor, ProcessPoolExecutor
+from grid import Grid
+from tiled_grid import blit_region
+
+DEFAULT_REGION_SIZE = 64
+
+
+def region_snapshot(grid: Grid, x0: int, y0: int, width: int, height: int) -> tuple:
+    """
+    Returns a picklable snapshot of the layers of a width x height region of grid starting at (x0, y0).
+
+    Complexity:
+    - O(width * height * snapshot)
+    """
+    return (
+        grid.draw_style, x0, y0, width, height,
+        [grid[x][y].snapshot() for x in range(x0, x0 + width) for y in range(y0, y0 + height)],
+    )
+
+
+def composite_region(snapshot: tuple, start, timestamp: float) -> bytes:
+    """
+    Composites a region snapshot taken by region_snapshot.
+
+    Returns:
+    - width * height * 3 bytes, ordered by x and then y
+
+    Complexity:
+    - O(width * height * (restore + get_color))
+    """
+    draw_style, x0, y0, width, height, states = snapshot
+    region = Grid(draw_style, 0, 0, sparse=True)
+    rgb = bytearray(width * height * 3)
+    i = 0
+    for x in range(x0, x0 + width):
+        for y in range(y0, y0 + height):
+            store = region.new_store()
+            store.restore(states[i])
+            rgb[i*3:i*3+3] = store.get_color(start, timestamp, x, y)
+            i += 1
+    return bytes(rgb)
+
+
+def regions(grid: Grid, region_size: int = DEFAULT_REGION_SIZE):
+    """Yields (x0, y0, width, height) for every region_size x region_size region of grid."""
+    for x0 in range(0, grid.x, region_size):
+        for y0 in range(0, grid.y, region_size):
+            yield x0, y0, min(region_size, grid.x - x0), min(region_size, grid.y - y0)
+
+
+def composite_serial(grid: Grid, start, timestamp: float) -> bytearray:
+    """
+    Returns the colours of every square of grid, in the layout of GridRenderer,
+    composited in this process. The reference for composite_parallel.
+
+    Complexity:
+    - O(x * y * get_color)
+    """
+    colors = bytearray(grid.x * grid.y * 3)
+    for x in range(grid.x):
+        for y in range(grid.y):
+            i = (x * grid.y + y) * 3
+            colors[i:i+3] = grid[x][y].get_color(start, timestamp, x, y)
+    return colors
+
+
+def composite_parallel(grid: Grid, start, timestamp: float, executor: Executor | None = None,
+                       workers: int | None = None, region_size: int = DEFAULT_REGION_SIZE) -> bytearray:
+    """
+    Returns the same colours as composite_serial, compositing the regions of grid on a process pool.
+
+    Args:
+    - grid, start, timestamp = As for composite_serial
+    - executor = The pool to use. Keep one around when rendering many frames,
+      as starting a pool costs far more than a frame. If None, a
+      ProcessPoolExecutor with the given number of workers is used for this call.
+    - workers = The number of processes when no executor is given (None = one per core)
+    - region_size = The width and height of a region, in squares
+
+    Complexity:
+    - O(x * y * get_color / p) with p processes, plus O(x * y) to snapshot the
+      layers in this process and copy the results back.
+    """
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return composite_parallel(grid, start, timestamp, pool, region_size=region_size)
+    start = tuple(start)
+    jobs = [
+        (region, executor.submit(composite_region, region_snapshot(grid, *region), start, timestamp))
+        for region in regions(grid, region_size)
+    ]
+    colors = bytearray(grid.x * grid.y * 3)
+    for (x0, y0, width, height), job in jobs:
+        blit_region(colors, grid.y, x0, y0, width, height, job.result())
+    return colors
@@ -0,0 +1,83 @@
+"""
+Headless rendering.
+
+Turns a grid into pixels without a window, an OpenGL context or arcade,
+for batch jobs on machines with no display. Only needs NumPy.
+"""
+
+from __future__ import annotations
+import struct
+import zlib
+import numpy as np
+from array_grid import ArrayGrid
+from grid import Grid
+from parallel_render import composite_serial
+
+DEFAULT_BG = (255, 255, 255)
+
+
+def render(grid: Grid, timestamp: float = 0, start=DEFAULT_BG) -> np.ndarray:
+    """
+    Returns the colours of every square of grid at timestamp.
+
+    Args:
+    - grid = Any grid (Grid, sparse Grid, TiledGrid or ArrayGrid)
+    - timestamp = The time used by animated layers
+    - start = The background colour
+
+    Returns:
+    - An (x, y, 3) uint8 array, where [i, j] is the colour of grid[i][j]
+
+    Complexity:
+    - O(x * y * get_color), or one batched pass for an ArrayGrid.
+    """
+    if isinstance(grid, ArrayGrid):
+        return grid.render(start, timestamp)
+    colors = composite_serial(grid, start, timestamp)
+    return np.frombuffer(bytes(colors), dtype=np.uint8).reshape(grid.x, grid.y, 3)
+
+
+def to_image(colors: np.ndarray, scale: int = 1) -> np.ndarray:
+    """
+    Turns an (x, y, 3) array from render into (height, width, 3) image rows,
+    top row first as on screen (grid y grows upwards), with each square
+    drawn as scale x scale pixels.
+
+    Complexity:
+    - O(x * y * scale^2)
+    """
+    image = colors.transpose(1, 0, 2)[::-1]
+    if scale != 1:
+        image = image.repeat(scale, axis=0).repeat(scale, axis=1)
+    return np.ascontiguousarray(image, dtype=np.uint8)
+
+
+def write_png(path: str, image: np.ndarray) -> None:
+    """
+    Writes (height, width, 3) uint8 image rows to path as an 8 bit RGB PNG.
+
+    Complexity:
+    - O(height * width)
+    """
+    height, width, _ = image.shape
+    rows = np.zeros((height, 1 + width * 3), dtype=np.uint8)  # Filter byte 0 (none) on every row.
+    rows[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)))
+        f.write(chunk(b"IEND", b""))
+
+
+def save_png(grid: Grid, path: str, timestamp: float = 0, start=DEFAULT_BG, scale: int = 1) -> None:
+    """
+    Renders grid at timestamp and writes it to path as a PNG, scale pixels per square.
+
+    Complexity:
+    - O(render) + O(x * y * scale^2)
+    """
+    write_png(path, to_image(render(grid, timestamp, start), scale))
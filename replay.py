@@ -3,24 +3,95 @@ from action import PaintAction
 from grid import Grid
 from data_structures.queue_adt import CircularQueue
 from action import PaintAction
+import snapshot
 
 class ReplayTracker:
+    """
+    Replay of every action taken, in order, which can be played one action at a
+    time, played at any speed (see advance), or moved to any point (see seek).
+
+    Action i of the replay plays at time (i + 1) * step seconds, so position is
+    the number of actions the replay grid holds. The actions are kept once the
+    replay goes past them, and a keyframe (a snapshot of the replay grid, see
+    snapshot.dumps) is taken every keyframe_every actions the first time the
+    replay reaches them. Moving to any position already reached then costs
+    restoring the nearest keyframe before it and playing at most keyframe_every
+    actions, whichever way the replay moves.
+
+    A replay started on the live grid (start_replay(grid)) shares its actions
+    with the undo history, and playing them changes their inverse tokens. Until
+    stop_replay, the live grid and the tokens are kept aside, and stop_replay
+    puts both back, so undo carries on from the state the replay started in.
+    """
 
-    
     ReplayQueue : CircularQueue
 
+    DEFAULT_MAX_ACTIONS = 10000
+    DEFAULT_KEYFRAME_EVERY = 100
+    DEFAULT_STEP = 0.05
 
-    def __init__(self) -> None:
-        self.ReplayQueue = CircularQueue(10000) #Assignment is always constant
+    def __init__(self, max_actions: int = DEFAULT_MAX_ACTIONS, keyframe_every: int = DEFAULT_KEYFRAME_EVERY,
+                 step: float = DEFAULT_STEP) -> None:
+        """
+        Args:
+        - max_actions = How many actions the replay keeps. Actions added past that are ignored.
+        - keyframe_every = How many actions apart keyframes are taken
+        - step = Seconds of replay between two actions, at speed 1
+        """
+        self.ReplayQueue = CircularQueue(max_actions) #Assignment is always constant
+        self.keyframe_every = keyframe_every #Assignment is always constant --> O(1)
+        self.step = step #Assignment is always constant --> O(1)
+        self.position = 0 #Number of actions played on the replay grid
+        self.time = 0.0 #Seconds of replay played
+        self.speed = 1.0 #Replay seconds per second, negative to play backwards
+        self.keyframes = {} #Position -> snapshot.dumps of the replay grid there
+        self.shape = None #(draw style, x, y) of the grid the keyframes were taken of
+        self.live = None #snapshot.dumps of the grid start_replay was given, until stop_replay
+        self.saved = {} #id(action) -> (action, its inverse tokens before the replay played it)
 
 
-    def start_replay(self) -> None:
+    def start_replay(self, grid: Grid | None = None) -> None:
         """
         Called whenever we should stop taking actions, and start playing them back.
 
-        Useful if you have any setup to do before `play_next_action` should be called.
+        Without a grid, the replay goes on from where it stopped. Given a grid, the
+        replay starts over on it: whatever the grid holds is kept aside for stop_replay,
+        and the grid is brought back to the start of the replay (an empty grid), so
+        there is no need to create a new one.
+
+        Args:
+        - grid = The grid to replay on from the start, or None
+
+        Complexity:
+        - O(1) without a grid, O(snapshot.dumps) + O(snapshot.restore) with one.
+        """
+        self.time = 0.0 #Assignment is always constant --> O(1)
+        if grid is None: #Checking is constant --> O(1)
+            return
+        self._check_shape(grid) #Constant --> O(1)
+        if self.live is None: #A replay started again before stop_replay keeps the first live state
+            self.live = snapshot.dumps(grid) #O(snapshot.dumps)
+        if 0 not in self.keyframes: #The start of the replay is an empty grid
+            self.keyframes[0] = snapshot.dumps(Grid(grid.draw_style, grid.x, grid.y, sparse=True)) #O(x*y)
+        snapshot.restore(grid, self.keyframes[0]) #O(snapshot.restore)
+        self.position = 0 #Assignment is always constant --> O(1)
+
+    def stop_replay(self, grid: Grid) -> None:
         """
-        pass
+        Ends a replay started with start_replay(grid): puts back the grid as it was
+        then, and the inverse tokens of the actions the replay played, so the undo
+        history matches the grid again. Does nothing for a replay started without a grid.
+
+        Complexity:
+        - O(snapshot.restore) + O(a) for the a actions played.
+        """
+        if self.live is None: #Checking is constant --> O(1)
+            return
+        snapshot.restore(grid, self.live) #O(snapshot.restore)
+        for action, saved in self.saved.values(): #Runs a times
+            action.load_inverse(saved)
+        self.live = None #Assignment is always constant --> O(1)
+        self.saved = {} #Assignment is always constant --> O(1)
 
     def add_action(self, action: PaintAction, is_undo: bool=False) -> None:
         """
@@ -37,16 +108,16 @@ class ReplayTracker:
         - Does not raise any errors
 
         Returns:
-        - Does not return anything 
+        - Does not return anything
 
         Complexity:
         - As all operations are constant, best case = worst case  = O(1)
         """
-        
+
         if not self.ReplayQueue.is_full(): #Integer comparison is always constant --> O(1)
             self.ReplayQueue.append((action,is_undo))  #Appending for circular queues is always constant --> O(1)
-            
-   
+
+
 
     def play_next_action(self, grid: Grid) -> bool:
         """
@@ -57,36 +128,160 @@ class ReplayTracker:
 
         Args:
         - self
-        - grid = The grid the undo was going to be applied on    
+        - grid = The grid the undo was going to be applied on
 
         Raises:
         - Does not raise any errors
 
         Returns:
-        - If ReplayQueue is empty, return True
-        - If ReplayQueue is not empty, return False
+        - If every action has been played, return True
+        - Otherwise, return False
 
         Complexity:
         - As all operations are constant except of those that are of redo_apply and undo_apply,
-          it is safe to assume that best case = worst case. If redo apply is called, then the 
+          it is safe to assume that best case = worst case. If redo apply is called, then the
           run time complexity is equal to O(k) + O(redo_apply) where k is an integer which represents
-          the constant operations. If Undo apply is called, then the 
+          the constant operations. If Undo apply is called, then the
           run time complexity is equal to O(k) + O(undo_apply) where k is an integer which represents
-          the constant operations.
+          the constant operations. Every keyframe_every actions, O(snapshot.dumps) is added the
+          first time the replay reaches them.
+        """
+        if self.position == len(self.ReplayQueue): #Integer comparison is always constant --> O(1)
+            return True  #Returning is always constant --> O(1)
+        self._play(grid) #O(redo_apply) or O(undo_apply)
+        self.time = self.position * self.step #Assignment is always constant --> O(1)
+        return False #Returning is always constant --> O(1)
+
+    def duration(self) -> float:
+        """
+        Returns the length of the replay in seconds, at speed 1.
+
+        Complexity:
+        - best case = worst case = O(1)
+        """
+        return len(self.ReplayQueue) * self.step #Constant --> O(1)
+
+    def set_speed(self, speed: float) -> None:
+        """
+        Sets how many seconds of replay advance plays per second: 2 plays twice as
+        fast, 0 pauses, and a negative speed plays the replay backwards.
+
+        Complexity:
+        - best case = worst case = O(1)
+        """
+        self.speed = speed #Assignment is always constant --> O(1)
+
+    def advance(self, delta_time: float, grid: Grid) -> bool:
+        """
+        Moves the replay on by delta_time seconds at the current speed. However many
+        actions that covers, the grid goes straight to the position reached: the
+        states in between are never drawn, and far jumps go through a keyframe.
+
+        Args:
+        - delta_time = Seconds since the last call, such as the time between two frames
+        - grid = The grid the replay is played on
+
+        Returns:
+        - True if the replay reached its end. Playing backwards stops at the start,
+          where the replay waits for a positive speed, without finishing.
+
+        Complexity:
+        - O(goto)
+        """
+        self.seek(self.time + delta_time * self.speed, grid) #O(goto)
+        return self.speed > 0 and self.position == len(self.ReplayQueue) #Comparison is always constant --> O(1)
+
+    def seek(self, t: float, grid: Grid) -> int:
+        """
+        Moves the replay to time t, in seconds from its start, clamped to [0, duration()].
+
+        Args:
+        - t = The time to go to
+        - grid = The grid the replay is played on
+
+        Returns:
+        - The position reached, the number of actions played before t
+
+        Complexity:
+        - O(goto)
         """
-        if not self.ReplayQueue.is_empty(): #Integer comparison is always constant --> O(1)
-            ActionReplay = self.ReplayQueue.serve()  # Serving circular queue is always constant --> O(1)
-            if ActionReplay[1] == False: #Integer comparison is always constant --> O(1)
-                ActionReplay[0].redo_apply(grid) #Will be of run time of --> O(redo_apply)
-            else: #Integer comparison is always constant --> O(1)
-                ActionReplay[0].undo_apply(grid) #Will be of run time of --> O(undo_apply)
-            return False #Returning is always constant --> O(1) 
-        else: #Integer comparison is always constant --> O(1)
-            return True  #Returning is always constant --> O(1)    
+        self.time = min(max(t, 0.0), self.duration()) #Constant --> O(1)
+        self._move(min(int(self.time / self.step + 1e-9), len(self.ReplayQueue)), grid) #O(goto)
+        return self.position
+
+    def goto(self, index: int, grid: Grid) -> None:
+        """
+        Moves the replay, and grid, to the state after its first index actions.
+
+        The grid gets there from whichever is closer: the current position, when
+        index is ahead of it, or the nearest keyframe before index. Actions past the
+        furthest position reached so far have to be played once, to take their keyframes.
+
+        Args:
+        - index = The position to go to, in [0, len(self.ReplayQueue)]
+        - grid = The grid the replay is played on
+
+        Raises:
+        - IndexError if index is out of range
+
+        Complexity:
+        - O(min(d, keyframe_every) * apply), plus O(snapshot.restore) when going
+          through a keyframe, where d is the number of actions between the current
+          position and index, for a position already reached.
+        """
+        self._move(index, grid) #O(goto)
+        self.time = self.position * self.step #Assignment is always constant --> O(1)
+
+    def _move(self, index: int, grid: Grid) -> None:
+        """Moves the replay grid to position index, leaving the time as it is."""
+        if not 0 <= index <= len(self.ReplayQueue): #Checking is constant --> O(1)
+            raise IndexError(f"Replay position {index} out of range [0, {len(self.ReplayQueue)}]")
+        self._check_shape(grid) #Constant --> O(1)
+        keyframe = index - index % self.keyframe_every #The nearest keyframe at or before index, if taken
+        while keyframe > 0 and keyframe not in self.keyframes: #Runs once per keyframe not taken yet
+            keyframe -= self.keyframe_every
+        if keyframe in self.keyframes and (index < self.position or keyframe > self.position):
+            snapshot.restore(grid, self.keyframes[keyframe]) #O(snapshot.restore)
+            self.position = keyframe #Assignment is always constant --> O(1)
+        elif index < self.position: #No keyframe before index yet, undo back to it
+            while self.position > index: #Runs position - index times
+                self.position -= 1
+                action, is_undo = self.ReplayQueue[self.position]
+                self._save(action) #Constant --> O(1)
+                if is_undo:
+                    action.redo_apply(grid)
+                else:
+                    action.undo_apply(grid)
+        while self.position < index: #Runs at most keyframe_every times, for a position already reached
+            self._play(grid) #O(redo_apply) or O(undo_apply)
+
+    def _play(self, grid: Grid) -> None:
+        """Plays the action at position, taking a keyframe before it if one is due."""
+        if self.position % self.keyframe_every == 0 and self.position not in self.keyframes: #Constant --> O(1)
+            self._check_shape(grid) #Constant --> O(1)
+            self.keyframes[self.position] = snapshot.dumps(grid) #O(snapshot.dumps)
+        action, is_undo = self.ReplayQueue[self.position] #Indexing a circular queue is constant --> O(1)
+        self._save(action) #Constant --> O(1)
+        if is_undo: #Checking is constant --> O(1)
+            action.undo_apply(grid) #Will be of run time of --> O(undo_apply)
+        else:
+            action.redo_apply(grid) #Will be of run time of --> O(redo_apply)
+        self.position += 1 #Constant --> O(1)
+
+    def _save(self, action) -> None:
+        """Keeps the inverse tokens action had before the replay first plays it, while replaying the live grid."""
+        if self.live is not None and id(action) not in self.saved: #Constant --> O(1)
+            self.saved[id(action)] = (action, action.save_inverse())
+
+    def _check_shape(self, grid: Grid) -> None:
+        """Forgets the keyframes if they were taken of a grid of another draw style or size."""
+        shape = (grid.draw_style, grid.x, grid.y) #Constant --> O(1)
+        if shape != self.shape: #Comparison is always constant --> O(1)
+            self.keyframes = {} #Assignment is always constant --> O(1)
+            self.shape = shape #Assignment is always constant --> O(1)
 
 
 
-       
 
 
 if __name__ == "__main__":
@@ -107,4 +302,3 @@ if __name__ == "__main__":
     f3 = r.play_next_action(g) # action 2, undo
     t = r.play_next_action(g)  # True, nothing to do.
     assert (f1, f2, f3, t) == (False, False, False, True)
-
@@ -0,0 +1,276 @@
+"""
+Binary canvas snapshots.
+
+A snapshot file holds the draw style, the dimensions and the layer indices
+of every square (little endian):
+
+    header  magic b"PNTG", version u16, draw style u8, reserved u8, x u32, y u32
+    SET       per square: layer index i8 (-1 for none), special flag u8
+    ADD       (x*y + 1) u32 offsets into the data that follows, then per square
+              its layer indices u8, in the order they are applied
+    SEQUENCE  per square: bitmask u32, bit i set when layer i is applied
+
+Squares are stored ordered by x and then y. The same bytes can be kept in
+memory with dumps and loads. Loading memory-maps the file and
+only builds the LayerStore of a square the first time it is reached, so
+opening a large canvas costs next to nothing. The file stays mapped until
+the grid is closed:
+
+    with snapshot.load(path) as grid:
+        ...
+"""
+
+from __future__ import annotations
+import mmap
+import struct
+import sys
+from array import array
+from grid import Grid
+from layer_store import LayerStore
+
+MAGIC = b"PNTG"
+VERSION = 1
+HEADER = struct.Struct("<4sHBBII")
+STYLES = (Grid.DRAW_STYLE_SET, Grid.DRAW_STYLE_ADD, Grid.DRAW_STYLE_SEQUENCE)
+SET_CELL = struct.Struct("<bB")
+OFFSET = struct.Struct("<I")
+SEQUENCE_CELL = struct.Struct("<I")
+
+
+def save(grid: Grid, path: str) -> None:
+    """
+    Writes the layers of every square of grid to path.
+
+    Args:
+    - grid = Any grid whose squares support snapshot() (Grid, sparse Grid, TiledGrid, SnapshotGrid)
+    - path = The file to write
+
+    Complexity:
+    - O(x * y * snapshot)
+    """
+    data = dumps(grid)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def dumps(grid: Grid) -> bytes:
+    """
+    Returns the snapshot of grid as bytes, in the same format as save writes.
+
+    Complexity:
+    - O(x * y * snapshot)
+    """
+    style = STYLES.index(grid.draw_style)
+    cells = (grid[x][y].snapshot() for x in range(grid.x) for y in range(grid.y))
+    data = bytearray(HEADER.pack(MAGIC, VERSION, style, 0, grid.x, grid.y))
+    if grid.draw_style == Grid.DRAW_STYLE_SET:
+        for index, flag in cells:
+            data += SET_CELL.pack(index, flag)
+    elif grid.draw_style == Grid.DRAW_STYLE_ADD:
+        offsets = array("I", [0])
+        layers = bytearray()
+        for indices in cells:
+            layers += bytes(indices)
+            offsets.append(len(layers))
+        data += _little_endian(offsets)
+        data += layers
+    else:
+        data += _little_endian(array("I", cells))
+    return bytes(data)
+
+
+def _little_endian(values: array) -> bytes:
+    """Returns the bytes of an array of u32, little endian."""
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def load(path: str) -> SnapshotGrid:
+    """
+    Opens a snapshot written by save. The file stays mapped until the grid
+    returned is closed (see SnapshotGrid.close).
+
+    Raises:
+    - ValueError if the file is not a snapshot, or was written by a newer version
+
+    Complexity:
+    - O(1), squares are only read when first reached.
+    """
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return loads(data, path)
+    except ValueError:
+        data.close()
+        raise
+
+
+def loads(data, name: str = "data") -> SnapshotGrid:
+    """
+    Opens a snapshot from the bytes returned by dumps (or any buffer holding them).
+
+    Raises:
+    - ValueError if data is not a snapshot, was written by a newer version,
+      or holds an unknown draw style
+
+    Complexity:
+    - O(1), squares are only read when first reached.
+    """
+    if len(data) < HEADER.size:
+        raise ValueError(f"{name} is not a canvas snapshot")
+    magic, version, style, _, x, y = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{name} is not a canvas snapshot")
+    if version > VERSION:
+        raise ValueError(f"{name} uses snapshot version {version}, only up to {VERSION} is supported")
+    if style >= len(STYLES):
+        raise ValueError(f"{name} has an unknown draw style {style}")
+    return SnapshotGrid(STYLES[style], x, y, data)
+
+
+def restore(grid: Grid, data) -> None:
+    """
+    Puts every square of grid back in the state held by a snapshot from dumps
+    of a grid with the same draw style and dimensions. Only the squares that
+    differ are restored, so only those are redrawn.
+
+    Raises:
+    - ValueError if data is not a snapshot, or is of a grid of another draw style or size
+
+    Complexity:
+    - O(x * y * (snapshot + restore))
+    """
+    source = loads(data)
+    if (source.draw_style, source.x, source.y) != (grid.draw_style, grid.x, grid.y):
+        raise ValueError(f"Cannot restore a {source.draw_style} {source.x}x{source.y} snapshot "
+                         f"onto a {grid.draw_style} {grid.x}x{grid.y} grid")
+    for x in range(grid.x):
+        for y in range(grid.y):
+            state = source.state_at(x, y)
+            store = grid[x][y]
+            if store.snapshot() != state:
+                store.restore(state)
+
+
+class SnapshotGrid(Grid):
+    """
+    A grid opened from a snapshot file. Behaves like any other Grid; the
+    LayerStore of a square is restored from the file the first time it is reached.
+    Squares are only reported by take_dirty once they change, so a freshly
+    loaded grid has to be drawn in full once (for instance with render.render).
+
+    A grid opened by load maps its file until close is called, or the with
+    block it is opened in ends.
+    """
+
+    def __init__(self, draw_style: str, x: int, y: int, data) -> None:
+        Grid.__init__(self, draw_style, x, y, sparse=True)
+        self.data = data
+        self.grid = _SnapshotRows(self)
+
+    def close(self) -> None:
+        """
+        Unmaps the file the grid was loaded from. The grid stays usable: the squares
+        not reached yet are read from a copy of the file's bytes kept in memory.
+        Does nothing for a grid opened from bytes, or already closed.
+
+        Complexity:
+        - O(size of the file)
+        """
+        if isinstance(self.data, mmap.mmap):
+            data = self.data
+            self.data = data[:]
+            data.close()
+
+    def __enter__(self) -> SnapshotGrid:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def state_at(self, x: int, y: int):
+        """
+        Returns the snapshot() value of square (x, y) stored in the file.
+
+        Complexity:
+        - O(1), plus the number of layers of the square for ADD.
+        """
+        i = x * self.y + y
+        if self.draw_style == self.DRAW_STYLE_SET:
+            index, flag = SET_CELL.unpack_from(self.data, HEADER.size + i * SET_CELL.size)
+            return (index, bool(flag))
+        if self.draw_style == self.DRAW_STYLE_ADD:
+            start = OFFSET.unpack_from(self.data, HEADER.size + i * OFFSET.size)[0]
+            end = OFFSET.unpack_from(self.data, HEADER.size + (i + 1) * OFFSET.size)[0]
+            base = HEADER.size + (self.x * self.y + 1) * OFFSET.size
+            return tuple(self.data[base + start:base + end])
+        return SEQUENCE_CELL.unpack_from(self.data, HEADER.size + i * SEQUENCE_CELL.size)[0]
+
+    def materialize(self, x: int, y: int) -> LayerStore:
+        """
+        Returns the LayerStore of square (x, y), restoring it from the file if needed.
+
+        Complexity:
+        - O(1) once restored, O(restore) the first time.
+        """
+        store = self.cells.get((x, y))
+        if store is None:
+            store = self.new_store()
+            store.restore(self.state_at(x, y))
+            store.watch(self, x, y)
+            self.cells[(x, y)] = store
+        return store
+
+    def special(self) -> None:
+        """
+        Activate the special affect on all grid squares, restoring all of them first.
+
+        Complexity:
+        - O(x * y * (restore + special))
+        """
+        for x in range(self.x):
+            for y in range(self.y):
+                self.materialize(x, y).special()
+
+    def stores(self):
+        """
+        Yields (x, y, store) for every square, restoring all of them first.
+
+        Complexity:
+        - O(x * y * restore)
+        """
+        for x in range(self.x):
+            for y in range(self.y):
+                yield x, y, self.materialize(x, y)
+
+
+class _SnapshotRows:
+    """Stands in for the ArrayR of columns of a SnapshotGrid."""
+
+    def __init__(self, grid: SnapshotGrid) -> None:
+        self.grid = grid
+
+    def __len__(self) -> int:
+        return self.grid.x
+
+    def __getitem__(self, x: int) -> _SnapshotColumn:
+        if not 0 <= x < self.grid.x:
+            raise IndexError(x)
+        return _SnapshotColumn(self.grid, x)
+
+
+class _SnapshotColumn:
+    """A column of a SnapshotGrid. Indexing it returns the square's LayerStore."""
+
+    def __init__(self, grid: SnapshotGrid, x: int) -> None:
+        self.grid = grid
+        self.x = x
+
+    def __len__(self) -> int:
+        return self.grid.y
+
+    def __getitem__(self, y: int) -> LayerStore:
+        if not 0 <= y < self.grid.y:
+            raise IndexError(y)
+        return self.grid.materialize(self.x, y)
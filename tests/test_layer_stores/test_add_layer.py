@@ -62,3 +62,28 @@ class TestAddLayer(unittest.TestCase):
         s.erase(black)
         s.add(invert)
         self.assertEqual(s.get_color((100, 100, 100), 7, 0, 0), (255-91, 255-214, 255-104))
+
+    @number("2.6")
+    def test_get_color_read_only(self):
+        s = AdditiveLayerStore()
+        s.add(lighten)
+        s.add(invert)
+        front, rear = s.AppliedLayer.front, s.AppliedLayer.rear
+        for timestamp in range(3):
+            self.assertEqual(s.get_color((100, 100, 100), timestamp, 0, 0), (115, 115, 115))
+        self.assertEqual((s.AppliedLayer.front, s.AppliedLayer.rear), (front, rear))
+        self.assertEqual(list(s.AppliedLayer), [lighten, invert])
+
+    @number("2.7")
+    def test_special_in_place(self):
+        s = AdditiveLayerStore()
+        s.special() # Nothing to reverse.
+        self.assertEqual(s.get_color((100, 100, 100), 0, 0, 0), (100, 100, 100))
+        s.add(black)
+        s.add(lighten)
+        s.add(invert)
+        queue = s.AppliedLayer
+        s.special()
+        self.assertIs(s.AppliedLayer, queue)
+        self.assertEqual(list(s.AppliedLayer), [invert, lighten, black])
+        self.assertEqual(s.get_color((100, 100, 100), 0, 0, 0), (0, 0, 0))
@@ -0,0 +1,57 @@
+import unittest
+from ed_utils.decorators import number
+
+from layer_store import AdditiveLayerStore, SequenceLayerStore, SetLayerStore
+from layer_util import Layer
+from layers import black, invert, lighten, rainbow, red, sparkle
+
+class TestColorCache(unittest.TestCase):
+
+    @number("12.1")
+    def test_layer_properties(self):
+        self.assertEqual((red.time_dependent, red.position_dependent, red.color_dependent), (False, False, False))
+        self.assertEqual((lighten.time_dependent, lighten.position_dependent, lighten.color_dependent), (False, False, True))
+        self.assertEqual((rainbow.time_dependent, rainbow.position_dependent, rainbow.color_dependent), (True, True, False))
+        self.assertEqual((sparkle.time_dependent, sparkle.position_dependent, sparkle.color_dependent), (True, True, True))
+
+    @number("12.2")
+    def test_static_cached(self):
+        for store_type in (SetLayerStore, AdditiveLayerStore, SequenceLayerStore):
+            calls = []
+            def counting(color, timestamp, x, y):
+                calls.append(timestamp)
+                return (1, 2, 3)
+            static = Layer(15, counting, time_dependent=False)
+            s = store_type()
+            s.add(static)
+            for timestamp in range(5):
+                self.assertEqual(s.get_color((9, 9, 9), timestamp, 1, 1), (1, 2, 3))
+            self.assertEqual(len(calls), 1, store_type.__name__)
+            # A different start colour is composited again.
+            s.get_color((8, 8, 8), 0, 1, 1)
+            self.assertEqual(len(calls), 2, store_type.__name__)
+
+    @number("12.3")
+    def test_time_dependent_not_cached(self):
+        calls = []
+        def counting(color, timestamp, x, y):
+            calls.append(timestamp)
+            return (timestamp, 0, 0)
+        animated = Layer(16, counting)
+        s = AdditiveLayerStore()
+        s.add(animated)
+        for timestamp in range(5):
+            self.assertEqual(s.get_color((9, 9, 9), timestamp, 1, 1), (timestamp, 0, 0))
+        self.assertEqual(len(calls), 5)
+
+    @number("12.4")
+    def test_invalidated_on_change(self):
+        s = SequenceLayerStore()
+        s.add(black)
+        self.assertEqual(s.get_color((100, 100, 100), 0, 0, 0), (0, 0, 0))
+        s.add(invert)
+        self.assertEqual(s.get_color((100, 100, 100), 0, 0, 0), (255, 255, 255))
+        s.special() # Removes black, the lexicographically smaller median.
+        self.assertEqual(s.get_color((100, 100, 100), 0, 0, 0), (155, 155, 155))
+        s.erase(invert)
+        self.assertEqual(s.get_color((100, 100, 100), 0, 0, 0), (100, 100, 100))
@@ -0,0 +1,58 @@
+import random
+import unittest
+from ed_utils.decorators import number
+
+from array_grid import registered_layers
+from layer_pipeline import Clamp, compile_stack
+from layer_util import Layer
+from layers import black, darken, invert, lighten, rainbow, red, sparkle
+
+class TestPipeline(unittest.TestCase):
+
+    @number("13.1")
+    def test_constant_drops_earlier(self):
+        pipeline = compile_stack([sparkle, invert, rainbow, lighten, red, invert])
+        self.assertEqual(pipeline.steps, (red, invert))
+        self.assertFalse(pipeline.time_dependent)
+        self.assertEqual(pipeline.apply((1, 2, 3), 5, 1, 1), (0, 255, 255))
+
+    @number("13.2")
+    def test_invert_pairs(self):
+        self.assertEqual(compile_stack([rainbow, invert, invert]).steps, (rainbow,))
+        self.assertEqual(compile_stack([invert, invert, invert]).steps, (invert,))
+
+    @number("13.3")
+    def test_clamp_runs(self):
+        steps = compile_stack([lighten, lighten, darken, invert, invert, lighten]).steps
+        self.assertEqual(len(steps), 1)
+        self.assertIsInstance(steps[0], Clamp)
+
+    @number("13.4")
+    def test_shared(self):
+        self.assertIs(compile_stack([black, lighten, sparkle]), compile_stack([black, lighten, sparkle]))
+
+    @number("13.5")
+    def test_same_colors(self):
+        rng = random.Random(13)
+        layers = registered_layers()
+        weighted = layers + [lighten, darken, invert] * 4
+        for _ in range(500):
+            stack = [rng.choice(weighted) for _ in range(rng.randrange(12))]
+            pipeline = compile_stack(stack)
+            for _ in range(3):
+                color = tuple(rng.randrange(256) for _ in range(3))
+                timestamp, x, y = rng.random() * 50, rng.randrange(32), rng.randrange(32)
+                expected = color
+                for layer in stack:
+                    expected = layer.apply(expected, timestamp, x, y)
+                self.assertEqual(tuple(pipeline.apply(color, timestamp, x, y)), tuple(expected), [l.name for l in stack])
+
+    @number("13.6")
+    def test_same_index(self):
+        # Two layers made outside the registry may share an index, but not a pipeline.
+        first = Layer(15, lambda color, timestamp, x, y: (1, 2, 3), color_dependent=False)
+        second = Layer(15, lambda color, timestamp, x, y: (4, 5, 6), color_dependent=False)
+        self.assertEqual(compile_stack([first]).apply((0, 0, 0), 0, 0, 0), (1, 2, 3))
+        self.assertEqual(compile_stack([second]).apply((0, 0, 0), 0, 0, 0), (4, 5, 6))
+        lookalike = Layer(lighten.index, lambda color, timestamp, x, y: color[::-1])
+        self.assertEqual(compile_stack([lookalike]).apply((1, 2, 3), 0, 0, 0), (3, 2, 1))
@@ -0,0 +1,89 @@
+import random
+import unittest
+from ed_utils.decorators import number
+
+from array_grid import ArrayGrid, registered_layers
+from engine import PaintSession
+from grid import Grid
+from layers import black, lighten, rainbow, red, sparkle
+
+class TestArrayGrid(unittest.TestCase):
+
+    @number("7.1")
+    def test_set(self):
+        self.check_random_ops(Grid.DRAW_STYLE_SET, seed=1)
+
+    @number("7.2")
+    def test_add(self):
+        self.check_random_ops(Grid.DRAW_STYLE_ADD, seed=2)
+
+    @number("7.3")
+    def test_sequence(self):
+        self.check_random_ops(Grid.DRAW_STYLE_SEQUENCE, seed=3)
+
+    @number("7.4")
+    def test_cell_proxy(self):
+        grid = ArrayGrid(Grid.DRAW_STYLE_ADD, 3, 4)
+        self.assertEqual((len(grid.grid), len(grid[0])), (3, 4))
+        grid[1][2].add(black)
+        grid[1][2].add(lighten)
+        self.assertEqual(grid[1][2].get_color((100, 100, 100), 0, 1, 2), (40, 40, 40))
+        grid[1][2].special()
+        self.assertEqual(grid[1][2].get_color((100, 100, 100), 0, 1, 2), (0, 0, 0))
+        self.assertEqual(tuple(grid.render((100, 100, 100), 0)[1, 2]), (0, 0, 0))
+        self.assertEqual(tuple(grid.render((100, 100, 100), 0)[0, 0]), (100, 100, 100))
+
+    @number("7.5")
+    def test_session_keyframes(self):
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            rng = random.Random(5)
+            session = PaintSession(ArrayGrid(draw_style, 8, 8))
+            control = PaintSession(Grid(draw_style, 8, 8))
+            # Past the keyframe every 50 actions, which snapshots the grid.
+            for _ in range(120):
+                layer, x, y = rng.choice(registered_layers()), rng.randrange(8), rng.randrange(8)
+                session.on_paint(layer, x, y)
+                control.on_paint(layer, x, y)
+            session.on_goto(30)
+            control.on_goto(30)
+            session.on_goto(110)
+            control.on_goto(110)
+            for x in range(8):
+                for y in range(8):
+                    self.assertEqual(session.grid[x][y].snapshot(), control.grid[x][y].snapshot())
+
+    @number("7.6")
+    def test_inherited_grid_methods(self):
+        grid = ArrayGrid(Grid.DRAW_STYLE_SEQUENCE, 3, 2)
+        self.assertFalse(grid.sparse)
+        grid[2][1].add(red)
+        self.assertEqual([(x, y, store.snapshot()) for x, y, store in grid.stores() if store.snapshot()],
+                         [(2, 1, 1 << red.index)])
+        colors = bytearray(3 * 2 * 3)
+        self.assertTrue(grid.compose(colors, (0, 0, 0), 0))
+        self.assertEqual(colors[(2 * 2 + 1) * 3:], bytearray((255, 0, 0)))
+
+    def check_random_ops(self, draw_style: str, seed: int):
+        rng = random.Random(seed)
+        layers = registered_layers()
+        grid = Grid(draw_style, 6, 5)
+        array_grid = ArrayGrid(draw_style, 6, 5)
+        for _ in range(300):
+            roll = rng.random()
+            x, y = rng.randrange(6), rng.randrange(5)
+            layer = rng.choice(layers + [rainbow, sparkle])
+            if roll < 0.6:
+                self.assertEqual(grid[x][y].add(layer), array_grid[x][y].add(layer))
+            elif roll < 0.95:
+                self.assertEqual(grid[x][y].erase(layer), array_grid[x][y].erase(layer))
+            else:
+                grid.special()
+                array_grid.special()
+        for timestamp in (0, 7, 12.5):
+            image = array_grid.render((255, 255, 255), timestamp)
+            self.assertEqual(image.shape, (6, 5, 3))
+            for x in range(6):
+                for y in range(5):
+                    expected = grid[x][y].get_color((255, 255, 255), timestamp, x, y)
+                    self.assertEqual(tuple(image[x, y]), tuple(expected))
+                    self.assertEqual(tuple(array_grid[x][y].get_color((255, 255, 255), timestamp, x, y)), tuple(expected))
@@ -0,0 +1,67 @@
+import math
+import random
+import unittest
+from ed_utils.decorators import number
+
+from brush import get_stencil, stencil_cells, swept_cells, traverse_cells
+
+class TestBrush(unittest.TestCase):
+
+    @number("9.1")
+    def test_stencil(self):
+        self.assertEqual(get_stencil(0), ((0, 0),))
+        self.assertEqual(len(get_stencil(2)), 13)
+        self.assertEqual(len(get_stencil(5)), 61)
+        # Cached, so the same tuple is handed back.
+        self.assertIs(get_stencil(3), get_stencil(3))
+
+    @number("9.2")
+    def test_matches_full_scan(self):
+        width, height = 9, 7
+        for size in range(6):
+            for px, py in [(0, 0), (4, 3), (8, 6), (1, 5), (8, 0)]:
+                expected = [
+                    (i, j)
+                    for i in range(width)
+                    for j in range(height)
+                    if abs(px-i) + abs(py-j) <= size
+                ]
+                self.assertEqual(stencil_cells(px, py, size, width, height), expected)
+
+    @number("9.3")
+    def test_unknown_shape(self):
+        with self.assertRaises(ValueError):
+            get_stencil(2, "STAR")
+
+    @number("9.4")
+    def test_traverse(self):
+        rng = random.Random(9)
+        for _ in range(300):
+            x0, y0, x1, y1 = (rng.uniform(0, 400) for _ in range(4))
+            w, h = rng.uniform(3, 30), rng.uniform(3, 30)
+            cells = list(traverse_cells(x0, y0, x1, y1, w, h))
+            start, end = (math.floor(x0 / w), math.floor(y0 / h)), (math.floor(x1 / w), math.floor(y1 / h))
+            self.assertEqual((cells[0], cells[-1]), (start, end))
+            self.assertEqual(len(cells), len(set(cells)))
+            self.assertEqual(len(cells), abs(end[0] - start[0]) + abs(end[1] - start[1]) + 1)
+            for a, b in zip(cells, cells[1:]):
+                self.assertEqual(abs(a[0] - b[0]) + abs(a[1] - b[1]), 1)
+            # Every square the segment passes through is in the walk.
+            for i in range(1001):
+                t = i / 1000
+                self.assertIn((math.floor((x0 + t * (x1 - x0)) / w), math.floor((y0 + t * (y1 - y0)) / h)), cells)
+
+    @number("9.5")
+    def test_traverse_axis_aligned(self):
+        self.assertEqual(list(traverse_cells(5, 5, 5, 5, 10, 10)), [(0, 0)])
+        self.assertEqual(list(traverse_cells(35, 5, 5, 5, 10, 10)), [(3, 0), (2, 0), (1, 0), (0, 0)])
+        self.assertEqual(list(traverse_cells(5, 5, 5, 25, 10, 10)), [(0, 0), (0, 1), (0, 2)])
+
+    @number("9.6")
+    def test_swept(self):
+        path = [(1, 1), (2, 1), (3, 1)]
+        cells = swept_cells(path, 1, 4, 4)
+        expected = {cell for px, py in path for cell in stencil_cells(px, py, 1, 4, 4)}
+        self.assertEqual(len(cells), len(expected))
+        self.assertEqual(set(cells), expected)
+        self.assertEqual(cells[:len(stencil_cells(1, 1, 1, 4, 4))], stencil_cells(1, 1, 1, 4, 4))
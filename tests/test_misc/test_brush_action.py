@@ -0,0 +1,61 @@
+import tracemalloc
+import unittest
+from ed_utils.decorators import number
+
+from action import BrushAction, PaintAction, PaintStep
+from brush import stencil_cells
+from engine import PaintSession
+from grid import Grid
+from layers import black, lighten, red
+from undo import UndoTracker
+
+class TestBrushAction(unittest.TestCase):
+
+    @number("21.1")
+    def test_matches_paint_action(self):
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            grid = Grid(draw_style, 6, 6)
+            control_grid = Grid(draw_style, 6, 6)
+            undo, control_undo = UndoTracker(), UndoTracker()
+            for layer, px, py, size in ((red, 0, 0, 3), (lighten, 2, 3, 1), (black, 5, 5, 2)):
+                action = BrushAction(layer, px, py, size)
+                action.redo_apply(grid)
+                undo.add_action(action)
+                steps = [PaintStep(cell, layer) for cell in stencil_cells(px, py, size, 6, 6)]
+                control = PaintAction(steps)
+                control.redo_apply(control_grid)
+                control_undo.add_action(control)
+            for op in ("undo", "undo", "redo", "undo", "undo", "redo", "redo"):
+                getattr(undo, op)(grid)
+                getattr(control_undo, op)(control_grid)
+                for x in range(6):
+                    for y in range(6):
+                        self.assertEqual(grid[x][y].snapshot(), control_grid[x][y].snapshot())
+
+    @number("21.2")
+    def test_on_paint_history(self):
+        session = PaintSession(Grid(Grid.DRAW_STYLE_SET, 8, 8))
+        session.on_paint(red, 4, 4)
+        action = session.UndoTracker.UndoStack.peek()
+        self.assertEqual(action, BrushAction(red, 4, 4, Grid.DEFAULT_BRUSH_SIZE))
+        self.assertIs(session.ReplayTracker.ReplayQueue[0][0], action)
+
+    @number("21.3")
+    def test_memory(self):
+        def history(compact: bool):
+            actions = []
+            for i in range(1000):
+                if compact:
+                    actions.append(BrushAction(red, i % 32, i // 32, Grid.MAX_BRUSH))
+                else:
+                    cells = stencil_cells(i % 32, i // 32, Grid.MAX_BRUSH, 32, 32)
+                    actions.append(PaintAction([PaintStep(cell, red) for cell in cells]))
+            return actions
+        sizes = []
+        for compact in (False, True):
+            tracemalloc.start()
+            actions = history(compact)
+            sizes.append(tracemalloc.get_traced_memory()[0])
+            tracemalloc.stop()
+            del actions
+        self.assertGreater(sizes[0], 10 * sizes[1])
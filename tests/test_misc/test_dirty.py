@@ -0,0 +1,48 @@
+import unittest
+from ed_utils.decorators import number
+
+from action import PaintAction, PaintStep
+from array_grid import ArrayGrid
+from grid import Grid
+from layers import black, rainbow, red, sparkle
+from undo import UndoTracker
+
+class TestDirty(unittest.TestCase):
+
+    @number("11.1")
+    def test_idle(self):
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            for grid in (Grid(draw_style, 5, 5), ArrayGrid(draw_style, 5, 5)):
+                self.assertEqual(grid.take_dirty(), set())
+                grid[1][2].add(red)
+                self.assertEqual(grid.take_dirty(), {(1, 2)})
+                self.assertEqual(grid.take_dirty(), set())
+
+    @number("11.2")
+    def test_animated(self):
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            for grid in (Grid(draw_style, 5, 5), ArrayGrid(draw_style, 5, 5)):
+                grid[0][0].add(rainbow)
+                grid[4][4].add(sparkle)
+                grid[2][2].add(black)
+                self.assertEqual(grid.take_dirty(), {(0, 0), (4, 4), (2, 2)})
+                # Time dependent squares are recomputed every frame.
+                self.assertEqual(grid.take_dirty(), {(0, 0), (4, 4)})
+                grid[0][0].erase(rainbow)
+                self.assertEqual(grid.take_dirty(), {(0, 0), (4, 4)})
+                self.assertEqual(grid.take_dirty(), {(4, 4)})
+
+    @number("11.3")
+    def test_special_and_undo(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 3, 3)
+        grid.special()
+        self.assertEqual(len(grid.take_dirty()), 9)
+        undo = UndoTracker()
+        step = PaintStep((1, 1), red)
+        step.redo_apply(grid)
+        undo.add_action(PaintAction([step]))
+        grid.take_dirty()
+        undo.undo(grid)
+        self.assertEqual(grid.take_dirty(), {(1, 1)})
+        undo.redo(grid)
+        self.assertEqual(grid.take_dirty(), {(1, 1)})
@@ -0,0 +1,32 @@
+import unittest
+from ed_utils.decorators import number
+
+from benchmarks.bench_import import ENGINE_MODULES, import_time
+from engine import PaintSession
+from grid import Grid
+from layers import red
+
+class TestEngine(unittest.TestCase):
+
+    @number("18.1")
+    def test_session(self):
+        session = PaintSession(Grid(Grid.DRAW_STYLE_SET, 5, 5))
+        session.on_decrease_brush_size()
+        session.on_decrease_brush_size()
+        session.on_paint(red, 1, 1)
+        self.assertEqual(session.grid[1][1].get_color((0, 0, 0), 0, 1, 1), (255, 0, 0))
+        session.on_undo()
+        self.assertEqual(session.grid[1][1].get_color((0, 0, 0), 0, 1, 1), (0, 0, 0))
+        session.on_redo()
+        session.grid = Grid(Grid.DRAW_STYLE_SET, 5, 5)
+        session.on_replay_start()
+        self.assertFalse(session.on_replay_next_step())
+        self.assertTrue(session.on_replay_next_step())
+        self.assertEqual(session.grid[1][1].get_color((0, 0, 0), 0, 1, 1), (255, 0, 0))
+
+    @number("18.2")
+    def test_engine_imports(self):
+        # Import times are left to the benchmark, only the windowing stack is checked.
+        for module in ENGINE_MODULES:
+            _, gui = import_time(module, repeat=1)
+            self.assertFalse(gui, f"{module} imports arcade or pyglet")
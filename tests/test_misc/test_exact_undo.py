@@ -0,0 +1,119 @@
+import os
+import random
+import tempfile
+import unittest
+from ed_utils.decorators import number
+
+from action import BrushAction, PaintAction, PaintStep, StrokeAction
+from array_grid import ArrayGrid, registered_layers
+from engine import PaintSession
+from grid import Grid
+from journal import Journal
+from layer_store import AdditiveLayerStore, SequenceLayerStore, SetLayerStore
+from layers import black, blue, green, red
+from tiled_grid import TiledGrid
+
+class TestExactUndo(unittest.TestCase):
+
+    def state(self, grid):
+        if isinstance(grid, ArrayGrid):
+            return [grid.color_at(x, y, (10, 120, 200), 0, x, y) for x in range(grid.x) for y in range(grid.y)]
+        return [grid[x][y].snapshot() for x in range(grid.x) for y in range(grid.y)]
+
+    def random_action(self, rng, grid):
+        layer = rng.choice(registered_layers())
+        roll = rng.random()
+        if roll < 0.4:
+            return BrushAction(layer, rng.randrange(grid.x), rng.randrange(grid.y), rng.randint(0, 2))
+        if roll < 0.7:
+            return StrokeAction(layer, {(rng.randrange(grid.x), rng.randrange(grid.y)) for _ in range(6)})
+        if roll < 0.9:
+            return PaintAction([PaintStep((rng.randrange(grid.x), rng.randrange(grid.y)), layer) for _ in range(4)])
+        return PaintAction([], True)
+
+    @number("27.1")
+    def test_store_inverses(self):
+        store = AdditiveLayerStore()
+        store.add(red)
+        token = store.add_undoable(blue)
+        store.undo_add(token)
+        # The layer added last goes, where erase would have served red.
+        self.assertEqual(store.snapshot(), (red.index,))
+        store = SetLayerStore()
+        store.add(red)
+        store.undo_add(store.add_undoable(green))
+        self.assertEqual(store.snapshot(), (red.index, False))
+        store = SequenceLayerStore()
+        for layer in (black, red, green, blue):
+            store.add(layer)
+        before = store.snapshot()
+        # red was already applied, so undoing the add leaves it.
+        store.undo_add(store.add_undoable(red))
+        self.assertEqual(store.snapshot(), before)
+        store.undo_special(store.special_undoable())
+        self.assertEqual(store.snapshot(), before)
+        self.assertTrue(store.erase(red))
+        self.assertFalse(store.erase(red))
+
+    @number("27.2")
+    def test_undo_matches_replay(self):
+        grids = [
+            lambda style: Grid(style, 7, 6),
+            lambda style: Grid(style, 7, 6, sparse=True),
+            lambda style: TiledGrid(style, 7, 6, tile_size=4),
+            lambda style: ArrayGrid(style, 7, 6),
+        ]
+        for seed, make in enumerate(grids):
+            for draw_style in Grid.DRAW_STYLE_OPTIONS:
+                rng = random.Random(seed)
+                grid = make(draw_style)
+                states = [self.state(grid)]
+                actions = []
+                for _ in range(60):
+                    action = self.random_action(rng, grid)
+                    action.redo_apply(grid)
+                    actions.append(action)
+                    states.append(self.state(grid))
+                for i in range(len(actions) - 1, -1, -1):
+                    actions[i].undo_apply(grid)
+                    self.assertEqual(self.state(grid), states[i], f"{draw_style} after undoing action {i}")
+
+    @number("27.3")
+    def test_journal_recovers_exact_undo(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for seed, draw_style in enumerate(Grid.DRAW_STYLE_OPTIONS):
+                journal = Journal(os.path.join(directory, draw_style), checkpoint_every=1000)
+                session = PaintSession(journal.recover(draw_style, 8, 8))
+                session.journal = journal
+                rng = random.Random(seed)
+                for _ in range(80):
+                    roll = rng.random()
+                    if roll < 0.55:
+                        session.on_paint(rng.choice(registered_layers()), rng.randrange(8), rng.randrange(8))
+                    elif roll < 0.65:
+                        session.on_special()
+                    elif roll < 0.9:
+                        session.on_undo()
+                    else:
+                        session.on_redo()
+                journal.close()
+                # Every record is replayed from the empty grid, including the exact undos.
+                again = Journal(os.path.join(directory, draw_style))
+                self.assertEqual(self.state(again.recover(draw_style, 8, 8)), self.state(session.grid))
+                again.close()
+
+    @number("27.4")
+    def test_undo_after_reset(self):
+        for make in (lambda style: Grid(style, 8, 8), lambda style: ArrayGrid(style, 8, 8)):
+            session = PaintSession(make(Grid.DRAW_STYLE_SET))
+            session.on_paint(red, 3, 3)
+            # Tokens left from another grid undo nothing on an empty square, as erase would.
+            session.grid = make(Grid.DRAW_STYLE_ADD)
+            session.on_undo()
+            self.assertEqual(self.state(session.grid), self.state(make(Grid.DRAW_STYLE_ADD)))
+            session.on_redo()
+            session.grid = make(Grid.DRAW_STYLE_SEQUENCE)
+            session.on_reset()
+            self.assertIsNone(session.UndoTracker.undo(session.grid))
+            session.on_replay_start()
+            self.assertTrue(session.on_replay_next_step())
@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+import unittest
+from ed_utils.decorators import number
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Runs in its own process, as headless mode has to be chosen before arcade is imported.
+SCRIPT = """
+import sys
+import arcade
+from gl_renderer import GridRenderer
+try:
+    window = arcade.Window(40, 30, "test", visible=False)
+except Exception as e:
+    print(e)
+    sys.exit(3)
+ctx = window.ctx
+fbo = ctx.framebuffer(color_attachments=[ctx.texture((40, 30), components=4)])
+renderer = GridRenderer(ctx, 4, 3, 10, 10)
+colors = bytearray()
+for x in range(4):
+    for y in range(3):
+        colors += bytes((x * 60, y * 100, 7))
+renderer.write(colors)
+with fbo.activate():
+    ctx.projection_2d = (0, 40, 0, 30)
+    fbo.clear()
+    renderer.draw()
+    pixels = fbo.read(components=3)
+for x in range(4):
+    for y in range(3):
+        i = ((y * 10 + 5) * 40 + (x * 10 + 5)) * 3
+        assert tuple(pixels[i:i+3]) == (x * 60, y * 100, 7), (x, y, tuple(pixels[i:i+3]))
+"""
+
+class TestGLRenderer(unittest.TestCase):
+
+    @number("10.1")
+    def test_headless_draw(self):
+        env = dict(os.environ, ARCADE_HEADLESS="1")
+        result = subprocess.run(
+            [sys.executable, "-c", SCRIPT], cwd=ROOT, env=env,
+            capture_output=True, text=True, timeout=120,
+        )
+        if result.returncode == 3:
+            self.skipTest(f"No headless OpenGL context available: {result.stdout.strip()}")
+        self.assertEqual(result.returncode, 0, result.stderr)
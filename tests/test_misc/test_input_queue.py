@@ -0,0 +1,64 @@
+import unittest
+from ed_utils.decorators import number
+
+from input_queue import MotionQueue
+
+class FakeClock:
+
+    def __init__(self, step):
+        self.now = 0
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+class TestMotionQueue(unittest.TestCase):
+
+    @number("23.1")
+    def test_coalesce_same_square(self):
+        queue = MotionQueue(10, 10, budget=None)
+        for x, y in [(1, 1), (4, 2), (8, 9), (12, 3), (15, 5), (18, 7), (19, 2), (31, 3)]:
+            queue.push(x, y)
+        # Samples after the second one in a square collapse into the latest one.
+        handled = []
+        self.assertEqual(queue.drain(lambda x, y: handled.append((x, y))), 5)
+        self.assertEqual(handled, [(1, 1), (8, 9), (12, 3), (19, 2), (31, 3)])
+        self.assertEqual(len(queue), 0)
+
+    @number("23.2")
+    def test_budget_carries_over(self):
+        # Every clock reading advances by 1ms, so a 1.5ms budget fits two positions per drain.
+        queue = MotionQueue(1, 1, budget=0.0015, clock=FakeClock(0.001))
+        for x in range(5):
+            queue.push(x, 0)
+        handled = []
+        self.assertEqual(queue.drain(lambda x, y: handled.append(x)), 2)
+        self.assertEqual(len(queue), 3)
+        queue.push(9, 0)
+        self.assertEqual(queue.drain(lambda x, y: handled.append(x)), 2)
+        self.assertEqual(queue.flush(lambda x, y: handled.append(x)), 2)
+        # Nothing is lost and the order is kept across frames.
+        self.assertEqual(handled, [0, 1, 2, 3, 4, 9])
+
+    @number("23.3")
+    def test_progress_with_no_budget_left(self):
+        queue = MotionQueue(1, 1, budget=0, clock=FakeClock(1))
+        queue.push(0, 0)
+        queue.push(5, 5)
+        self.assertEqual(queue.drain(lambda x, y: None), 1)
+        self.assertEqual(queue.drain(lambda x, y: None), 1)
+        self.assertEqual(queue.drain(lambda x, y: None), 0)
+
+    @number("23.4")
+    def test_merge_keeps_path(self):
+        queue = MotionQueue(10, 10, budget=None)
+        # Replacing (15, 5) by (18, 9) would move the path from (1, 1), so it crosses other squares.
+        for x, y in [(1, 1), (15, 5), (18, 9)]:
+            queue.push(x, y)
+        self.assertEqual(list(queue.samples), [(1, 1), (15, 5), (18, 9)])
+        # The sample before is only known within a drag.
+        queue.clear()
+        queue.push(16, 6)
+        queue.push(17, 7)
+        self.assertEqual(list(queue.samples), [(16, 6), (17, 7)])
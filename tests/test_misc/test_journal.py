@@ -0,0 +1,91 @@
+import os
+import random
+import tempfile
+import unittest
+from ed_utils.decorators import number
+
+from array_grid import registered_layers
+from engine import PaintSession
+from grid import Grid
+from journal import Journal
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def session(self, journal: Journal, draw_style: str) -> PaintSession:
+        session = PaintSession(journal.recover(draw_style, 8, 8))
+        session.journal = journal
+        return session
+
+    def paint(self, session: PaintSession, seed: int, count: int):
+        rng = random.Random(seed)
+        layers = registered_layers()
+        for _ in range(count):
+            roll = rng.random()
+            if roll < 0.7:
+                session.on_paint(rng.choice(layers), rng.randrange(8), rng.randrange(8))
+            elif roll < 0.85:
+                session.on_undo()
+            elif roll < 0.95:
+                session.on_redo()
+            else:
+                session.on_special()
+
+    def assertSameGrid(self, a: Grid, b: Grid):
+        for x in range(a.x):
+            for y in range(a.y):
+                self.assertEqual(a[x][y].snapshot(), b[x][y].snapshot())
+
+    @number("20.1")
+    def test_recover(self):
+        for seed, draw_style in enumerate(Grid.DRAW_STYLE_OPTIONS):
+            directory = os.path.join(self.dir, draw_style)
+            session = self.session(Journal(directory, checkpoint_every=7), draw_style)
+            self.paint(session, seed, 60)
+            session.journal.flush()
+            # Crash: the journal is never closed.
+            recovered = Journal(directory, checkpoint_every=7).recover(draw_style, 8, 8)
+            self.assertSameGrid(recovered, session.grid)
+
+    @number("20.2")
+    def test_checkpoints(self):
+        journal = Journal(self.dir, checkpoint_every=5)
+        session = self.session(journal, Grid.DRAW_STYLE_ADD)
+        self.paint(session, 4, 23)
+        journal.close()
+        self.assertEqual(sorted(os.listdir(self.dir)), ["checkpoint-000000000020.pntg", "journal-000000000020.log"])
+        again = Journal(self.dir, checkpoint_every=5)
+        self.assertSameGrid(again.recover(Grid.DRAW_STYLE_ADD, 8, 8), session.grid)
+        self.assertEqual(again.count, journal.count)
+
+    @number("20.3")
+    def test_torn_write(self):
+        journal = Journal(self.dir)
+        session = self.session(journal, Grid.DRAW_STYLE_SEQUENCE)
+        self.paint(session, 5, 10)
+        journal.close()
+        with open(os.path.join(self.dir, "journal-000000000000.log"), "ab") as f:
+            f.write(b"\x40\x00\x00\x00\x01\x02")
+        session = self.session(Journal(self.dir), Grid.DRAW_STYLE_SEQUENCE)
+        self.assertEqual(session.journal.count, 10)
+        self.paint(session, 6, 10)
+        session.journal.close()
+        recovered = Journal(self.dir).recover(Grid.DRAW_STYLE_SEQUENCE, 8, 8)
+        self.assertSameGrid(recovered, session.grid)
+
+    @number("20.4")
+    def test_recover_other_grid(self):
+        journal = Journal(self.dir, checkpoint_every=5)
+        self.paint(self.session(journal, Grid.DRAW_STYLE_SET), 7, 12)
+        journal.close()
+        # The checkpoint is of a SET 8x8 grid, which neither grid asked for is.
+        with self.assertRaises(ValueError):
+            Journal(self.dir).recover(Grid.DRAW_STYLE_ADD, 8, 8)
+        with self.assertRaises(ValueError):
+            Journal(self.dir).recover(Grid.DRAW_STYLE_SET, 16, 8)
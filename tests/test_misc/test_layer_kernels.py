@@ -0,0 +1,29 @@
+import unittest
+import numpy as np
+from ed_utils.decorators import number
+
+from array_grid import registered_layers
+
+class TestLayerKernels(unittest.TestCase):
+
+    @number("8.1")
+    def test_every_layer_has_kernel(self):
+        for layer in registered_layers():
+            self.assertIsNotNone(layer.kernel, f"{layer.name} has no array kernel")
+
+    @number("8.2")
+    def test_kernel_matches_scalar(self):
+        xs, ys = np.indices((40, 40))
+        xs, ys = xs.ravel(), ys.ravel()
+        rng = np.random.default_rng(8)
+        colors = rng.integers(0, 256, size=(len(xs), 3))
+        colors[:4] = [(0, 0, 0), (255, 255, 255), (20, 240, 39), (41, 215, 216)]
+        for layer in registered_layers():
+            for timestamp in (0, 0.35, 7, 123.456):
+                batch = layer.apply_array(colors.copy(), timestamp, xs, ys)
+                for i in range(len(xs)):
+                    expected = layer.apply(tuple(colors[i].tolist()), timestamp, int(xs[i]), int(ys[i]))
+                    self.assertEqual(
+                        tuple(batch[i].tolist()), tuple(expected),
+                        f"{layer.name} differs at ({xs[i]}, {ys[i]}), timestamp {timestamp}",
+                    )
@@ -0,0 +1,44 @@
+import random
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from ed_utils.decorators import number
+
+from array_grid import registered_layers
+from grid import Grid
+from layers import rainbow, sparkle
+from parallel_render import composite_parallel, composite_region, composite_serial, region_snapshot
+from tiled_grid import TiledGrid
+
+def painted(grid: Grid, seed: int) -> Grid:
+    rng = random.Random(seed)
+    layers = registered_layers() + [rainbow, sparkle]
+    for _ in range(300):
+        grid[rng.randrange(grid.x)][rng.randrange(grid.y)].add(rng.choice(layers))
+        if rng.random() < 0.02:
+            grid.special()
+    return grid
+
+class TestParallelRender(unittest.TestCase):
+
+    @number("16.1")
+    def test_region(self):
+        grid = painted(Grid(Grid.DRAW_STYLE_ADD, 9, 6), seed=1)
+        rgb = composite_region(region_snapshot(grid, 2, 1, 5, 4), (255, 255, 255), 3)
+        for i, (x, y) in enumerate((x, y) for x in range(2, 7) for y in range(1, 5)):
+            self.assertEqual(tuple(rgb[i*3:i*3+3]), grid[x][y].get_color((255, 255, 255), 3, x, y))
+
+    @number("16.2")
+    def test_matches_serial(self):
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            for seed, draw_style in enumerate(Grid.DRAW_STYLE_OPTIONS):
+                for grid in (
+                    Grid(draw_style, 13, 11),
+                    Grid(draw_style, 13, 11, sparse=True),
+                    TiledGrid(draw_style, 13, 11, tile_size=4),
+                ):
+                    painted(grid, seed)
+                    for timestamp in (0, 5.5):
+                        self.assertEqual(
+                            composite_parallel(grid, (255, 255, 255), timestamp, pool, region_size=5),
+                            composite_serial(grid, (255, 255, 255), timestamp),
+                        )
@@ -0,0 +1,75 @@
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import unittest
+import zlib
+from ed_utils.decorators import number
+
+from array_grid import ArrayGrid
+from grid import Grid
+from layers import black, rainbow, red
+from render import render, save_png
+from tiled_grid import TiledGrid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def read_png(path: str):
+    """Returns the width, height and raw rows of a PNG written without filters."""
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    pos, idat = 8, b""
+    while pos < len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos+8])
+        body = data[pos+8:pos+8+length]
+        assert struct.unpack(">I", data[pos+8+length:pos+12+length])[0] == zlib.crc32(kind + body)
+        if kind == b"IHDR":
+            width, height = struct.unpack(">II", body[:8])
+        elif kind == b"IDAT":
+            idat += body
+        pos += 12 + length
+    return width, height, zlib.decompress(idat)
+
+class TestRender(unittest.TestCase):
+
+    @number("17.1")
+    def test_render(self):
+        for grid in (
+            Grid(Grid.DRAW_STYLE_ADD, 4, 3),
+            Grid(Grid.DRAW_STYLE_ADD, 4, 3, sparse=True),
+            TiledGrid(Grid.DRAW_STYLE_ADD, 4, 3, tile_size=2),
+            ArrayGrid(Grid.DRAW_STYLE_ADD, 4, 3),
+        ):
+            grid[1][2].add(red)
+            grid[3][0].add(rainbow)
+            image = render(grid, 7)
+            self.assertEqual((image.shape, image.dtype), ((4, 3, 3), "uint8"))
+            for x in range(4):
+                for y in range(3):
+                    self.assertEqual(tuple(image[x, y]), tuple(grid[x][y].get_color((255, 255, 255), 7, x, y)))
+
+    @number("17.2")
+    def test_png(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 3, 2)
+        grid[0][1].add(black)
+        grid[2][0].add(red)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "out.png")
+            save_png(grid, path, scale=2)
+            width, height, raw = read_png(path)
+        self.assertEqual((width, height), (6, 4))
+        rows = [raw[i*19+1:(i+1)*19] for i in range(4)]
+        # The top row of the image is the highest y.
+        self.assertEqual(rows[0][:6], bytes((0, 0, 0)) * 2)
+        self.assertEqual(rows[3][12:], bytes((255, 0, 0)) * 2)
+        self.assertEqual(rows[3][:6], bytes((255, 255, 255)) * 2)
+
+    @number("17.3")
+    def test_no_arcade(self):
+        result = subprocess.run(
+            [sys.executable, "-c", "import sys, render; sys.exit('arcade' in sys.modules or 'pyglet' in sys.modules)"],
+            cwd=ROOT, capture_output=True, text=True, timeout=60,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
@@ -0,0 +1,122 @@
+import random
+import unittest
+from ed_utils.decorators import number
+
+from action import BrushAction, PaintAction
+from array_grid import registered_layers
+from engine import PaintSession
+from grid import Grid
+from replay import ReplayTracker
+import snapshot
+
+class TestReplaySeek(unittest.TestCase):
+
+    def paint_session(self, draw_style, count, seed=0):
+        rng = random.Random(seed)
+        session = PaintSession(Grid(draw_style, 12, 12))
+        session.ReplayTracker = ReplayTracker(keyframe_every=20)
+        for _ in range(count):
+            if rng.random() < 0.05:
+                session.on_special()
+            else:
+                session.grid.DEFAULT_BRUSH_SIZE = rng.randint(0, 2)
+                session.on_paint(rng.choice(registered_layers()), rng.randrange(12), rng.randrange(12))
+        return session
+
+    def replayed(self, session, index):
+        grid = Grid(session.grid.draw_style, 12, 12)
+        for i in range(index):
+            session.ReplayTracker.ReplayQueue[i][0].redo_apply(grid)
+        return grid
+
+    def assertGridEqual(self, grid1, grid2):
+        for x in range(grid1.x):
+            for y in range(grid1.y):
+                self.assertEqual(grid1[x][y].snapshot(), grid2[x][y].snapshot(), f"Square {x}, {y}")
+
+    @number("28.1")
+    def test_seek_matches_replay(self):
+        for seed, draw_style in enumerate(Grid.DRAW_STYLE_OPTIONS):
+            session = self.paint_session(draw_style, 150, seed)
+            replay = session.ReplayTracker
+            session.on_replay_start()
+            self.assertGridEqual(session.grid, Grid(draw_style, 12, 12))
+            for t in [6.0, 2.5, 7.5, 0.0, 4.33, 100.0, 1.0]:
+                session.on_replay_seek(t)
+                index = min(int(t / replay.step + 1e-9), 150)
+                self.assertEqual(replay.position, index)
+                self.assertGridEqual(session.grid, self.replayed(session, index))
+
+    @number("28.2")
+    def test_seek_replays_little(self):
+        session = self.paint_session(Grid.DRAW_STYLE_ADD, 200)
+        replay = session.ReplayTracker
+        session.on_replay_start()
+        replay.goto(200, session.grid)
+        applied = []
+        brush_redo, paint_redo = BrushAction.redo_apply, PaintAction.redo_apply
+        BrushAction.redo_apply = lambda action, grid: applied.append(action) or brush_redo(action, grid)
+        PaintAction.redo_apply = lambda action, grid: applied.append(action) or paint_redo(action, grid)
+        try:
+            # From the keyframe at 40, rather than from the start or by undoing.
+            replay.goto(47, session.grid)
+            self.assertEqual(len(applied), 7)
+            applied.clear()
+            replay.goto(55, session.grid)
+            self.assertEqual(len(applied), 8)
+        finally:
+            BrushAction.redo_apply, PaintAction.redo_apply = brush_redo, paint_redo
+        self.assertGridEqual(session.grid, self.replayed(session, 55))
+
+    @number("28.3")
+    def test_speed(self):
+        session = self.paint_session(Grid.DRAW_STYLE_SEQUENCE, 100)
+        replay = session.ReplayTracker
+        session.on_replay_start()
+        session.on_replay_speed(4)
+        self.assertFalse(session.on_replay_advance(0.1))
+        self.assertEqual(replay.position, 8)
+        # Whole actions skipped in one frame, at high speed.
+        session.on_replay_speed(64)
+        self.assertFalse(session.on_replay_advance(0.05))
+        self.assertEqual(replay.position, 8 + 64)
+        self.assertTrue(session.on_replay_advance(1))
+        self.assertEqual(replay.position, 100)
+        # Backwards, down to the start, where the replay waits rather than finishing.
+        session.on_replay_speed(-32)
+        self.assertFalse(session.on_replay_advance(0.05))
+        self.assertEqual(replay.position, 100 - 32)
+        self.assertFalse(session.on_replay_advance(1))
+        self.assertEqual(replay.position, 0)
+        self.assertGridEqual(session.grid, Grid(Grid.DRAW_STYLE_SEQUENCE, 12, 12))
+        session.on_replay_speed(256)
+        self.assertTrue(session.on_replay_advance(1))
+
+    @number("28.4")
+    def test_stop_restores_live(self):
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            session = self.paint_session(draw_style, 60)
+            # Undos are not replayed, so the paint after one is replayed on another grid.
+            for x in range(4):
+                session.on_paint(registered_layers()[x], x, x)
+                session.on_undo()
+                session.on_paint(registered_layers()[x + 1], x, x)
+            live = Grid(draw_style, 12, 12)
+            snapshot.restore(live, snapshot.dumps(session.grid))
+            session.on_replay_start()
+            session.on_replay_speed(64)
+            session.on_replay_advance(0.5)
+            session.on_replay_speed(-1)
+            session.on_replay_advance(0.1)
+            session.on_replay_speed(256)
+            self.assertTrue(session.on_replay_advance(1))
+            session.on_replay_stop()
+            # The replay grid differs (undos are not replayed), the live grid comes back.
+            self.assertGridEqual(session.grid, live)
+            # The undo history still matches the grid, tokens included.
+            session.on_undo()
+            session.on_redo()
+            self.assertGridEqual(session.grid, live)
+            while session.UndoTracker.undo(session.grid) is not None:
+                pass
+            self.assertGridEqual(session.grid, Grid(draw_style, 12, 12))
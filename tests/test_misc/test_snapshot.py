@@ -0,0 +1,100 @@
+import os
+import random
+import tempfile
+import unittest
+from ed_utils.decorators import number
+
+from array_grid import registered_layers
+from grid import Grid
+from layers import rainbow, red, sparkle
+from snapshot import dumps, load, loads, restore, save
+from tiled_grid import TiledGrid
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "canvas.pntg")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @number("19.1")
+    def test_round_trip(self):
+        for seed, draw_style in enumerate(Grid.DRAW_STYLE_OPTIONS):
+            rng = random.Random(seed)
+            layers = registered_layers() + [rainbow, sparkle]
+            grid = Grid(draw_style, 7, 5)
+            for _ in range(300):
+                grid[rng.randrange(7)][rng.randrange(5)].add(rng.choice(layers))
+                if rng.random() < 0.03:
+                    grid.special()
+            save(grid, self.path)
+            loaded = load(self.path)
+            self.assertEqual((loaded.draw_style, loaded.x, loaded.y), (draw_style, 7, 5))
+            for x in range(7):
+                for y in range(5):
+                    self.assertEqual(loaded[x][y].snapshot(), grid[x][y].snapshot())
+                    self.assertEqual(
+                        loaded[x][y].get_color((255, 255, 255), 4, x, y),
+                        grid[x][y].get_color((255, 255, 255), 4, x, y),
+                    )
+            # Both grids keep behaving the same after loading.
+            for grid_ in (grid, loaded):
+                grid_.special()
+                grid_[3][3].add(red)
+            copy = os.path.join(self.tmp.name, "copy.pntg")
+            save(loaded, copy)
+            save(grid, self.path)
+            with open(copy, "rb") as a, open(self.path, "rb") as b:
+                self.assertEqual(a.read(), b.read())
+
+    @number("19.2")
+    def test_lazy_load(self):
+        grid = TiledGrid(Grid.DRAW_STYLE_ADD, 256, 256)
+        grid[200][100].add(red)
+        grid[200][100].add(sparkle)
+        save(grid, self.path)
+        loaded = load(self.path)
+        self.assertEqual(loaded.cells, {})
+        self.assertEqual(loaded[200][100].snapshot(), (red.index, sparkle.index))
+        self.assertEqual(list(loaded.cells), [(200, 100)])
+        self.assertEqual(loaded.take_dirty(), set())
+        loaded[0][0].add(red)
+        self.assertEqual(loaded.take_dirty(), {(0, 0)})
+
+    @number("19.3")
+    def test_bad_file(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a snapshot at all")
+        with self.assertRaises(ValueError):
+            load(self.path)
+        # A corrupt draw style byte.
+        data = bytearray(dumps(Grid(Grid.DRAW_STYLE_SET, 2, 2)))
+        data[6] = 7
+        with self.assertRaises(ValueError):
+            loads(bytes(data))
+
+    @number("19.4")
+    def test_close(self):
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 4, 4)
+        grid[1][2].add(red)
+        save(grid, self.path)
+        with load(self.path) as loaded:
+            mapped = loaded.data
+            self.assertFalse(mapped.closed)
+        self.assertTrue(mapped.closed)
+        # Squares not reached before closing are still read, from memory.
+        self.assertEqual(loaded[1][2].snapshot(), grid[1][2].snapshot())
+        loaded.close()
+
+    @number("19.5")
+    def test_restore_other_grid(self):
+        data = dumps(Grid(Grid.DRAW_STYLE_ADD, 4, 4))
+        for grid in (Grid(Grid.DRAW_STYLE_ADD, 4, 5), Grid(Grid.DRAW_STYLE_SET, 4, 4)):
+            with self.assertRaises(ValueError):
+                restore(grid, data)
+        grid = Grid(Grid.DRAW_STYLE_ADD, 4, 4)
+        grid[2][2].add(red)
+        restore(grid, data)
+        self.assertEqual(grid[2][2].snapshot(), ())
@@ -0,0 +1,74 @@
+import random
+import unittest
+from ed_utils.decorators import number
+
+from array_grid import registered_layers
+from grid import Grid
+from layer_store import AdditiveLayerStore
+from layers import rainbow, red, sparkle
+
+class TestSparseGrid(unittest.TestCase):
+
+    @number("14.1")
+    def test_matches_dense(self):
+        for seed, draw_style in enumerate(Grid.DRAW_STYLE_OPTIONS):
+            rng = random.Random(seed)
+            layers = registered_layers()
+            dense = Grid(draw_style, 6, 5)
+            sparse = Grid(draw_style, 6, 5, sparse=True)
+            for _ in range(300):
+                roll = rng.random()
+                x, y = rng.randrange(6), rng.randrange(5)
+                layer = rng.choice(layers + [rainbow, sparkle])
+                if roll < 0.6:
+                    self.assertEqual(dense[x][y].add(layer), sparse[x][y].add(layer))
+                elif roll < 0.95:
+                    self.assertEqual(dense[x][y].erase(layer), sparse[x][y].erase(layer))
+                else:
+                    dense.special()
+                    sparse.special()
+            self.assertTrue(sparse.take_dirty() <= dense.take_dirty())
+            for timestamp in (0, 7, 12.5):
+                for x in range(6):
+                    for y in range(5):
+                        self.assertEqual(
+                            tuple(sparse[x][y].get_color((255, 255, 255), timestamp, x, y)),
+                            tuple(dense[x][y].get_color((255, 255, 255), timestamp, x, y)),
+                        )
+
+    @number("14.2")
+    def test_lazy_stores(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 10, 10, sparse=True)
+        self.assertEqual((len(grid.grid), len(grid[0])), (10, 10))
+        self.assertEqual(grid[3][4].get_color((1, 2, 3), 0, 3, 4), (1, 2, 3))
+        self.assertFalse(grid[3][4].erase(red))
+        self.assertEqual(grid.cells, {})
+        grid[3][4].add(red)
+        self.assertEqual(list(grid.cells), [(3, 4)])
+        self.assertEqual(grid.take_dirty(), {(3, 4)})
+        grid.special()
+        self.assertEqual(grid[0][0].get_color((1, 2, 3), 0, 0, 0), (254, 253, 252))
+        # A square painted after special starts out inverted, like its neighbours.
+        grid[5][5].add(red)
+        grid[5][5].erase(red)
+        self.assertEqual(grid[5][5].get_color((1, 2, 3), 0, 5, 5), (254, 253, 252))
+        with self.assertRaises(IndexError):
+            grid[10]
+        with self.assertRaises(IndexError):
+            grid[0][10]
+
+    @number("14.3")
+    def test_large_canvas(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 4096, 4096, sparse=True)
+        grid[4095][4095].add(red)
+        visited = []
+        special = AdditiveLayerStore.special
+        AdditiveLayerStore.special = lambda store: visited.append(store) or special(store)
+        try:
+            grid.special()
+        finally:
+            AdditiveLayerStore.special = special
+        # Only the painted square is visited, not the 4096 * 4096 others.
+        self.assertEqual(visited, [grid[4095][4095]])
+        self.assertEqual(len(grid.cells), 1)
+        self.assertEqual(grid.take_dirty(), {(4095, 4095)})
@@ -0,0 +1,68 @@
+import unittest
+from ed_utils.decorators import number
+
+from action import StrokeAction
+from brush import stencil_cells, swept_cells
+from engine import PaintSession
+from grid import Grid
+from journal import decode, encode, RECORD
+from layers import black, lighten, red
+
+class TestStroke(unittest.TestCase):
+
+    @number("22.1")
+    def test_one_action_per_stroke(self):
+        session = PaintSession(Grid(Grid.DRAW_STYLE_ADD, 10, 10))
+        session.begin_stroke()
+        for px in range(2, 8):
+            session.on_paint(lighten, px, 5)
+        self.assertEqual(len(session.UndoTracker.UndoStack), 0)
+        session.end_stroke()
+        self.assertEqual(len(session.UndoTracker.UndoStack), 1)
+        touched = {cell for px in range(2, 8) for cell in stencil_cells(px, 5, Grid.DEFAULT_BRUSH_SIZE, 10, 10)}
+        stroke = session.UndoTracker.UndoStack.peek()
+        self.assertEqual(len(stroke), len(touched))
+        for x in range(10):
+            for y in range(10):
+                # Each square is lightened once, however many dabs covered it.
+                expected = (lighten.index,) if (x, y) in touched else ()
+                self.assertEqual(session.grid[x][y].snapshot(), expected)
+        session.on_undo()
+        for x in range(10):
+            for y in range(10):
+                self.assertEqual(session.grid[x][y].snapshot(), ())
+        session.on_redo()
+        self.assertEqual(session.grid[5][5].snapshot(), (lighten.index,))
+
+    @number("22.2")
+    def test_layer_change_and_undo(self):
+        session = PaintSession(Grid(Grid.DRAW_STYLE_SET, 10, 10))
+        session.begin_stroke()
+        session.on_paint(red, 1, 1)
+        session.on_paint(black, 1, 1)
+        # Undo while dragging closes the stroke first, and puts back the red it painted over.
+        session.on_undo()
+        self.assertEqual(session.grid[1][1].snapshot(), (red.index, False))
+        self.assertFalse(session.stroking)
+        self.assertEqual(session.UndoTracker.UndoStack.peek(), StrokeAction(red, stencil_cells(1, 1, Grid.DEFAULT_BRUSH_SIZE, 10, 10)))
+        self.assertEqual(len(session.ReplayTracker.ReplayQueue), 2)
+
+    @number("22.3")
+    def test_journal_record(self):
+        stroke = StrokeAction(red, [(1, 2), (300, 4), (5, 70000)])
+        record = encode(stroke, is_undo=True)
+        self.assertEqual(decode(record[RECORD.size:]), (stroke, True))
+
+    @number("22.4")
+    def test_sweep(self):
+        for stroking in (False, True):
+            session = PaintSession(Grid(Grid.DRAW_STYLE_ADD, 10, 10))
+            if stroking:
+                session.begin_stroke()
+            session.on_sweep(red, [(2, 2), (3, 2), (4, 2), (4, 3)])
+            session.end_stroke()
+            self.assertEqual(len(session.UndoTracker.UndoStack), 1)
+            cells = swept_cells([(2, 2), (3, 2), (4, 2), (4, 3)], Grid.DEFAULT_BRUSH_SIZE, 10, 10)
+            for x in range(10):
+                for y in range(10):
+                    self.assertEqual(session.grid[x][y].snapshot(), (red.index,) if (x, y) in cells else ())
@@ -0,0 +1,114 @@
+import os
+import random
+import unittest
+from ed_utils.decorators import number
+
+from array_grid import registered_layers
+from grid import Grid
+from layers import rainbow, red, sparkle
+from tiled_grid import TiledGrid
+
+class TestTiledGrid(unittest.TestCase):
+
+    @number("15.1")
+    def test_matches_dense(self):
+        for seed, draw_style in enumerate(Grid.DRAW_STYLE_OPTIONS):
+            rng = random.Random(seed)
+            layers = registered_layers() + [rainbow, sparkle]
+            dense = Grid(draw_style, 10, 7)
+            tiled = TiledGrid(draw_style, 10, 7, tile_size=4, max_resident=2)
+            dense_colors = bytearray((255, 255, 255)) * (10 * 7)
+            tiled_colors = bytearray((255, 255, 255)) * (10 * 7)
+            for step in range(400):
+                roll = rng.random()
+                x, y = rng.randrange(10), rng.randrange(7)
+                if roll < 0.6:
+                    layer = rng.choice(layers)
+                    self.assertEqual(dense[x][y].add(layer), tiled[x][y].add(layer))
+                elif roll < 0.95:
+                    self.assertEqual(dense[x][y].erase(red), tiled[x][y].erase(red))
+                else:
+                    dense.special()
+                    tiled.special()
+                if step % 50 == 0:
+                    dense.compose(dense_colors, (255, 255, 255), step)
+                    tiled.compose(tiled_colors, (255, 255, 255), step, visible=tiled.tiles)
+                    self.assertEqual(tiled_colors, dense_colors)
+            self.assertLessEqual(len(tiled.resident), 2)
+            blank = bytearray(10 * 7 * 3)
+            tiled.blit(blank, (255, 255, 255))
+            self.assertEqual(blank, tiled_colors)
+
+    @number("15.2")
+    def test_only_dirty_tiles(self):
+        grid = TiledGrid(Grid.DRAW_STYLE_SET, 256, 256)
+        colors = bytearray((1, 2, 3)) * (256 * 256)
+        self.assertFalse(grid.compose(colors, (1, 2, 3), 0))
+        self.assertEqual(grid.tiles, {})
+        grid[70][130].add(red)
+        self.assertEqual(list(grid.tiles), [(1, 2)])
+        self.assertTrue(grid.compose(colors, (1, 2, 3), 0))
+        self.assertEqual(colors[(70 * 256 + 130) * 3:][:3], bytearray((255, 0, 0)))
+        self.assertFalse(grid.compose(colors, (1, 2, 3), 1))
+        grid.special()
+        self.assertTrue(grid.compose(colors, (1, 2, 3), 1))
+        self.assertEqual(colors[:3], bytearray((254, 253, 252)))
+        self.assertEqual(colors[(70 * 256 + 130) * 3:][:3], bytearray((0, 255, 255)))
+
+    @number("15.3")
+    def test_eviction(self):
+        grid = TiledGrid(Grid.DRAW_STYLE_ADD, 8, 8, tile_size=4, max_resident=1)
+        grid[0][0].add(red)
+        grid[0][0].add(rainbow)
+        grid[5][5].add(red)
+        self.assertEqual(list(grid.resident), [(1, 1)])
+        self.assertEqual(os.listdir(grid.cache_dir), ["0_0.tile"])
+        self.assertEqual(grid[0][0].snapshot(), (red.index, rainbow.index))
+        self.assertEqual(os.listdir(grid.cache_dir), ["1_1.tile"])
+
+    @number("15.4")
+    def test_store_snapshots(self):
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            grid = Grid(draw_style, 1, 1)
+            for layer in (red, rainbow, sparkle):
+                grid[0][0].add(layer)
+            grid[0][0].special()
+            copy = Grid(draw_style, 1, 1)
+            copy[0][0].restore(grid[0][0].snapshot())
+            self.assertEqual(copy.take_dirty(), {(0, 0)})
+            self.assertEqual(copy[0][0].snapshot(), grid[0][0].snapshot())
+            for timestamp in (0, 3, 9.5):
+                self.assertEqual(
+                    copy[0][0].get_color((10, 20, 30), timestamp, 0, 0),
+                    grid[0][0].get_color((10, 20, 30), timestamp, 0, 0),
+                )
+
+    @number("15.5")
+    def test_evicted_animation(self):
+        grid = TiledGrid(Grid.DRAW_STYLE_ADD, 12, 4, tile_size=4, max_resident=1)
+        for x in (0, 4, 8):
+            grid[x][1].add(rainbow)
+        colors = bytearray(12 * 4 * 3)
+        grid.compose(colors, (255, 255, 255), 0, visible=grid.tiles)
+        self.assertEqual(grid.take_dirty(), {(0, 1), (4, 1), (8, 1)})
+        loads = []
+        load = TiledGrid._load
+        TiledGrid._load = lambda grid, key, tile: loads.append(key) or load(grid, key, tile)
+        try:
+            # Only the resident tile is recomposited, the evicted ones are not read back.
+            resident = list(grid.resident)
+            for timestamp in range(1, 5):
+                grid.compose(colors, (255, 255, 255), timestamp)
+            self.assertEqual(loads, [])
+            self.assertEqual(list(grid.resident), resident)
+            # A visible evicted tile is read back once, and stays in memory while it is shown.
+            shown = next(key for key in grid.tiles if key not in resident)
+            for timestamp in range(5, 9):
+                grid.compose(colors, (255, 255, 255), timestamp, visible=[shown])
+            self.assertEqual(loads, [shown])
+        finally:
+            TiledGrid._load = load
+        dense = Grid(Grid.DRAW_STYLE_ADD, 1, 1)
+        dense[0][0].add(rainbow)
+        x = shown[0] * 4
+        self.assertEqual(tuple(colors[(x * 4 + 1) * 3:][:3]), dense[0][0].get_color((255, 255, 255), 8, x, 1))
@@ -0,0 +1,123 @@
+import os
+import random
+import tempfile
+import unittest
+from ed_utils.decorators import number
+
+from action import BrushAction, JumpAction
+from engine import PaintSession
+from grid import Grid
+from journal import Journal
+from layer_util import get_layers
+from undo import UndoTracker
+import snapshot
+
+class TestUndoGoto(unittest.TestCase):
+
+    def paint_session(self, draw_style, count, seed=0):
+        rng = random.Random(seed)
+        session = PaintSession(Grid(draw_style, 16, 16))
+        session.UndoTracker = UndoTracker(keyframe_every=25)
+        layers = [layer for layer in get_layers() if layer is not None]
+        actions = []
+        for _ in range(count):
+            session.grid.DEFAULT_BRUSH_SIZE = rng.randint(0, 3)
+            session.on_paint(rng.choice(layers), rng.randrange(16), rng.randrange(16))
+            actions.append(session.UndoTracker.UndoStack.peek())
+        return session, actions
+
+    def replayed(self, draw_style, actions):
+        grid = Grid(draw_style, 16, 16)
+        for action in actions:
+            action.redo_apply(grid)
+        return grid
+
+    def assertGridEqual(self, grid1, grid2):
+        for x in range(grid1.x):
+            for y in range(grid1.y):
+                self.assertEqual(grid1[x][y].snapshot(), grid2[x][y].snapshot(), f"Square {x}, {y}")
+
+    @number("25.1")
+    def test_goto_matches_replay(self):
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            session, actions = self.paint_session(draw_style, 200)
+            for index in [137, 50, 199, 123, 60, 200]:
+                session.UndoTracker.goto(index, session.grid)
+                self.assertEqual(session.UndoTracker.position(), index)
+                self.assertEqual(len(session.UndoTracker), 200)
+                self.assertGridEqual(session.grid, self.replayed(draw_style, actions[:index]))
+
+    @number("25.2")
+    def test_goto_replays_little(self):
+        session, actions = self.paint_session(Grid.DRAW_STYLE_SET, 200)
+        applied = []
+        redo_apply, undo_apply = BrushAction.redo_apply, BrushAction.undo_apply
+        BrushAction.redo_apply = lambda action, grid: applied.append(action) or redo_apply(action, grid)
+        BrushAction.undo_apply = lambda action, grid: applied.append(action) or undo_apply(action, grid)
+        try:
+            session.UndoTracker.goto(30, session.grid)
+            # From the keyframe at 25 rather than 170 undos.
+            self.assertEqual(applied, actions[25:30])
+            applied.clear()
+            session.UndoTracker.goto(199, session.grid)
+            self.assertEqual(applied, actions[175:199])
+        finally:
+            BrushAction.redo_apply, BrushAction.undo_apply = redo_apply, undo_apply
+        self.assertGridEqual(session.grid, self.replayed(Grid.DRAW_STYLE_SET, actions[:199]))
+
+    @number("25.3")
+    def test_new_action_after_goto(self):
+        session, actions = self.paint_session(Grid.DRAW_STYLE_ADD, 120)
+        session.UndoTracker.goto(60, session.grid)
+        session.on_paint(get_layers()[0], 3, 3)
+        new = session.UndoTracker.UndoStack.peek()
+        session.UndoTracker.goto(55, session.grid)
+        session.UndoTracker.goto(61, session.grid)
+        self.assertGridEqual(session.grid, self.replayed(Grid.DRAW_STYLE_ADD, actions[:60] + [new]))
+        with self.assertRaises(IndexError):
+            session.UndoTracker.goto(len(session.UndoTracker) + 1, session.grid)
+
+    @number("25.4")
+    def test_replay_after_goto(self):
+        session, actions = self.paint_session(Grid.DRAW_STYLE_SEQUENCE, 3)
+        session.on_goto(1)
+        live = [[session.grid[x][y].snapshot() for y in range(16)] for x in range(16)]
+        session.on_replay_start()
+        while not session.on_replay_next_step():
+            pass
+        # The replay shows the jump back to the first action, as the window did.
+        self.assertEqual([[session.grid[x][y].snapshot() for y in range(16)] for x in range(16)], live)
+        self.assertGridEqual(session.grid, self.replayed(Grid.DRAW_STYLE_SEQUENCE, actions[:1]))
+
+    @number("25.5")
+    def test_scrub_records_once(self):
+        session, actions = self.paint_session(Grid.DRAW_STYLE_ADD, 80)
+        with tempfile.TemporaryDirectory() as directory:
+            session.journal = Journal(os.path.join(directory, "journal"))
+            session.journal.recover(Grid.DRAW_STYLE_ADD, 16, 16)
+            dumps, checkpoint = snapshot.dumps, Journal.checkpoint
+            calls = []
+            snapshot.dumps = lambda grid: calls.append("dumps") or dumps(grid)
+            Journal.checkpoint = lambda journal, grid: calls.append("checkpoint") or checkpoint(journal, grid)
+            try:
+                for index in range(80, 10, -5):
+                    session.on_goto(index)
+                # Only the grid before the scrub is kept while scrubbing.
+                self.assertEqual(calls, ["dumps"])
+                # The next action records the jump, and checkpoints the journal, once.
+                session.on_paint(get_layers()[0], 3, 3)
+                self.assertEqual(calls[:3], ["dumps", "dumps", "checkpoint"])
+                session.on_goto(5)
+                live = [[session.grid[x][y].snapshot() for y in range(16)] for x in range(16)]
+                session.on_undo()
+                self.assertEqual(calls.count("checkpoint"), 2)
+            finally:
+                snapshot.dumps, Journal.checkpoint = dumps, checkpoint
+            session.journal.close()
+        jumps = [action for action, _ in session.ReplayTracker.ReplayQueue if isinstance(action, JumpAction)]
+        self.assertEqual(len(jumps), 2)
+        # The replay ends on the grid of the last scrub (undos are not replayed).
+        session.on_replay_start()
+        while not session.on_replay_next_step():
+            pass
+        self.assertEqual([[session.grid[x][y].snapshot() for y in range(16)] for x in range(16)], live)
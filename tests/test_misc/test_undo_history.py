@@ -0,0 +1,52 @@
+import unittest
+from ed_utils.decorators import number
+
+from action import BrushAction, StrokeAction
+from data_structures.stack_adt import RingStack
+from grid import Grid
+from layers import black, red
+from undo import UndoTracker
+
+class TestUndoHistory(unittest.TestCase):
+
+    @number("24.1")
+    def test_ring_stack(self):
+        stack = RingStack(3)
+        for i in range(3):
+            self.assertIsNone(stack.push(i))
+        self.assertEqual(stack.push(3), 0)
+        self.assertEqual([stack[i] for i in range(len(stack))], [1, 2, 3])
+        self.assertEqual(stack.pop(), 3)
+        self.assertEqual(stack.drop_bottom(), 1)
+        self.assertEqual(stack.peek(), 2)
+        self.assertEqual(len(stack), 1)
+
+    @number("24.2")
+    def test_evicts_oldest_by_count(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 10, 10)
+        undo = UndoTracker(max_actions=3)
+        actions = [BrushAction(red if i % 2 else black, i, i, 1) for i in range(5)]
+        for action in actions:
+            action.redo_apply(grid)
+            undo.add_action(action)
+        # The newest actions are kept, the two oldest are gone.
+        self.assertEqual(len(undo.UndoStack), 3)
+        self.assertIs(undo.undo(grid), actions[4])
+        self.assertIs(undo.undo(grid), actions[3])
+        self.assertIs(undo.undo(grid), actions[2])
+        self.assertIsNone(undo.undo(grid))
+        self.assertEqual(undo.memory_usage(), sum(action.nbytes() for action in actions[2:]))
+
+    @number("24.3")
+    def test_byte_budget(self):
+        small = BrushAction(red, 0, 0, 1)
+        big = StrokeAction(red, [(x, y) for x in range(10) for y in range(10)])
+        undo = UndoTracker(max_bytes=3 * small.nbytes())
+        for _ in range(5):
+            undo.add_action(BrushAction(red, 0, 0, 1))
+        self.assertEqual(len(undo.UndoStack), 3)
+        self.assertLessEqual(undo.memory_usage(), 3 * small.nbytes())
+        # An action larger than the whole budget is still kept on its own.
+        undo.add_action(big)
+        self.assertEqual(len(undo.UndoStack), 1)
+        self.assertEqual(undo.memory_usage(), big.nbytes())
@@ -0,0 +1,145 @@
+import unittest
+from ed_utils.decorators import number
+
+from action import BrushAction
+from engine import PaintSession
+from grid import Grid
+from layers import black, blue, green, red
+from undo import UndoTracker
+
+class TestUndoTree(unittest.TestCase):
+
+    def assertGridEqual(self, grid1, grid2):
+        for x in range(grid1.x):
+            for y in range(grid1.y):
+                self.assertEqual(grid1[x][y].snapshot(), grid2[x][y].snapshot(), f"Square {x}, {y}")
+
+    def replayed(self, actions):
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 10, 10)
+        for action in actions:
+            action.redo_apply(grid)
+        return grid
+
+    @number("26.1")
+    def test_branches_are_kept(self):
+        session = PaintSession(Grid(Grid.DRAW_STYLE_SEQUENCE, 10, 10))
+        session.on_paint(red, 2, 2)
+        a = session.UndoTracker.current
+        session.on_paint(green, 3, 3)
+        b = session.UndoTracker.current
+        session.on_undo()
+        session.on_paint(blue, 6, 6)
+        c = session.UndoTracker.current
+        # A new action after an undo starts a branch, and redo has nothing left to do.
+        self.assertEqual(session.UndoTracker.children(a), [b, c])
+        self.assertIsNone(session.UndoTracker.redo(session.grid))
+        session.on_goto_node(b)
+        self.assertGridEqual(session.grid, self.replayed([BrushAction(red, 2, 2, 2), BrushAction(green, 3, 3, 2)]))
+        # Redo follows the branch visited last.
+        session.on_undo()
+        session.on_redo()
+        self.assertEqual(session.UndoTracker.current, b)
+        session.on_goto_node(c)
+        self.assertGridEqual(session.grid, self.replayed([BrushAction(red, 2, 2, 2), BrushAction(blue, 6, 6, 2)]))
+
+    @number("26.2")
+    def test_switch_through_common_ancestor(self):
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 10, 10)
+        undo = UndoTracker()
+        trunk = [BrushAction(black, i % 10, i // 10, 0) for i in range(40)]
+        first = [BrushAction(red, i, 9, 0) for i in range(5)]
+        second = [BrushAction(blue, 9, i, 1) for i in range(6)]
+        for action in trunk + first:
+            action.redo_apply(grid)
+            undo.add_action(action)
+        tip1 = undo.current
+        for _ in first:
+            undo.undo(grid)
+        for action in second:
+            action.redo_apply(grid)
+            undo.add_action(action)
+        tip2 = undo.current
+        applied = []
+        redo_apply, undo_apply = BrushAction.redo_apply, BrushAction.undo_apply
+        BrushAction.redo_apply = lambda action, grid: applied.append(action) or redo_apply(action, grid)
+        BrushAction.undo_apply = lambda action, grid: applied.append(action) or undo_apply(action, grid)
+        try:
+            undo.goto_node(tip1, grid)
+        finally:
+            BrushAction.redo_apply, BrushAction.undo_apply = redo_apply, undo_apply
+        # Only the two branches below the common ancestor are replayed, not the trunk.
+        self.assertEqual(applied, second[::-1] + first)
+        self.assertGridEqual(grid, self.replayed(trunk + first))
+        undo.goto_node(tip2, grid)
+        self.assertGridEqual(grid, self.replayed(trunk + second))
+
+    @number("26.3")
+    def test_bounded_tree(self):
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 10, 10)
+        undo = UndoTracker(max_actions=20)
+        for i in range(300):
+            action = BrushAction(red if i % 2 else green, i % 10, (i // 10) % 10, 0)
+            action.redo_apply(grid)
+            undo.add_action(action)
+            if i % 7 == 6:
+                undo.undo(grid)
+                undo.undo(grid)
+        self.assertEqual(undo.count, 20)
+        self.assertEqual(sum(action is not None for action in undo.actions), 20)
+        # Freed nodes are reused, so the arrays stay the size of the history.
+        self.assertLessEqual(len(undo.actions), 24)
+        self.assertEqual(undo.position(), len(undo.UndoStack))
+        while undo.undo(grid) is not None:
+            pass
+        self.assertEqual(undo.action_of(undo.current), None)
+
+    @number("26.4")
+    def test_replay_after_branch_switch(self):
+        session = PaintSession(Grid(Grid.DRAW_STYLE_SEQUENCE, 10, 10))
+        session.on_paint(red, 2, 2)
+        session.on_paint(green, 3, 3)
+        b = session.UndoTracker.current
+        session.on_undo()
+        session.on_paint(blue, 6, 6)
+        session.on_goto_node(b)
+        session.on_replay_start()
+        while not session.on_replay_next_step():
+            pass
+        # The replay ends on the branch switched to, as the window did.
+        self.assertGridEqual(session.grid, self.replayed([BrushAction(red, 2, 2, 2), BrushAction(green, 3, 3, 2)]))
+
+    @number("26.5")
+    def test_evicts_oldest_leaf(self):
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 10, 10)
+        undo = UndoTracker(max_actions=20)
+        old = BrushAction(black, 0, 0, 0)
+        old.redo_apply(grid)
+        undo.add_action(old)
+        first = undo.current
+        undo.undo(grid)
+        branch = []
+        for i in range(15):
+            action = BrushAction(red, i % 10, 1, 0)
+            action.redo_apply(grid)
+            undo.add_action(action)
+            branch.append(undo.current)
+        undo.goto_node(first, grid)
+        for i in range(5):
+            action = BrushAction(blue, i, 2, 0)
+            action.redo_apply(grid)
+            undo.add_action(action)
+        # The newer, larger branch only loses its tip, not all 15 actions.
+        self.assertEqual(undo.count, 20)
+        self.assertEqual(undo.children(undo.root), [first, branch[0]])
+        self.assertIsNone(undo.action_of(branch[-1]))
+        self.assertIsNotNone(undo.action_of(branch[-2]))
+        undo.goto_node(branch[-2], grid)
+        self.assertEqual(undo.position(), 14)
+        # Once the trunk is the only child of the root, the oldest action goes.
+        undo.goto_node(first, grid)
+        for _ in range(14):
+            undo.add_action(BrushAction(green, 5, 5, 0))
+        self.assertEqual(undo.children(undo.root), [first])
+        undo.add_action(BrushAction(green, 5, 5, 0))
+        self.assertEqual(undo.count, 20)
+        self.assertEqual(undo.root, first)
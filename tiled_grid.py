@@ -0,0 +1,409 @@
+"""
+Tiled grid.
+
+Splits a large canvas into square tiles (64 x 64 squares by default). Each
+tile owns the LayerStores of its squares, a dirty flag and a cached RGB
+buffer, so a frame only recomposites the tiles that changed and copies the
+cached colours of the others. Tiles are created the first time one of their
+squares is reached, and the layer state of the least recently used tiles can
+be evicted to disk to bound memory. Each tile also knows which of its squares
+are animated (hold a time dependent layer), so a frame never has to read an
+evicted tile back just to find out.
+"""
+
+from __future__ import annotations
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from data_structures.referential_array import ArrayR
+from grid import Grid
+from layer_store import LayerStore
+
+
+def blit_region(colors: bytearray, size_y: int, x0: int, y0: int, width: int, height: int, rgb) -> None:
+    """
+    Copies the width * height * 3 bytes of rgb, ordered by x and then y, into the
+    flat colour buffer of a grid with size_y rows, at square (x0, y0).
+
+    Complexity:
+    - O(width * height) bytes copied, in width slices.
+    """
+    column = height * 3
+    for lx in range(width):
+        dst = ((x0 + lx) * size_y + y0) * 3
+        colors[dst:dst+column] = rgb[lx*column:(lx+1)*column]
+
+
+class Tile:
+    """
+    A block of width x height squares of a TiledGrid, starting at square (x0, y0).
+
+    - stores: the LayerStores, ordered by x and then y, or None while evicted.
+    - dirty: whether rgb no longer matches the layers.
+    - rgb: width * height * 3 bytes of cached colours, in the same x then y
+      order as GridRenderer. Kept in memory when the tile is evicted.
+    - animated: the squares (x, y) holding a time dependent layer. Kept in memory
+      when the tile is evicted, as its layers cannot change until it is loaded.
+    """
+
+    def __init__(self, x0: int, y0: int, width: int, height: int) -> None:
+        self.x0 = x0
+        self.y0 = y0
+        self.width = width
+        self.height = height
+        self.stores = None
+        self.dirty = True
+        self.rgb = None
+        self.path = None
+        self.animated = set()
+
+    def store_at(self, x: int, y: int) -> LayerStore:
+        """Returns the LayerStore of grid square (x, y), which must be inside this resident tile."""
+        return self.stores[(x - self.x0) * self.height + (y - self.y0)]
+
+    def composite(self, start, timestamp: float) -> None:
+        """
+        Recomputes the cached colours of every square of the tile.
+
+        Complexity:
+        - O(width * height * get_color)
+        """
+        rgb = self.rgb
+        i = 0
+        for x in range(self.x0, self.x0 + self.width):
+            for y in range(self.y0, self.y0 + self.height):
+                rgb[i:i+3] = self.stores[i // 3].get_color(start, timestamp, x, y)
+                i += 3
+        self.dirty = False
+
+    def blit(self, colors: bytearray, size_y: int) -> None:
+        """
+        Copies the cached colours into a flat grid buffer of a grid with size_y rows,
+        one column of the tile at a time.
+
+        Complexity:
+        - O(width * height) bytes copied, in width slices.
+        """
+        blit_region(colors, size_y, self.x0, self.y0, self.width, self.height, self.rgb)
+
+
+class TiledGrid(Grid):
+    """
+    Grid split into tiles of tile_size x tile_size squares.
+
+    grid[x][y] returns the LayerStore of the square, loading its tile first,
+    so actions, undo and replay work unchanged. A store returned this way
+    stays valid until another tile is loaded, as its own tile may then be evicted.
+    """
+
+    DEFAULT_TILE_SIZE = 64
+
+    def __init__(self, draw_style: str, x: int, y: int, tile_size: int = DEFAULT_TILE_SIZE,
+                 max_resident: int | None = None, cache_dir: str | None = None) -> None:
+        """
+        Initialise the grid object.
+
+        Args:
+        - draw_style = One of DRAW_STYLE_OPTIONS
+        - x, y = The dimensions of the grid
+        - tile_size = The width and height of a tile, in squares
+        - max_resident = How many tiles keep their layer state in memory. When a tile
+          is loaded past that, the least recently used one is written to disk.
+          None keeps every tile in memory.
+        - cache_dir = Where evicted tiles are written. Defaults to a temporary
+          directory removed with the grid.
+
+        Raises:
+        - ValueError if the draw style is not one of DRAW_STYLE_OPTIONS, or max_resident < 1
+
+        Complexity:
+        - O(1), tiles are only created when first used.
+        """
+        if draw_style not in self.DRAW_STYLE_OPTIONS:
+            raise ValueError(f"Unknown draw style {draw_style}")
+        if max_resident is not None and max_resident < 1:
+            raise ValueError("At least one tile has to stay in memory")
+        self.draw_style = draw_style
+        self.x = x
+        self.y = y
+        self.sparse = False
+        self.tile_size = tile_size
+        self.max_resident = max_resident
+        self.tiles = {}
+        self.resident = OrderedDict()
+        self.dirty_tiles = set()
+        self.dirty = set()
+        self.animated_tiles = set()
+        # Whether special has inverted the squares of SET tiles not created yet.
+        self.blank_inverted = False
+        self.blank_dirty = False
+        self._tmp = None
+        if max_resident is not None and cache_dir is None:
+            self._tmp = tempfile.TemporaryDirectory(prefix="tiles-")
+            cache_dir = self._tmp.name
+        self.cache_dir = cache_dir
+        self.grid = _TiledRows(self)
+
+    def tile_key(self, x: int, y: int) -> tuple[int, int]:
+        """Returns the key of the tile holding square (x, y)."""
+        return (x // self.tile_size, y // self.tile_size)
+
+    def tile_at(self, x: int, y: int) -> Tile:
+        """
+        Returns the tile holding square (x, y), with its layer state in memory.
+
+        Complexity:
+        - O(1) if the tile is resident.
+        - O(tile_size^2) to create or load it, plus the cost of evicting another tile.
+        """
+        key = self.tile_key(x, y)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self._new_tile(key)
+        elif tile.stores is None:
+            self._load(key, tile)
+        if key in self.resident:
+            self.resident.move_to_end(key)
+        else:
+            self.resident[key] = tile
+            self._evict_extra()
+        return tile
+
+    def store_at(self, x: int, y: int) -> LayerStore:
+        """Returns the LayerStore of square (x, y)."""
+        return self.tile_at(x, y).store_at(x, y)
+
+    def square_changed(self, x: int, y: int) -> None:
+        """
+        Called by the LayerStore at (x, y) whenever its layers change.
+
+        Complexity:
+        - O(1)
+        """
+        self.dirty.add((x, y))
+        key = self.tile_key(x, y)
+        tile = self.tiles[key]
+        tile.dirty = True
+        self.dirty_tiles.add(key)
+        if tile.stores is None: #A store of an evicted tile, no longer valid
+            return
+        if tile.store_at(x, y).is_time_dependent():
+            tile.animated.add((x, y))
+            self.animated_tiles.add(key)
+        elif tile.animated:
+            tile.animated.discard((x, y))
+            if not tile.animated:
+                self.animated_tiles.discard(key)
+
+    def take_dirty(self) -> set[tuple[int, int]]:
+        """
+        Returns the squares that changed since the last call, together with every
+        animated square, and starts tracking changes for the next one. The animated
+        squares are known per tile, so no evicted tile is read back.
+
+        Complexity:
+        - O(d + a), where d is the number of changed squares and a the number of animated squares.
+        """
+        squares = self.dirty
+        for key in self.animated_tiles:
+            squares |= self.tiles[key].animated
+        self.dirty = set()
+        return squares
+
+    def special(self) -> None:
+        """
+        Activate the special affect on all grid squares.
+
+        Complexity:
+        - O(x*y) for the created tiles, which are loaded in turn if they were evicted.
+        """
+        for key in list(self.tiles):
+            tile = self.tiles[key]
+            tile = self.tile_at(tile.x0, tile.y0)
+            for i in range(len(tile.stores)):
+                tile.stores[i].special()
+        if self.draw_style == self.DRAW_STYLE_SET:
+            self.blank_inverted = not self.blank_inverted
+            self.blank_dirty = True
+
+    def stores(self):
+        """
+        Yields (x, y, store) for every square of the created tiles, loading them in turn.
+        Squares of tiles not created yet hold no layers.
+
+        Complexity:
+        - O(x*y) for the created tiles.
+        """
+        for key in list(self.tiles):
+            tile = self.tiles[key]
+            tile = self.tile_at(tile.x0, tile.y0)
+            i = 0
+            for x in range(tile.x0, tile.x0 + tile.width):
+                for y in range(tile.y0, tile.y0 + tile.height):
+                    yield x, y, tile.stores[i]
+                    i += 1
+
+    def evict(self, key: tuple[int, int]) -> None:
+        """
+        Writes the layer state of a tile to disk and drops it from memory.
+        Its cached colours are kept, so it is only read back once it changes.
+
+        Raises:
+        - ValueError if the grid has no cache directory
+
+        Complexity:
+        - O(tile_size^2)
+        """
+        if self.cache_dir is None:
+            raise ValueError("Tiles can only be evicted with a cache directory")
+        tile = self.resident.pop(key)
+        tile.path = os.path.join(self.cache_dir, f"{key[0]}_{key[1]}.tile")
+        with open(tile.path, "wb") as f:
+            pickle.dump([tile.stores[i].snapshot() for i in range(len(tile.stores))], f, pickle.HIGHEST_PROTOCOL)
+        tile.stores = None
+
+    def compose(self, colors: bytearray, start, timestamp: float, visible=None) -> bool:
+        """
+        Brings a flat colour buffer (laid out as in GridRenderer) up to date.
+        Only tiles holding changed or animated squares are recomposited, the
+        buffer is expected to keep the colours of the other tiles from the last call.
+
+        An evicted tile is only read back from disk to be recomposited when its
+        layers changed, or when it is animated and listed in visible. Otherwise its
+        animated squares keep the colours of the last frame it was recomposited in.
+
+        Args:
+        - colors = The flat colour buffer
+        - start = The background colour
+        - timestamp = The current time
+        - visible = The keys (see tile_key) of the tiles on screen whose animation has
+          to be current even when evicted, or None for the resident tiles only
+
+        Returns:
+        - True if any colour in the buffer was written
+
+        Complexity:
+        - O(t * tile_size^2 * get_color), where t is the number of dirty or animated tiles
+          recomposited, plus O(x*y) on the frame after special inverts the tiles not created yet.
+        """
+        written = False
+        if self.blank_dirty:
+            self.blank_dirty = False
+            self._fill_blank(colors, start)
+            written = True
+        self.dirty = set() #Changed tiles are already in dirty_tiles
+        visible = set() if visible is None else set(visible)
+        for key in self.animated_tiles:
+            if self.tiles[key].stores is not None or key in visible:
+                self.dirty_tiles.add(key)
+        # The resident tiles first, so that reading an evicted one back cannot evict them before they are drawn.
+        for key in sorted(self.dirty_tiles, key=lambda key: self.tiles[key].stores is None):
+            tile = self.tiles[key]
+            if tile.stores is None:
+                tile = self.tile_at(tile.x0, tile.y0)
+            tile.composite(start, timestamp)
+            tile.blit(colors, self.y)
+            written = True
+        self.dirty_tiles = set()
+        return written
+
+    def blit(self, colors: bytearray, start) -> None:
+        """
+        Fills a whole flat colour buffer from the cached tile colours, without
+        recompositing anything. Tiles not created yet show the background.
+
+        Complexity:
+        - O(x*y) bytes copied.
+        """
+        self._fill_blank(colors, start)
+        for tile in self.tiles.values():
+            if tile.rgb is not None:
+                tile.blit(colors, self.y)
+
+    def _fill_blank(self, colors: bytearray, start) -> None:
+        """Writes the colour of an untouched square to every square outside the created tiles."""
+        color = bytes(self._blank_color(start))
+        for tx in range(0, self.x, self.tile_size):
+            for ty in range(0, self.y, self.tile_size):
+                if self.tile_key(tx, ty) in self.tiles:
+                    continue
+                width, height = min(self.tile_size, self.x - tx), min(self.tile_size, self.y - ty)
+                for lx in range(width):
+                    dst = ((tx + lx) * self.y + ty) * 3
+                    colors[dst:dst+height*3] = color * height
+
+    def _blank_color(self, start) -> tuple[int, int, int]:
+        if self.blank_inverted:
+            return (255-start[0], 255-start[1], 255-start[2])
+        return tuple(start)
+
+    def _new_tile(self, key: tuple[int, int]) -> Tile:
+        x0, y0 = key[0] * self.tile_size, key[1] * self.tile_size
+        tile = Tile(x0, y0, min(self.tile_size, self.x - x0), min(self.tile_size, self.y - y0))
+        tile.stores = ArrayR(tile.width * tile.height)
+        tile.rgb = bytearray(tile.width * tile.height * 3)
+        i = 0
+        for x in range(x0, x0 + tile.width):
+            for y in range(y0, y0 + tile.height):
+                store = self.new_store()
+                if self.blank_inverted:
+                    store.special()
+                store.watch(self, x, y)
+                tile.stores[i] = store
+                i += 1
+        self.tiles[key] = tile
+        self.dirty_tiles.add(key)
+        return tile
+
+    def _load(self, key: tuple[int, int], tile: Tile) -> None:
+        with open(tile.path, "rb") as f:
+            states = pickle.load(f)
+        os.remove(tile.path)
+        tile.path = None
+        tile.stores = ArrayR(len(states))
+        i = 0
+        for x in range(tile.x0, tile.x0 + tile.width):
+            for y in range(tile.y0, tile.y0 + tile.height):
+                store = self.new_store()
+                store.restore(states[i])
+                store.watch(self, x, y)
+                tile.stores[i] = store
+                i += 1
+
+    def _evict_extra(self) -> None:
+        if self.max_resident is None:
+            return
+        while len(self.resident) > self.max_resident:
+            self.evict(next(iter(self.resident)))
+
+
+class _TiledRows:
+    """Stands in for the ArrayR of columns of a TiledGrid."""
+
+    def __init__(self, grid: TiledGrid) -> None:
+        self.grid = grid
+
+    def __len__(self) -> int:
+        return self.grid.x
+
+    def __getitem__(self, x: int) -> _TiledColumn:
+        if not 0 <= x < self.grid.x:
+            raise IndexError(x)
+        return _TiledColumn(self.grid, x)
+
+
+class _TiledColumn:
+    """A column of a TiledGrid. Indexing it returns the square's LayerStore."""
+
+    def __init__(self, grid: TiledGrid, x: int) -> None:
+        self.grid = grid
+        self.x = x
+
+    def __len__(self) -> int:
+        return self.grid.y
+
+    def __getitem__(self, y: int) -> LayerStore:
+        if not 0 <= y < self.grid.y:
+            raise IndexError(y)
+        return self.grid.store_at(self.x, y)
@@ -1,46 +1,125 @@
 from __future__ import annotations
+from array import array
+import heapq
 from action import PaintAction
 from grid import Grid
-from data_structures.stack_adt import ArrayStack
+from data_structures.stack_adt import RingStack
 from action import PaintStep
+import snapshot
 class UndoTracker:
+    """
+    Undo and redo history, as a tree.
 
-    UndoStack : ArrayStack
-    RedoStack : ArrayStack
+    Every action is a node whose parent is the action before it. Adding an
+    action after an undo starts a new branch next to the undone one, which is
+    kept, so every state ever reached can be gone back to. Redo follows the
+    branch visited last. The node at the top of the tree (the root) is the
+    state before the oldest action kept.
 
-    def __init__(self) -> None:
-        self.UndoStack = ArrayStack(10000) #Assignment is always constant --> O(1)
-        self.RedoStack = ArrayStack(10000) #Assignment is always constant --> O(1)
+    Nodes are numbered, and the tree is stored as arrays of node numbers
+    (parent, newest child, next sibling, child to redo, depth) next to the list
+    of actions, so a node costs a few machine words on top of its action.
 
-    def add_action(self, action: PaintAction) -> None:
+    The history is bounded: once it holds max_actions actions, or its actions
+    take more than max_bytes (as estimated by their nbytes), actions are
+    forgotten one at a time to make room, oldest first (see _evict), so the most
+    recent ones can always be undone.
+
+    When actions are added with their grid, a keyframe (a snapshot of the grid,
+    see snapshot.dumps) is kept every keyframe_every levels of the tree, so that
+    goto_node can reach any node by restoring the nearest keyframe above it and
+    replaying at most keyframe_every actions.
+    """
+
+    DEFAULT_MAX_ACTIONS = 10000
+    DEFAULT_KEYFRAME_EVERY = 50
+    NONE = -1
+
+    def __init__(self, max_actions: int = DEFAULT_MAX_ACTIONS, max_bytes: int | None = None,
+                 keyframe_every: int = DEFAULT_KEYFRAME_EVERY) -> None:
+        """
+        Args:
+        - max_actions = How many actions the history keeps at most, over all branches
+        - max_bytes = How much memory the actions and keyframes of the history may take, or None
+          for no limit. The last action added is always kept, even if it is larger on its own.
+        - keyframe_every = How many levels of the tree apart keyframes are taken
+        """
+        self.max_actions = max_actions #Assignment is always constant --> O(1)
+        self.max_bytes = max_bytes #Assignment is always constant --> O(1)
+        self.keyframe_every = keyframe_every #Assignment is always constant --> O(1)
+        self.nbytes = 0 #Estimated bytes of the actions and of the keyframes
+        self.count = 0 #Number of actions in the tree
+        self.actions = [] #Node -> its action, None for the root and free nodes
+        self.parent = array("i") #Node -> its parent
+        self.first_child = array("i") #Node -> its newest child
+        self.next_sibling = array("i") #Node -> the next older child of its parent
+        self.redo_child = array("i") #Node -> the child redo goes to
+        self.depth = array("i") #Node -> its depth, counted from the first root, so it never changes
+        self.born = array("i") #Node -> the order it was added in, to tell the older of two nodes
+        self.clock = 0 #The order of the next node added
+        self.leaves = [] #Heap of (born, node) for the nodes that were leaves when pushed, checked when popped
+        self.free = [] #Node numbers free to be reused
+        self.keyframes = {} #Node -> snapshot.dumps of the grid after its action
+        self.root = self._new_node(None, self.NONE, 0) #Constant --> O(1)
+        self.path = RingStack(max_actions + 2) #The nodes from the root to the current one
+        self.path.push(self.root) #Constant --> O(1)
+
+    @property
+    def current(self) -> int:
+        """The node of the state the grid is in."""
+        return self.path.peek()
+
+    @property
+    def UndoStack(self) -> _UndoPath:
+        """The actions that can be undone, from the oldest, as a read only stack."""
+        return _UndoPath(self)
+
+    def add_action(self, action: PaintAction, grid: Grid | None = None) -> None:
         """
-        Adds an action to the undo tracker.
+        Adds an action to the undo tracker, as a new child of the current node.
+        The branches already below the current node are kept.
 
-        If your collection is already full,
-        feel free to exit early and not add the action.
+        If the history is full, the oldest actions are forgotten
+        to make room for it.
 
         Args:
         - self
-        - action = the PaintAction occuring 
+        - action = the PaintAction occuring
+        - grid = The grid the action was just applied to. If given, a keyframe
+          of it is taken every keyframe_every levels.
 
         Raises:
         - Does not raise any erros
 
         Returns:
-        - If the Undo Stack is full, return None
-        - If it is not full, Do not return anything
+        - Does not return anything
 
         Complexity:
-        - As all operations are of constant time, the best case will be equal to the worst case,
-          therefore, best = worst = O(1)
+        - O(nbytes) + O(log n) for the action, plus O(_evict) for each action forgotten,
+          plus O(snapshot.dumps) every keyframe_every levels when grid is given.
         """
-        if self.UndoStack.is_full(): #Integer comparison is always constant --> O(1)
-            return None  #Returning is always constant --> O(1)
-        else: #Integer comparison is always constant --> O(1)
-            self.UndoStack.push(action) #Pushing is always constant --> O(1)
+        current = self.current #Constant --> O(1)
+        node = self._new_node(action, current, self.depth[current] + 1) #Constant --> O(1)
+        self.next_sibling[node] = self.first_child[current] #Linking the new child first --> O(1)
+        self.first_child[current] = node #Constant --> O(1)
+        self.redo_child[current] = node #Constant --> O(1)
+        self.path.push(node) #Constant --> O(1)
+        heapq.heappush(self.leaves, (self.born[node], node)) #O(log n)
+        self.count += 1 #Constant --> O(1)
+        self.nbytes += action.nbytes() #O(nbytes)
+        if grid is not None and self.depth[node] % self.keyframe_every == 0: #Checking is constant --> O(1)
+            self.keyframes[node] = snapshot.dumps(grid) #O(snapshot.dumps)
+            self.nbytes += len(self.keyframes[node]) #Constant --> O(1)
+        self._evict() #O(nbytes) per action forgotten
 
-              
-            
+    def memory_usage(self) -> int:
+        """
+        Returns the estimated memory taken by the actions and keyframes of the history, in bytes.
+
+        Complexity:
+        - O(1), the total is kept up to date as actions come and go.
+        """
+        return self.nbytes
 
     def undo(self, grid: Grid) -> PaintAction|None:
         """
@@ -57,28 +136,25 @@ class UndoTracker:
         - Does not raise any errors
 
         Returns:
-        - if the UndoStack is not empty, Returns the stack element the undo application was done in the form of a PaintAction
-        - If UndoStack is empty, return None
+        - if there is an action to undo, Returns the action the undo application was done in the form of a PaintAction
+        - If the current node is the root, return None
 
         Complexity:
-        - Best case will be if the stack is empty as it will simply require a return statement and therefore will be,
-          best case = O(1). Worst case would be if the stack is not empty, in which then the run time would be,
+        - Best case will be if there is nothing to undo as it will simply require a return statement and therefore will be,
+          best case = O(1). Worst case would be if there is, in which then the run time would be,
           worst case = O(undo_apply) + O(k), where k represents the constant operations.
         """
-        if self.UndoStack.is_empty(): #Integer comparison is always constant --> O(1)
+        if len(self.path) <= 1: #Integer comparison is always constant --> O(1)
             return None #Returning is always constant --> O(1)
-        
-        if not self.UndoStack.is_empty(): #Integer comparison is always constant --> O(1)
-            UndoVariable = self.UndoStack.pop()#Popping is always constant --> O(1)
-            self.RedoStack.push(UndoVariable) #Pushing is always constant --> O(1)
-            UndoVariable.undo_apply(grid) #Will be of run time of --> O(undo_apply)
-        return UndoVariable  #Returning is always constant --> O(1) 
-
-
+        node = self.path.pop() #Popping is always constant --> O(1)
+        self.redo_child[self.parent[node]] = node #Redo comes back down this branch --> O(1)
+        UndoVariable = self.actions[node] #Constant --> O(1)
+        UndoVariable.undo_apply(grid) #Will be of run time of --> O(undo_apply)
+        return UndoVariable  #Returning is always constant --> O(1)
 
     def redo(self, grid: Grid) -> PaintAction|None:
         """
-        Redo an operation that was previously undone.
+        Redo an operation that was previously undone, down the branch visited last.
         If there are no actions to redo, simply do nothing.
 
         :return: The action that was redone, or None.
@@ -91,20 +167,272 @@ class UndoTracker:
         - Does not raise any errors
 
         Returns:
-        - if the UndoStack is not empty, Returns the stack element the undo application was done in the form of a PaintAction
-        - If UndoStack is empty, return None
+        - if there is an action to redo, Returns the action the redo application was done in the form of a PaintAction
+        - If the current node has no children, return None
 
         Complexity:
-        - Best case will be if the stack is empty as it will simply require a return statement and therefore will be,
-          best case = O(1). Worst case would be if the stack is not empty, in which then the run time would be,
+        - Best case will be if there is nothing to redo as it will simply require a return statement and therefore will be,
+          best case = O(1). Worst case would be if there is, in which then the run time would be,
           worst case = O(redo_apply) + O(k), where k represents the constant operations.
-        
+
         """
-        if self.RedoStack.is_empty():#Integer comparison is always constant --> O(1)
+        node = self.redo_child[self.current] #Constant --> O(1)
+        if node == self.NONE: #Integer comparison is always constant --> O(1)
             return None #Returning is always constant --> O(1)
+        self.path.push(node) #Pushing is always constant --> O(1)
+        RedoVariable = self.actions[node] #Constant --> O(1)
+        RedoVariable.redo_apply(grid) #Will be of run time of --> O(redo_apply)
+        return RedoVariable #Returning is always constant --> O(1)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of positions goto can reach past 0: the actions from the root
+        to the current node, and then down the branch redo follows.
+
+        Complexity:
+        - O(r) for the r actions that can be redone.
+        """
+        length = len(self.path) - 1 #Constant --> O(1)
+        node = self.redo_child[self.current] #Constant --> O(1)
+        while node != self.NONE: #Runs r times
+            length += 1
+            node = self.redo_child[node]
+        return length
+
+    def position(self) -> int:
+        """Returns the current position in the history, the number of actions that can be undone."""
+        return len(self.path) - 1
+
+    def children(self, node: int | None = None) -> list[int]:
+        """
+        Returns the children of node (the current node by default), oldest first:
+        the branches that start there.
+
+        Complexity:
+        - O(c) for c children
+        """
+        node = self.current if node is None else node #Constant --> O(1)
+        found = [] #Constant --> O(1)
+        child = self.first_child[node] #Constant --> O(1)
+        while child != self.NONE: #Runs c times
+            found.append(child)
+            child = self.next_sibling[child]
+        found.reverse() #O(c)
+        return found
+
+    def action_of(self, node: int) -> PaintAction|None:
+        """Returns the action of node, None for the root."""
+        return self.actions[node]
+
+    def goto(self, index: int, grid: Grid) -> None:
+        """
+        Moves the history, and grid, to position index of the current branch, as if
+        undo or redo had been called until the position was reached.
+
+        Args:
+        - index = The position to go to, in [0, len(self)]
+        - grid = The grid the history applies to
+
+        Raises:
+        - IndexError if index is out of range
+
+        Complexity:
+        - O(goto_node), plus O(index - position) to find the node when moving forward.
+        """
+        if index < 0: #Checking is constant --> O(1)
+            raise IndexError(f"History position {index} out of range")
+        if index < len(self.path): #The node is above the current one
+            node = self.path[index] #Constant --> O(1)
+        else:
+            node = self.current #Constant --> O(1)
+            for _ in range(index - len(self.path) + 1): #Runs index - position times
+                node = self.redo_child[node]
+                if node == self.NONE:
+                    raise IndexError(f"History position {index} out of range [0, {len(self)}]")
+        self.goto_node(node, grid) #O(goto_node)
+
+    def goto_node(self, node: int, grid: Grid) -> None:
+        """
+        Moves the history, and grid, to any node of the tree, such as the tip of
+        another branch. Redo then follows the path taken to node.
+
+        The grid is brought there from whichever is closer: the current node, by
+        undoing up to the common ancestor of both and redoing down to node, or the
+        nearest keyframe above node, from which the actions down to node are redone.
+
+        Args:
+        - node = The node to go to, from children, action_of or current
+        - grid = The grid the history applies to
+
+        Raises:
+        - IndexError if node is not in the tree
+
+        Complexity:
+        - O(b) to find the common ancestor, where b is the length of the branch from
+          it down to node, plus O(min(d, keyframe_every) * apply) where d is the number
+          of actions between the current node and node, plus O(snapshot.restore) when
+          going through a keyframe.
+        """
+        if not 0 <= node < len(self.actions) or (self.actions[node] is None and node != self.root): #Checking is constant --> O(1)
+            raise IndexError(f"No node {node} in the history")
+        path, base = self.path, self.depth[self.root] #Constant --> O(1)
+        branch = [] #The nodes from node up to the common ancestor, excluded
+        ancestor = node #Constant --> O(1)
+        while True: #Runs b times
+            i = self.depth[ancestor] - base
+            if i < len(path) and path[i] == ancestor:
+                break
+            branch.append(ancestor)
+            ancestor = self.parent[ancestor]
+        top = self.depth[ancestor] - base #Index of the common ancestor in path
+        cost = len(path) - 1 - top + len(branch) #Actions applied going from the current node
+        start = None #Index in path of the keyframe to restore
+        for b, candidate in enumerate(branch): #Runs at most b times
+            if candidate in self.keyframes:
+                if b < cost:
+                    keyframe, cost = candidate, b
+                    branch, forward = branch[:b], branch[b:][::-1]
+                    start = top
+                break
+        else:
+            for i in range(top, max(-1, top - self.keyframe_every - 1), -1): #Runs at most keyframe_every times
+                if path[i] in self.keyframes:
+                    if top - i + len(branch) < cost:
+                        keyframe, start, forward = path[i], i, []
+                        branch += [path[j] for j in range(top, i, -1)] #Redone too, after the keyframe
+                    break
+        if start is None: #Cheaper from the current node
+            while len(path) > top + 1: #Runs at most d times
+                self.undo(grid) #O(undo_apply)
+        else:
+            snapshot.restore(grid, self.keyframes[keyframe]) #O(snapshot.restore)
+            while len(path) > start + 1: #Moves without applying --> O(1) per node
+                path.pop()
+            for passed in forward: #The nodes whose actions the keyframe already holds
+                self.redo_child[self.parent[passed]] = passed
+                path.push(passed)
+        for passed in reversed(branch): #Runs at most min(d, keyframe_every) times
+            self.redo_child[self.parent[passed]] = passed
+            path.push(passed)
+            self.actions[passed].redo_apply(grid) #O(redo_apply)
+
+    def _new_node(self, action: PaintAction | None, parent: int, depth: int) -> int:
+        """Returns a node for action below parent, reusing a free one if any."""
+        if self.free: #Checking is constant --> O(1)
+            node = self.free.pop() #Constant --> O(1)
+            self.actions[node] = action
+            self.parent[node] = parent
+            self.first_child[node] = self.next_sibling[node] = self.redo_child[node] = self.NONE
+            self.depth[node] = depth
+            self.born[node] = self.clock
+            self.clock += 1
+            return node
+        self.actions.append(action) #Amortised constant --> O(1)
+        self.parent.append(parent)
+        self.first_child.append(self.NONE)
+        self.next_sibling.append(self.NONE)
+        self.redo_child.append(self.NONE)
+        self.depth.append(depth)
+        self.born.append(self.clock)
+        self.clock += 1
+        return len(self.actions) - 1
+
+    def _free_node(self, node: int) -> None:
+        """Forgets the action and keyframe of a node, and frees it for reuse."""
+        if self.actions[node] is not None: #Checking is constant --> O(1)
+            self.nbytes -= self.actions[node].nbytes() #O(nbytes)
+            self.count -= 1
+        if node in self.keyframes: #Checking is constant --> O(1)
+            self.nbytes -= len(self.keyframes.pop(node))
+        self.actions[node] = None #Constant --> O(1)
+        self.free.append(node) #Constant --> O(1)
+
+    def _evict(self) -> None:
+        """
+        Forgets the oldest actions while the history is over its limits, one at a time.
+
+        A node is always newer than its parent. When the child of the root leading to
+        the current node (the trunk) is the only one, it is the oldest action, and it
+        becomes the new root. Otherwise the oldest leaf other than the current node is
+        dropped, so an abandoned branch is forgotten one action at a time, from its
+        tip, rather than in one go however large or recent it is.
+
+        Complexity:
+        - O(nbytes) + O(log n) amortised per action forgotten, plus O(c) for the c
+          siblings of a dropped leaf.
+        """
+        while self.count > self.max_actions or (self.max_bytes is not None and self.nbytes > self.max_bytes and self.count > 1):
+            trunk = self.path[1] if len(self.path) > 1 else self.NONE #Constant --> O(1)
+            if trunk != self.NONE and self.first_child[self.root] == trunk and self.next_sibling[trunk] == self.NONE:
+                self._reroot(trunk) #O(nbytes)
+            else:
+                self._drop_leaf(self._oldest_leaf()) #O(nbytes) + O(log n) amortised
+
+    def _oldest_leaf(self) -> int:
+        """Returns the oldest leaf other than the current node, dropping the stale heap entries on the way."""
+        held = None #The entry of the current node, pushed back once the leaf is found
+        while True: #Each stale entry is popped once --> O(log n) amortised
+            born, node = self.leaves[0]
+            if self.actions[node] is None or self.born[node] != born or self.first_child[node] != self.NONE:
+                heapq.heappop(self.leaves) #Freed, reused or no longer a leaf
+            elif node == self.current:
+                held = heapq.heappop(self.leaves)
+            else:
+                break
+        if held is not None: #Checking is constant --> O(1)
+            heapq.heappush(self.leaves, held) #O(log n)
+        return node
+
+    def _drop_leaf(self, node: int) -> None:
+        """Drops a leaf that is not the current node. Its parent may become a leaf in turn."""
+        parent = self.parent[node] #Constant --> O(1)
+        self._unlink(node) #O(c)
+        self._free_node(node) #O(nbytes)
+        if self.first_child[parent] == self.NONE and self.actions[parent] is not None: #The root is never dropped
+            heapq.heappush(self.leaves, (self.born[parent], parent)) #O(log n)
+
+    def _reroot(self, node: int) -> None:
+        """Makes the only child of the root, on the path to the current node, the new root."""
+        self._free_node(self.root) #Constant, the root has no action --> O(1)
+        self.nbytes -= self.actions[node].nbytes() #O(nbytes)
+        self.count -= 1 #Constant --> O(1)
+        self.actions[node] = None #The root's action is part of the state before the history
+        self.parent[node] = self.next_sibling[node] = self.NONE #Constant --> O(1)
+        self.root = node #Constant --> O(1)
+        self.path.drop_bottom() #Constant --> O(1)
+
+    def _unlink(self, node: int) -> None:
+        """Removes node from the children of its parent."""
+        parent = self.parent[node] #Constant --> O(1)
+        if self.first_child[parent] == node: #Checking is constant --> O(1)
+            self.first_child[parent] = self.next_sibling[node]
+        else:
+            child = self.first_child[parent]
+            while self.next_sibling[child] != node: #Runs at most c times
+                child = self.next_sibling[child]
+            self.next_sibling[child] = self.next_sibling[node]
+        if self.redo_child[parent] == node: #Redo goes down the newest branch left
+            self.redo_child[parent] = self.first_child[parent]
+
+
+class _UndoPath:
+    """The actions from the root of an UndoTracker to its current node, with the stack interface used to read them."""
+
+    def __init__(self, tracker: UndoTracker) -> None:
+        self.tracker = tracker
+
+    def __len__(self) -> int:
+        return len(self.tracker.path) - 1
+
+    def is_empty(self) -> bool:
+        return len(self) == 0
+
+    def peek(self) -> PaintAction:
+        if self.is_empty():
+            raise Exception("Stack is empty")
+        return self.tracker.actions[self.tracker.current]
 
-        if not self.RedoStack.is_empty(): #Integer comparison is always constant --> O(1)
-            RedoVariable = self.RedoStack.pop() #Popping is always constant --> O(1)
-            self.UndoStack.push(RedoVariable)  #Pushing is always constant --> O(1)
-            RedoVariable.redo_apply(grid) #Will be of run time of --> O(redo_apply)
-        return RedoVariable #Returning is always constant --> O(1)    
+    def __getitem__(self, index: int) -> PaintAction:
+        if not 0 <= index < len(self):
+            raise IndexError("Stack index out of range")
+        return self.tracker.actions[self.tracker.path[index + 1]]